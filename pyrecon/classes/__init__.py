@@ -3,7 +3,7 @@ from .image import Image
 from .section import Section
 from .series import Series
 from .transform import Transform
-from .zcontour import ZContour
+from .zcontour import ZContour, ZContourIndex
 
 
 __all__ = [
@@ -12,5 +12,6 @@ __all__ = [
     "Section",
     "Series",
     "Transform",
-    "ZContour"
+    "ZContour",
+    "ZContourIndex",
 ]
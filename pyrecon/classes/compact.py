@@ -0,0 +1,159 @@
+""" Memory-lean variants of Contour, Image and ZContour.
+
+    CompactContour, CompactImage and CompactZContour subclass the classes they
+    are named after, but store their attributes in __slots__ instead of a
+    per-instance dict, keep points in a float64 array, and share name strings
+    and border/fill tuples between instances. Transforms are already shared by the reader, see
+    reconstruct_reader.intern_transforms.
+"""
+import sys
+
+from .contour import Contour
+from .image import Image
+from .points import as_point_array
+from .zcontour import ZContour
+
+# Shared border/fill tuples, by value
+_COLORS = {}
+
+CONTOUR_ATTRIBUTES = [
+    "name", "comment", "hidden", "closed", "simplified", "mode", "border", "fill",
+    "points", "transform",
+]
+IMAGE_ATTRIBUTES = [
+    "src", "mag", "contrast", "brightness", "red", "green", "blue", "transform",
+    "name", "hidden", "closed", "simplified", "border", "fill", "mode", "points", "_path",
+]
+ZCONTOUR_ATTRIBUTES = ["name", "closed", "border", "fill", "mode", "points"]
+
+
+def intern_color(color):
+    """ Return a shared tuple equal to color (None stays None).
+    """
+    if color is None:
+        return None
+    color = tuple(color)
+    return _COLORS.setdefault(color, color)
+
+
+def _intern_name(name):
+    return sys.intern(name) if isinstance(name, str) else name
+
+
+def _points_property(dims, invalidate=False):
+    """ Return a points property that stores an (N, dims) float64 array.
+    """
+    def fget(self):
+        return self._points
+
+    def fset(self, points):
+        self._points = as_point_array(points, dims=dims)
+        if invalidate:
+            self._invalidate()
+    return property(fget, fset, doc="Return points as an (N, {}) float64 array.".format(dims))
+
+
+def _slots(cls):
+    """ Return the instance attributes of a default cls, as __slots__ names.
+    """
+    return tuple("_points" if k == "points" else k for k in vars(cls()))
+
+
+class _Compact(object):
+    """ Behaviour shared by the compact classes. Subclasses declare a slot
+        for every attribute their base class sets, so the instance dict the
+        base class allows for is never created.
+    """
+
+    __slots__ = ()
+
+    def __init__(self, **kwargs):
+        """ Assign instance attributes from args/kwargs, sharing name strings
+            and border/fill tuples.
+        """
+        super(_Compact, self).__init__(**kwargs)
+        self.name = _intern_name(self.name)
+        self.border = intern_color(self.border)
+        self.fill = intern_color(self.fill)
+
+    def __getstate__(self):
+        """ Return slot values for pickling, without cached data.
+        """
+        state = {}
+        for cls in type(self).__mro__:
+            for slot in getattr(cls, "__slots__", ()):
+                if hasattr(self, slot):
+                    state[slot] = getattr(self, slot)
+        for slot in ("_normalized", "_shape", "_lod"):
+            if slot in state:
+                state[slot] = None
+        return state
+
+    def __setstate__(self, state):
+        for slot, value in state.items():
+            setattr(self, slot, value)
+
+
+class CompactContour(_Compact, Contour):
+    """ Contour stored in __slots__, see pyrecon.classes.compact.
+    """
+
+    __slots__ = _slots(Contour)
+    points = _points_property(2, invalidate=True)
+
+
+class CompactImage(_Compact, Image):
+    """ Image stored in __slots__, see pyrecon.classes.compact.
+    """
+
+    __slots__ = _slots(Image)
+    points = _points_property(2)
+
+
+class CompactZContour(_Compact, ZContour):
+    """ ZContour stored in __slots__, see pyrecon.classes.compact.
+    """
+
+    __slots__ = _slots(ZContour)
+    points = _points_property(3)
+
+
+def _convert(obj, cls, attributes):
+    return cls(**{k: getattr(obj, k) for k in attributes})
+
+
+def compact_contour(contour):
+    """ Return a CompactContour equal to contour.
+    """
+    return _convert(contour, CompactContour, CONTOUR_ATTRIBUTES)
+
+
+def compact_image(image):
+    """ Return a CompactImage equal to image.
+    """
+    return _convert(image, CompactImage, IMAGE_ATTRIBUTES)
+
+
+def compact_zcontour(zcontour):
+    """ Return a CompactZContour equal to zcontour.
+    """
+    return _convert(zcontour, CompactZContour, ZCONTOUR_ATTRIBUTES)
+
+
+def compact_section(section):
+    """ Replace a Section's Contours and Images with compact ones, in place.
+    """
+    section.contours = [compact_contour(c) for c in section.contours]
+    section.images = [compact_image(i) for i in section.images]
+    return section
+
+
+def compact_series(series):
+    """ Replace the Contours, ZContours and Sections' contents of a Series with
+        compact ones, in place.
+    """
+    series.contours = [compact_contour(c) for c in series.contours]
+    series.zcontours = [compact_zcontour(z) for z in series.zcontours]
+    for section in series.sections.values():
+        compact_section(section)
+    return series
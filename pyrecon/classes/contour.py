@@ -1,26 +1,92 @@
 import numpy
-from shapely.geometry import LineString, Point, Polygon
+
+from . import edits
+from .geometry import build_shape, classify_traces
+from .points import as_point_list, points_equal
+
+# Douglas-Peucker tolerance of each simplified_shape level above 0, in Series units
+LOD_TOLERANCES = (0.002, 0.01, 0.05)
+
 
 
 class Contour(object):
     """ Class representing a RECONSTRUCT Contour.
     """
 
+    # Data a Section derives from its contours depends on these, so
+    # assigning them is an edit, see edits
+    name = edits.edited_property("name")
+    comment = edits.edited_property("comment")
+    hidden = edits.edited_property("hidden")
+    closed = edits.edited_property("closed")
+    simplified = edits.edited_property("simplified")
+    mode = edits.edited_property("mode")
+    border = edits.edited_property("border")
+    fill = edits.edited_property("fill")
+
     def __init__(self, **kwargs):
         """ Apply given keyword arguments as instance attributes.
         """
-        self.name = kwargs.get("name")
-        self.comment = kwargs.get("comment")
-        self.hidden = kwargs.get("hidden")
-        self.closed = kwargs.get("closed")
-        self.simplified = kwargs.get("simplified")
-        self.mode = kwargs.get("mode")
-        self.border = kwargs.get("border")
-        self.fill = kwargs.get("fill")
-        self.points = list(kwargs.get("points", []))
+        # A new Contour is counted as one edit, when its points are set
+        self._name = kwargs.get("name")
+        self._comment = kwargs.get("comment")
+        self._hidden = kwargs.get("hidden")
+        self._closed = kwargs.get("closed")
+        self._simplified = kwargs.get("simplified")
+        self._mode = kwargs.get("mode")
+        self._border = kwargs.get("border")
+        self._fill = kwargs.get("fill")
+        # Bumped whenever points or transform is reassigned, see _invalidate()
+        self._revision = 0
+        self._transform = None
+        self.points = kwargs.get("points", [])
         # Non-RECONSTRUCT attributes
         self.transform = kwargs.get("transform")
 
+    @property
+    def points(self):
+        """ Return this Contour's points, in the Section's coordinates.
+        """
+        return self._points
+
+    @points.setter
+    def points(self, points):
+        # Points may be an (N, 2) array from the reader, otherwise a list of tuples
+        self._points = points if isinstance(points, numpy.ndarray) else list(points)
+        self._invalidate()
+
+    @property
+    def transform(self):
+        """ Return the Transform from normalized to Section coordinates.
+        """
+        return self._transform
+
+    @transform.setter
+    def transform(self, transform):
+        self._transform = transform
+        self._invalidate()
+
+    def _invalidate(self):
+        """ Drop cached normalized points and shape.
+
+            Caches are only dropped when points or transform is reassigned,
+            so replace points rather than editing them in place.
+        """
+        self._revision += 1
+        self._normalized = None
+        self._shape = None
+        self._lod = None
+        edits.bump()
+
+    def __getstate__(self):
+        """ Leave cached normalized points and shape out of pickles.
+        """
+        state = self.__dict__.copy()
+        state["_normalized"] = None
+        state["_shape"] = None
+        state["_lod"] = None
+        return state
+
     def __repr__(self):
         """ Return a string representation of this Contour's data.
         """
@@ -53,7 +119,10 @@ class Contour(object):
             "transform",
         ]
         for k in to_compare:
-            if getattr(self, k) != getattr(other, k):
+            if k == "points":
+                if not points_equal(self.points, other.points):
+                    return False
+            elif getattr(self, k) != getattr(other, k):
                 return False
         return True
 
@@ -62,69 +131,90 @@ class Contour(object):
         """
         return not self.__eq__(other)
 
+    @property
+    def point_list(self):
+        """ Return points as a list of tuples, however they are stored.
+        """
+        return as_point_list(self.points)
+
+    @property
+    def normalized_points(self):
+        """ Return points with the transform inverted, as a read-only (N, 2) array.
+
+            Computed once, then reused until points or transform is
+            reassigned or the transform's coefficients change.
+        """
+        key = self.transform.key
+        if self._normalized is None or self._normalized[0] != key:
+            array = numpy.asarray(self.points, dtype=numpy.float64)
+            self._set_normalized_points(self.transform.apply_inverse(array))
+        return self._normalized[1]
+
+    def _set_normalized_points(self, normalized_points):
+        """ Store normalized points computed elsewhere, e.g. for a whole Section.
+        """
+        normalized_points.setflags(write=False)
+        self._normalized = (self.transform.key, normalized_points)
+
+    def _set_shape(self, shape):
+        """ Store a shape built elsewhere, e.g. for a whole Section.
+        """
+        self._shape = ((self.transform.key, self.closed), shape)
+
     @property
     def shape(self):
         """ Return a Shapely geometric object.
+
+            The geometry is cached like normalized_points, and also rebuilt
+            when closed changes.
         """
-        if not self.points:
+        if not len(self.points):
             raise Exception("No points found: {}".format(self))
+        key = (self.transform.key, self.closed)
+        if self._shape is None or self._shape[0] != key:
+            self._set_shape(self.shape_from(self.normalized_points))
+        return self._shape[1]
+
+    def simplified_shape(self, level=1):
+        """ Return shape simplified with LOD_TOLERANCES[level - 1]; level 0 is
+            shape itself.
 
-        # Normalize points
-        array = numpy.asarray(list(self.points))
-        normalized_points = self.transform._tform.inverse(array)
-        self.normalized_points = normalized_points
-
-        if len(normalized_points) == 1:
-            return Point(*normalized_points)
-        elif len(normalized_points) == 2:
-            return LineString(normalized_points)
-        elif self.closed is True:
-            # Check for weird, invalid traces:
-            #
-            # Contour name=D14 hidden=False closed=True simplified=True
-            # border=(1.0, 0.0, 1.0) fill=(1.0, 0.0, 1.0)
-            # mode=11
-            # points=[(15.9352, 10.8615), (15.9332, 10.8508), (15.9352, 10.8615)]
-
-            # ((CLZBJ.60))
-            # Contour name=D13 hidden=False closed=True simplified=True
-            # border=(0.0, 0.0, 1.0) fill=(0.0, 0.0, 1.0) mode=11
-            # points=[(13.9099, 8.16357), (13.9099, 8.16356), (13.8962, 8.19828)]
-
-            # ((CLZBJ.60))
-            # Contour name=D13 hidden=False closed=True simplified=True
-            # border=(0.0, 0.0, 1.0) fill=(0.0, 0.0, 1.0) mode=11
-            # points=[(13.9099, 8.1626), (13.9092, 8.12801), (13.8936, 8.09571),
-            #	      (13.9093, 8.128)]
-
-            # ((CLZBJ.60))
-            # Contour name=D12 hidden=False closed=True simplified=True
-            # border=(1.0, 0.0, 0.0) fill=(1.0, 0.0, 0.0) mode=11
-            # points=[(13.583, 9.11925), (13.6035, 9.09733), (13.6142, 9.07453),
-            #         (13.6035, 9.09732), (13.583, 9.11925), (13.5765, 9.12278)]
-
-            # NOTE: getting tired of handling individual caseses like this, using is_valid
-            #       to see how that goes.
-            # TODO: Try Polygon.buffer(0) instead of is_valid?
-            if ((len(normalized_points) == 3 or len(normalized_points) == 4) and \
-                (self.points[0] == self.points[2] or \
-                (self.points[0][0] == self.points[1][0] and \
-		 abs(self.points[0][1] - self.points[1][1]) <= 1e-5) or \
-		(self.points[0][0] == self.points[2][0] and \
-		 abs(self.points[0][1] - self.points[2][1]) <= 1e-5)) or \
-		 not Polygon(normalized_points).is_valid):
-                return LineString(normalized_points)
-            # Closed trace
-            return Polygon(normalized_points)
-            # TODO: do I need to handle this?
-            # If image contour, multiply pts by mag before inverting transform
-            # if self.image.__class__.__name__ == 'Image':
-            #     mag = self.image.mag
-            #     xvals = [pt[0] * mag for pt in normalized_points]
-            #     yvals = [pt[1] * mag for pt in normalized_points]
-            #     pts = zip(xvals, yvals)
-            # else:
-        elif self.closed is False:
-            return LineString(normalized_points)
-        else:
+            Simplification is topology-preserving Douglas-Peucker, so the
+            result is valid and within that tolerance of shape. Levels are
+            built on first use and cached along with shape.
+        """
+        shape = self.shape
+        if not level:
+            return shape
+        if self._lod is None or self._lod[0] is not shape:
+            self._lod = (shape, {})
+        levels = self._lod[1]
+        if level not in levels:
+            levels[level] = shape.simplify(LOD_TOLERANCES[level - 1], preserve_topology=True)
+        return levels[level]
+
+    def shape_from(self, normalized_points, repair=False):
+        """ Return a new Shapely geometric object for this Contour with the
+            given normalized points, e.g. mapped into another Series' frame.
+
+            Closed traces that cannot form a valid Polygon are LineStrings,
+            see geometry.classify_traces; with repair=True self-intersecting
+            ones are repaired with buffer(0) instead.
+        """
+        if len(normalized_points) > 2 and self.closed not in (True, False):
             raise Exception("Could not deduce shape for: {}".format(self))
+        # Weird, invalid traces seen in real Series, all classified as lines:
+        #
+        # Contour name=D14 hidden=False closed=True simplified=True
+        # points=[(15.9352, 10.8615), (15.9332, 10.8508), (15.9352, 10.8615)]
+        #
+        # ((CLZBJ.60))
+        # Contour name=D13 hidden=False closed=True simplified=True
+        # points=[(13.9099, 8.16357), (13.9099, 8.16356), (13.8962, 8.19828)]
+        #
+        # ((CLZBJ.60))
+        # Contour name=D12 hidden=False closed=True simplified=True
+        # points=[(13.583, 9.11925), (13.6035, 9.09733), (13.6142, 9.07453),
+        #         (13.6035, 9.09732), (13.583, 9.11925), (13.5765, 9.12278)]
+        kind = classify_traces([normalized_points], [self.closed])[0]
+        return build_shape(normalized_points, kind, repair=repair)
@@ -0,0 +1,165 @@
+import numpy
+
+from .contour import Contour
+
+HIDDEN = 1
+CLOSED = 2
+SIMPLIFIED = 4
+
+# Palette entry for contours without a border or fill color
+NO_COLOR = (numpy.nan, numpy.nan, numpy.nan)
+
+# Mode of contours without one; RECONSTRUCT modes may be 0 or negative
+NO_MODE = numpy.iinfo(numpy.int32).min
+
+
+def _encode(values):
+    """ Return (codes, palette) where palette[codes[i]] == values[i].
+    """
+    palette = []
+    positions = {}
+    codes = numpy.empty(len(values), dtype=numpy.int32)
+    for i, value in enumerate(values):
+        code = positions.get(value)
+        if code is None:
+            code = positions[value] = len(palette)
+            palette.append(value)
+        codes[i] = code
+    return codes, palette
+
+
+def _color_key(color):
+    return NO_COLOR if color is None else tuple(color)
+
+
+def _color(row):
+    if numpy.isnan(row).any():
+        return None
+    return tuple(row.tolist())
+
+
+def _mode(value):
+    value = int(value)
+    return None if value == NO_MODE else value
+
+
+def _transform_key(transform):
+    if transform is None:
+        return None
+    return transform.key
+
+
+class ContourTable(object):
+    """ Columnar storage for a list of Contours, usually a Section's.
+
+        points holds every contour's points in one (M, 2) float64 array and
+        the points of contour i are points[offsets[i]:offsets[i + 1]].
+        Names, comments, colors and transforms are stored once in palettes
+        and referenced by code; hidden, closed and simplified are packed into
+        the bits of flags. Contours without a mode have NO_MODE in modes.
+    """
+
+    def __init__(self, **kwargs):
+        """ Apply given keyword arguments as instance attributes.
+        """
+        self.points = kwargs.get("points", numpy.empty((0, 2)))
+        self.offsets = kwargs.get("offsets", numpy.zeros(1, dtype=numpy.int64))
+        self.names = kwargs.get("names", [])
+        self.name_codes = kwargs.get("name_codes", numpy.empty(0, dtype=numpy.int32))
+        self.comments = kwargs.get("comments", [])
+        self.comment_codes = kwargs.get("comment_codes", numpy.empty(0, dtype=numpy.int32))
+        self.flags = kwargs.get("flags", numpy.empty(0, dtype=numpy.uint8))
+        self.modes = kwargs.get("modes", numpy.empty(0, dtype=numpy.int32))
+        self.borders = kwargs.get("borders", numpy.empty((0, 3)))
+        self.border_codes = kwargs.get("border_codes", numpy.empty(0, dtype=numpy.int32))
+        self.fills = kwargs.get("fills", numpy.empty((0, 3)))
+        self.fill_codes = kwargs.get("fill_codes", numpy.empty(0, dtype=numpy.int32))
+        self.transforms = kwargs.get("transforms", [])
+        self.transform_ids = kwargs.get("transform_ids", numpy.empty(0, dtype=numpy.int32))
+
+    @classmethod
+    def from_contours(cls, contours):
+        """ Return a ContourTable holding the data of contours.
+        """
+        contours = list(contours)
+        counts = numpy.array([len(c.points) for c in contours], dtype=numpy.int64)
+        offsets = numpy.zeros(len(contours) + 1, dtype=numpy.int64)
+        numpy.cumsum(counts, out=offsets[1:])
+        points = numpy.empty((offsets[-1], 2), dtype=numpy.float64)
+        for i, contour in enumerate(contours):
+            if counts[i]:
+                points[offsets[i]:offsets[i + 1]] = contour.points
+
+        flags = numpy.array([
+            HIDDEN * bool(c.hidden) | CLOSED * bool(c.closed) | SIMPLIFIED * bool(c.simplified)
+            for c in contours
+        ], dtype=numpy.uint8)
+        name_codes, names = _encode([c.name for c in contours])
+        comment_codes, comments = _encode([c.comment for c in contours])
+        border_codes, borders = _encode([_color_key(c.border) for c in contours])
+        fill_codes, fills = _encode([_color_key(c.fill) for c in contours])
+
+        # Contours share Transforms with equal coefficients
+        transform_ids, keys = _encode([_transform_key(c.transform) for c in contours])
+        transforms = [None] * len(keys)
+        for contour, transform_id in zip(contours, transform_ids):
+            if transforms[transform_id] is None:
+                transforms[transform_id] = contour.transform
+
+        return cls(
+            points=points,
+            offsets=offsets,
+            names=names,
+            name_codes=name_codes,
+            comments=comments,
+            comment_codes=comment_codes,
+            flags=flags,
+            modes=numpy.array(
+                [NO_MODE if c.mode is None else c.mode for c in contours], dtype=numpy.int32),
+            borders=numpy.array(borders, dtype=numpy.float64).reshape(-1, 3),
+            border_codes=border_codes,
+            fills=numpy.array(fills, dtype=numpy.float64).reshape(-1, 3),
+            fill_codes=fill_codes,
+            transforms=transforms,
+            transform_ids=transform_ids,
+        )
+
+    def __len__(self):
+        """ Return number of contours in this table.
+        """
+        return len(self.offsets) - 1
+
+    def __getitem__(self, i):
+        """ Return contour i as a Contour whose points are a view into this table.
+        """
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError(i)
+        flags = int(self.flags[i])
+        return Contour(
+            name=self.names[self.name_codes[i]],
+            comment=self.comments[self.comment_codes[i]],
+            hidden=bool(flags & HIDDEN),
+            closed=bool(flags & CLOSED),
+            simplified=bool(flags & SIMPLIFIED),
+            mode=_mode(self.modes[i]),
+            border=_color(self.borders[self.border_codes[i]]),
+            fill=_color(self.fills[self.fill_codes[i]]),
+            points=self.points[self.offsets[i]:self.offsets[i + 1]],
+            transform=self.transforms[self.transform_ids[i]],
+        )
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
+
+    def counts(self):
+        """ Return the number of points in each contour.
+        """
+        return numpy.diff(self.offsets)
+
+    def to_contours(self):
+        """ Return a list of Contours, one per row.
+        """
+        return list(self)
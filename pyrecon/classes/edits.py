@@ -0,0 +1,31 @@
+""" Count of edits to Contours and Transforms in this process.
+
+    Any edit to any Contour or Transform bumps the count, so data derived
+    from contours can be checked for staleness in O(1), see Section._cached.
+"""
+from operator import attrgetter
+
+_count = [0]
+
+
+def bump():
+    """ Record an edit.
+    """
+    _count[0] += 1
+
+
+def count():
+    """ Return the number of edits recorded so far.
+    """
+    return _count[0]
+
+
+def edited_property(name):
+    """ Return a property stored in "_" + name whose assignments are edits.
+    """
+    private = "_" + name
+
+    def fset(self, value):
+        setattr(self, private, value)
+        bump()
+    return property(attrgetter(private), fset)
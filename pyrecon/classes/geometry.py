@@ -0,0 +1,154 @@
+""" Classification of traces into the Shapely geometry they can form, and
+    their measurements.
+"""
+from collections import namedtuple
+
+import numpy
+import shapely
+from shapely.geometry import LineString, Point, Polygon
+
+POINT = "Point"
+LINE = "LineString"
+POLYGON = "Polygon"
+# A closed trace that only forms a self-intersecting ring
+INVALID = "Invalid"
+
+# Points no further apart than this in each coordinate count as repeated;
+# RECONSTRUCT writes 5 decimal places, so this is one unit in the last place
+TOLERANCE = 1e-5
+# Allowance for float rounding when comparing with a tolerance
+_ROUNDING = 1 + 1e-6
+
+TraceMetrics = namedtuple("TraceMetrics", [
+    "area",  # (N,) signed area, positive if counter-clockwise, 0 if open
+    "length",  # (N,) perimeter of closed traces, path length of open ones
+    "centroid",  # (N, 2) area centroid, or mean point if there is no area
+    "extent",  # (N, 4) minx, miny, maxx, maxy
+])
+
+# Shapely 2 can build and validate many rings in one call
+_VECTORIZED = hasattr(shapely, "linearrings") and hasattr(shapely, "is_valid")
+
+
+def classify_traces(point_lists, closed, tolerance=TOLERANCE):
+    """ Return the kind (POINT, LINE, POLYGON or INVALID) of each trace.
+
+        point_lists holds each trace's normalized points and closed whether
+        it is closed. All traces are checked together over one concatenated
+        array: closed traces with fewer than 3 distinct consecutive points,
+        or with no net area (e.g. collinear points), are lines. Remaining
+        closed traces are POLYGON if their ring is valid and INVALID if it
+        intersects itself.
+    """
+    arrays = [numpy.asarray(p, dtype=numpy.float64).reshape(-1, 2) for p in point_lists]
+    counts = numpy.array([len(a) for a in arrays], dtype=numpy.intp)
+    closed = numpy.array([c is True for c in closed], dtype=bool)
+    kinds = numpy.where(counts == 1, POINT, LINE).astype(object)
+    ring = closed & (counts >= 3)
+    if not ring.any():
+        return list(kinds)
+
+    ring_ids = numpy.flatnonzero(ring)
+    points = numpy.concatenate([arrays[i] for i in ring_ids])
+    ring_counts = counts[ring_ids]
+    starts = numpy.zeros(len(ring_ids), dtype=numpy.intp)
+    numpy.cumsum(ring_counts[:-1], out=starts[1:])
+    # Index of the next point of each point's ring, wrapping to the start
+    following = numpy.arange(len(points)) + 1
+    following[starts + ring_counts - 1] = starts
+
+    step = points[following] - points
+    distinct = numpy.add.reduceat(
+        (numpy.abs(step) > tolerance * _ROUNDING).any(axis=1).astype(numpy.intp), starts)
+    cross = points[:, 0] * points[following, 1] - points[following, 0] * points[:, 1]
+    area = numpy.abs(numpy.add.reduceat(cross, starts)) / 2
+    candidates = (distinct >= 3) & (area > tolerance ** 2)
+
+    valid = _rings_valid(points, starts, ring_counts, candidates)
+    kinds[ring_ids[candidates]] = numpy.where(valid, POLYGON, INVALID)
+    return list(kinds)
+
+
+def _rings_valid(points, starts, counts, candidates):
+    """ Return whether each candidate ring is a valid polygon exterior.
+    """
+    if not candidates.any():
+        return numpy.zeros(0, dtype=bool)
+    if _VECTORIZED:
+        ids = numpy.flatnonzero(candidates)
+        take = numpy.concatenate([numpy.arange(starts[i], starts[i] + counts[i]) for i in ids])
+        indices = numpy.repeat(numpy.arange(len(ids)), counts[ids])
+        rings = shapely.linearrings(points[take], indices=indices)
+        return shapely.is_valid(shapely.polygons(rings))
+    return numpy.array([
+        Polygon(points[starts[i]:starts[i] + counts[i]]).is_valid
+        for i in numpy.flatnonzero(candidates)
+    ], dtype=bool)
+
+
+def build_shape(points, kind, repair=False):
+    """ Return the Shapely geometry of a trace of a given kind.
+
+        INVALID traces are LineStrings unless repair is True, in which case
+        they are repaired with buffer(0); that may give a MultiPolygon.
+    """
+    if kind == POINT:
+        return Point(*points)
+    elif kind == POLYGON:
+        return Polygon(points)
+    elif kind == INVALID and repair:
+        repaired = Polygon(points).buffer(0)
+        if not repaired.is_empty:
+            return repaired
+    return LineString(points)
+
+
+def trace_metrics(point_lists, closed):
+    """ Return TraceMetrics of traces, measured on the given points.
+
+        All traces are measured together over one concatenated array with
+        the shoelace formulas. Metrics of traces without points are NaN.
+    """
+    arrays = [numpy.asarray(p, dtype=numpy.float64).reshape(-1, 2) for p in point_lists]
+    counts = numpy.array([len(a) for a in arrays], dtype=numpy.intp)
+    closed = numpy.array([c is True for c in closed], dtype=bool)
+    area = numpy.zeros(len(arrays))
+    length = numpy.zeros(len(arrays))
+    centroid = numpy.full((len(arrays), 2), numpy.nan)
+    extent = numpy.full((len(arrays), 4), numpy.nan)
+    ids = numpy.flatnonzero(counts)
+    area[counts == 0] = length[counts == 0] = numpy.nan
+    if not len(ids):
+        return TraceMetrics(area, length, centroid, extent)
+
+    points = numpy.concatenate([arrays[i] for i in ids])
+    trace_counts = counts[ids]
+    starts = numpy.zeros(len(ids), dtype=numpy.intp)
+    numpy.cumsum(trace_counts[:-1], out=starts[1:])
+    ends = starts + trace_counts - 1
+    # Index of the next point of each point's trace; closed traces wrap to the
+    # start and open ones end on a segment of zero length
+    following = numpy.arange(len(points)) + 1
+    following[ends] = numpy.where(closed[ids], starts, ends)
+
+    x, y = points[:, 0], points[:, 1]
+    nx, ny = x[following], y[following]
+    length[ids] = numpy.add.reduceat(numpy.hypot(nx - x, ny - y), starts)
+    cross = x * ny - nx * y
+    doubled = numpy.where(closed[ids], numpy.add.reduceat(cross, starts), 0.0)
+    area[ids] = doubled / 2
+
+    mean = numpy.add.reduceat(points, starts) / trace_counts[:, None]
+    moments = numpy.column_stack((
+        numpy.add.reduceat((x + nx) * cross, starts),
+        numpy.add.reduceat((y + ny) * cross, starts),
+    ))
+    has_area = numpy.abs(doubled) > 0
+    with numpy.errstate(divide="ignore", invalid="ignore"):
+        centroid[ids] = numpy.where(has_area[:, None], moments / (3 * doubled[:, None]), mean)
+
+    extent[ids] = numpy.column_stack((
+        numpy.minimum.reduceat(points, starts),
+        numpy.maximum.reduceat(points, starts),
+    ))
+    return TraceMetrics(area, length, centroid, extent)
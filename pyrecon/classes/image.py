@@ -1,3 +1,8 @@
+import numpy
+
+from .points import as_point_list, points_equal
+
+
 class Image(object):
     """ Class representing a RECONSTRUCT Image.
     """
@@ -22,7 +27,8 @@ class Image(object):
         self.border = kwargs.get("border")
         self.fill = kwargs.get("fill")
         self.mode = kwargs.get("mode")
-        self.points = list(kwargs.get("points", []))
+        points = kwargs.get("points", [])
+        self.points = points if isinstance(points, numpy.ndarray) else list(points)
 
         # Metadata
         self._path = kwargs.get("_path")
@@ -40,7 +46,7 @@ class Image(object):
             self.border == other.border and
             self.fill == other.fill and
             self.mode == other.mode and
-            self.points == other.points
+            points_equal(self.points, other.points)
         )
 
     def __ne__(self, other):
@@ -48,6 +54,12 @@ class Image(object):
         """
         return not self.__eq__(other)
 
+    @property
+    def point_list(self):
+        """ Return points as a list of tuples, however they are stored.
+        """
+        return as_point_list(self.points)
+
     def attributes(self):
         """ Return relevent attributes as dict.
         """
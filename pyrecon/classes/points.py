@@ -0,0 +1,30 @@
+""" Helpers for point data stored either as lists of tuples or NumPy arrays.
+"""
+import numpy
+
+
+def as_point_list(points):
+    """ Return points as a list of tuples.
+    """
+    if isinstance(points, numpy.ndarray):
+        return [tuple(point) for point in points.tolist()]
+    return [tuple(point) for point in points]
+
+
+def points_equal(points1, points2):
+    """ Return True if two point sequences hold the same points, in order.
+    """
+    if isinstance(points1, numpy.ndarray) or isinstance(points2, numpy.ndarray):
+        array1 = numpy.asarray(points1, dtype=numpy.float64)
+        array2 = numpy.asarray(points2, dtype=numpy.float64)
+        if not array1.size and not array2.size:
+            return True
+        return array1.shape == array2.shape and bool((array1 == array2).all())
+    return list(points1) == list(points2)
+
+
+def as_point_array(points, dims=2):
+    """ Return points as an (N, dims) float64 array, without copying arrays
+        that already are one.
+    """
+    return numpy.asarray(points, dtype=numpy.float64).reshape(-1, dims)
@@ -1,3 +1,14 @@
+import itertools
+
+import numpy
+from shapely.geometry import Point, box
+
+from . import edits
+from .contour_table import ContourTable
+from .geometry import build_shape, classify_traces, trace_metrics
+from .spatial import BoxTree
+
+
 class Section(object):
     """ Class representing a RECONSTRUCT Section.
     """
@@ -13,6 +24,17 @@ class Section(object):
         self.images = kwargs.get("images", [])  # TODO: d1fixed
         self.contours = kwargs.get("contours", [])
         self._path = kwargs.get("_path")
+        # Data derived from contours, see _cached()
+        self._cache = {}
+        self._cache_contours = None
+
+    def __getstate__(self):
+        """ Leave data derived from contours out of pickles.
+        """
+        state = self.__dict__.copy()
+        state["_cache"] = {}
+        state["_cache_contours"] = None
+        return state
 
 # ACCESSORS
     def __len__(self):
@@ -51,6 +73,165 @@ class Section(object):
         elif eq_type.lower() in ['contours', 'contour']:
             return (self.contours == other.contours)
 
+    def _cached(self, key, build):
+        """ Return build(), reusing the last result until the contours change.
+        """
+        # Checked in O(1): contours is reassigned or changes length, or any
+        # Contour or Transform is edited (see edits). Replacing contours in
+        # place is caught only by invalidate()
+        contours = self.contours
+        stamp = (len(contours), edits.count())
+        previous = self._cache_contours
+        if previous is None or previous[0] is not contours or previous[1] != stamp:
+            self._cache = {}
+            self._cache_contours = (contours, stamp)
+        if key not in self._cache:
+            self._cache[key] = build()
+        return self._cache[key]
+
+    def invalidate(self):
+        """ Drop data derived from contours, e.g. after section.contours[i] = contour.
+        """
+        self._cache = {}
+        self._cache_contours = None
+
+    def contour_table(self):
+        """ Return this Section's contours as a ContourTable.
+        """
+        return self._cached("contour_table", lambda: ContourTable.from_contours(self.contours))
+
+    def normalized_points(self):
+        """ Return a list of each contour's points with its transform inverted.
+
+            Contours sharing a Transform are inverted together, in one call
+            over their concatenated points.
+        """
+        return self._cached("normalized_points", self._normalize_points)
+
+    def _normalize_points(self):
+        groups = {}
+        for i, contour in enumerate(self.contours):
+            groups.setdefault(id(contour.transform), []).append(i)
+        normalized = [None] * len(self.contours)
+        for indices in groups.values():
+            transform = self.contours[indices[0]].transform
+            point_lists = [numpy.asarray(self.contours[i].points) for i in indices]
+            for i, points in zip(indices, transform.inverse_many(point_lists)):
+                # Contours reuse these for normalized_points and shape
+                self.contours[i]._set_normalized_points(points)
+                normalized[i] = points
+        return normalized
+
+    def classify_contours(self):
+        """ Return the geometry kind of every contour, see geometry.classify_traces.
+
+            All contours are classified in one call over their normalized points.
+        """
+        return self._cached("kinds", lambda: classify_traces(
+            self.normalized_points(), [c.closed for c in self.contours]))
+
+    def trace_metrics(self):
+        """ Return the geometry.TraceMetrics (area, length, centroid and
+            extent) of every contour, in normalized coordinates: those of
+            Contour.normalized_points, which each contour's transform maps
+            to Section coordinates.
+
+            All contours are measured in one call over their normalized points.
+        """
+        return self._cached("metrics", lambda: trace_metrics(
+            self.normalized_points(), [c.closed for c in self.contours]))
+
+    def shapes(self, repair=False):
+        """ Return a Shapely geometric object for every contour, building
+            them from one classify_contours() call.
+
+            Without repair, these are also cached as the contours' shapes.
+        """
+        shapes = []
+        for contour, points, kind in zip(
+                self.contours, self.normalized_points(), self.classify_contours()):
+            if not len(points):
+                raise Exception("No points found: {}".format(contour))
+            if len(points) > 2 and contour.closed not in (True, False):
+                raise Exception("Could not deduce shape for: {}".format(contour))
+            shape = build_shape(points, kind, repair=repair)
+            if not repair:
+                contour._set_shape(shape)
+            shapes.append(shape)
+        return shapes
+
+    def contour_index(self):
+        """ Return a spatial.BoxTree over the extents of this Section's
+            contours in normalized coordinates (see trace_metrics), and the
+            position in contours of each of its boxes.
+
+            Built from trace_metrics() on first use and again only when the
+            contours change.
+        """
+        return self._cached("contour_index", self._build_contour_index)
+
+    def _build_contour_index(self):
+        extent = self.trace_metrics().extent
+        # Contours without points have no extent
+        positions = numpy.flatnonzero(~numpy.isnan(extent[:, 0]))
+        return BoxTree(extent[positions, :2], extent[positions, 2:]), positions
+
+    def _query_contours(self, query):
+        """ Return the contours whose boxes overlap query, and whose shape
+            intersects it.
+        """
+        minx, miny, maxx, maxy = query.bounds
+        tree, positions = self.contour_index()
+        candidates = positions[tree.query((minx, miny), (maxx, maxy))]
+        return [
+            self.contours[i] for i in candidates.tolist()
+            if self.contours[i].shape.intersects(query)
+        ]
+
+    def contours_at(self, x, y):
+        """ Return the contours whose shape contains or touches the point
+            (x, y), in normalized coordinates like Contour.shape.
+        """
+        return self._query_contours(Point(x, y))
+
+    def contours_in(self, bounds):
+        """ Return the contours whose shape intersects the box bounds,
+            (minx, miny, maxx, maxy) in normalized coordinates like
+            Contour.shape.
+        """
+        return self._query_contours(box(*bounds))
+
+    def nearest_contours(self, x, y, k=1):
+        """ Return the k contours nearest to the point (x, y), in normalized
+            coordinates like Contour.shape, as a list of (Contour, distance),
+            nearest first.
+        """
+        tree, positions = self.contour_index()
+        point = Point(x, y)
+
+        def distances(indices, _):
+            return [self.contours[positions[i]].shape.distance(point) for i in indices]
+
+        return [
+            (self.contours[positions[i]], distance)
+            for i, distance in itertools.islice(tree.iter_nearest((x, y), distances), k)
+        ]
+
+    def use_inverse_grids(self, shape=(64, 64)):
+        """ Give each polynomial Transform of this Section's contours an
+            inverse grid over the extent of the contours using it.
+
+            See Transform.use_inverse_grid.
+        """
+        groups = {}
+        for contour in self.contours:
+            if len(contour.points):
+                groups.setdefault(id(contour.transform), []).append(contour)
+        for contours in groups.values():
+            points = numpy.concatenate([numpy.asarray(c.points) for c in contours])
+            bounds = tuple(points.min(axis=0)) + tuple(points.max(axis=0))
+            contours[0].transform.use_inverse_grid(bounds, shape=shape)
+
     def attributes(self):
         """ Return a dict of this Section's attributes.
         """
@@ -1,3 +1,65 @@
+from collections import OrderedDict
+from collections.abc import MutableMapping
+
+
+class LazySections(MutableMapping):
+    """ Mapping of Section index to Section that loads Sections on first access.
+
+        paths maps each Section index to its file and loader(path) returns the
+        Section. At most max_resident loaded Sections are kept; the least
+        recently used one is dropped when another is loaded. Sections assigned
+        with sections[index] = section are never dropped, so assign a Section
+        back after editing it in place to keep the edits.
+    """
+
+    def __init__(self, paths, loader, max_resident=None):
+        self._paths = dict(paths)
+        self._loader = loader
+        self.max_resident = max_resident
+        self._resident = OrderedDict()
+        self._pinned = {}
+
+    def __getitem__(self, index):
+        if index in self._pinned:
+            return self._pinned[index]
+        if index in self._resident:
+            self._resident.move_to_end(index)
+            return self._resident[index]
+        if index not in self._paths:
+            raise KeyError(index)
+        section = self._loader(self._paths[index])
+        self._resident[index] = section
+        if self.max_resident is not None:
+            while len(self._resident) > max(self.max_resident, 0):
+                self._resident.popitem(last=False)
+        return section
+
+    def __setitem__(self, index, section):
+        self._resident.pop(index, None)
+        self._pinned[index] = section
+
+    def __delitem__(self, index):
+        if index not in self:
+            raise KeyError(index)
+        self._paths.pop(index, None)
+        self._resident.pop(index, None)
+        self._pinned.pop(index, None)
+
+    def __contains__(self, index):
+        return index in self._paths or index in self._pinned
+
+    def __iter__(self):
+        return iter(sorted(set(self._paths) | set(self._pinned)))
+
+    def __len__(self):
+        return len(set(self._paths) | set(self._pinned))
+
+    def resident(self):
+        """ Return the indices of Sections currently held in memory.
+        """
+        return sorted(set(self._resident) | set(self._pinned))
+
+
 class Series(object):
     """ Class representing a RECONSTRUCT Series.
     """
@@ -97,10 +159,11 @@ class Series(object):
         self.contours = kwargs.get("contours", [])
         self.zcontours = kwargs.get("zcontours", [])
         self.sections = kwargs.get("sectons", {})
+        self.manifest = kwargs.get("manifest")
 
     def attributes(self):
         """ Return a dict of this Series" attributes.
         """
-        ignore = ["name", "path", "contours", "zcontours", "sections"]
-        attributes = {k: v for k, v in self.__dict__.iteritems() if k not in ignore}
+        ignore = ["name", "path", "contours", "zcontours", "sections", "manifest"]
+        attributes = {k: v for k, v in self.__dict__.items() if k not in ignore}
         return attributes
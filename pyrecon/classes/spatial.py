@@ -0,0 +1,132 @@
+""" Bounding box hierarchy for spatial queries over many objects.
+"""
+import heapq
+import itertools
+import math
+
+import numpy
+
+NODE_SIZE = 16
+
+
+def _str_order(centers, indices, axis, node_size):
+    """ Return indices in Sort-Tile-Recursive order: sorted into slabs along
+        axis, each slab ordered the same way along the following axes.
+    """
+    order = indices[numpy.argsort(centers[indices, axis], kind="stable")]
+    dims = centers.shape[1]
+    if axis == dims - 1:
+        return order
+    leaves = int(math.ceil(len(order) / float(node_size)))
+    slabs = int(math.ceil(leaves ** (1.0 / (dims - axis))))
+    slab_size = node_size * int(math.ceil(leaves / float(slabs)))
+    return numpy.concatenate([
+        _str_order(centers, order[i:i + slab_size], axis + 1, node_size)
+        for i in range(0, len(order), slab_size)
+    ])
+
+
+class BoxTree(object):
+    """ Sort-Tile-Recursive packed tree of axis-aligned boxes.
+
+        mins and maxs are (N, D) arrays of the lower and upper corners of N
+        boxes. Boxes are grouped node_size at a time into parent boxes, level
+        by level, so queries test whole levels with array operations.
+    """
+
+    def __init__(self, mins, maxs, node_size=NODE_SIZE):
+        mins = numpy.asarray(mins, dtype=numpy.float64)
+        maxs = numpy.asarray(maxs, dtype=numpy.float64)
+        self.node_size = node_size
+        if not len(mins):
+            self._order = numpy.zeros(0, dtype=numpy.intp)
+            self._levels = []
+            return
+        centers = (mins + maxs) / 2
+        self._order = _str_order(centers, numpy.arange(len(mins)), 0, node_size)
+        # Level 0 holds the boxes, each further level their parents' boxes
+        self._levels = [(mins[self._order], maxs[self._order])]
+        while len(self._levels[-1][0]) > 1:
+            level_mins, level_maxs = self._levels[-1]
+            starts = numpy.arange(0, len(level_mins), node_size)
+            self._levels.append((
+                numpy.minimum.reduceat(level_mins, starts),
+                numpy.maximum.reduceat(level_maxs, starts),
+            ))
+
+    def __len__(self):
+        return len(self._order)
+
+    def _children(self, level, nodes):
+        """ Return the indices at level - 1 of the children of nodes.
+        """
+        children = (nodes[:, None] * self.node_size + numpy.arange(self.node_size)).ravel()
+        return children[children < len(self._levels[level - 1][0])]
+
+    def query(self, mins, maxs):
+        """ Return the indices of the boxes overlapping the box from mins to maxs.
+        """
+        if not self._levels:
+            return numpy.zeros(0, dtype=numpy.intp)
+        mins = numpy.asarray(mins, dtype=numpy.float64)
+        maxs = numpy.asarray(maxs, dtype=numpy.float64)
+        nodes = numpy.arange(len(self._levels[-1][0]))
+        for level in range(len(self._levels) - 1, -1, -1):
+            level_mins, level_maxs = self._levels[level]
+            overlap = ((level_mins[nodes] <= maxs) & (level_maxs[nodes] >= mins)).all(axis=1)
+            nodes = nodes[overlap]
+            if level:
+                nodes = self._children(level, nodes)
+        return numpy.sort(self._order[nodes])
+
+    def _box_distances(self, level, nodes, point):
+        level_mins, level_maxs = self._levels[level]
+        gap = numpy.maximum(
+            numpy.maximum(level_mins[nodes] - point, point - level_maxs[nodes]), 0.0)
+        return numpy.sqrt((gap ** 2).sum(axis=1))
+
+    def iter_nearest(self, point, distances):
+        """ Yield (index, distance) of boxes in order of the distance from
+            point to their objects, nearest first.
+
+            distances(indices, point) returns the exact distances from point
+            to the objects of the given boxes; each must be at least the
+            distance to its box. Objects are only measured once every nearer
+            box has been yielded or ruled out.
+        """
+        if not self._levels:
+            return
+        point = numpy.asarray(point, dtype=numpy.float64)
+        top = len(self._levels) - 1
+        heap = []
+        if top == 0:
+            self._push_objects(heap, numpy.arange(len(self._order)), point, distances)
+        else:
+            self._push_nodes(heap, top, numpy.arange(len(self._levels[top][0])), point)
+        while heap:
+            distance, is_node, level, index = heapq.heappop(heap)
+            if not is_node:
+                yield index, distance
+                continue
+            children = self._children(level, numpy.array([index]))
+            if level == 1:
+                self._push_objects(heap, children, point, distances)
+            else:
+                self._push_nodes(heap, level - 1, children, point)
+
+    def nearest(self, point, distances, k=1):
+        """ Return the indices of the k boxes whose objects are nearest to
+            point, and their distances, nearest first. See iter_nearest.
+        """
+        found = list(itertools.islice(self.iter_nearest(point, distances), k))
+        return (numpy.array([i for i, _ in found], dtype=numpy.intp),
+                numpy.array([d for _, d in found]))
+
+    def _push_nodes(self, heap, level, nodes, point):
+        for d, node in zip(self._box_distances(level, nodes, point).tolist(), nodes.tolist()):
+            heapq.heappush(heap, (d, 1, level, node))
+
+    def _push_objects(self, heap, positions, point, distances):
+        indices = self._order[positions]
+        for d, index in zip(numpy.asarray(distances(indices, point)).tolist(), indices.tolist()):
+            heapq.heappush(heap, (d, 0, 0, index))
@@ -1,6 +1,132 @@
+from functools import lru_cache
+
 import numpy as np
 from skimage import transform as tf
 
+from . import edits
+
+
+def polynomial_forward(a, b, pts):
+    """ Return RECONSTRUCT polynomial coefficients a, b applied to an (N, 2) array.
+    """
+    x, y = pts[:, 0], pts[:, 1]
+    u = a[0] + a[1] * x + a[2] * y + a[3] * x * y + a[4] * x * x + a[5] * y * y
+    v = b[0] + b[1] * x + b[2] * y + b[3] * x * y + b[4] * x * x + b[5] * y * y
+    return np.column_stack((u, v))
+
+
+def polynomial_inverse(a, b, pts, epsilon=5e-10, max_iter=100, guess=None):
+    """ Return the (x, y) that polynomial_forward maps to each row of pts.
+
+        Newton's method runs on all points at once; points stop being updated
+        once abs(u - u0) + abs(v - v0) <= epsilon. Where the Jacobian is
+        singular, the Jacobian transpose is used for that step instead.
+        guess is an optional (N, 2) array of starting points (default 0, 0).
+    """
+    pts = np.asarray(pts, dtype=np.float64).reshape(-1, 2)
+    u, v = pts[:, 0], pts[:, 1]
+    if guess is None:
+        x = np.zeros(len(pts))
+        y = np.zeros(len(pts))
+    else:
+        guess = np.asarray(guess, dtype=np.float64)
+        x = guess[:, 0].copy()
+        y = guess[:, 1].copy()
+    # Every point takes at least one step
+    active = np.arange(len(pts))
+    xa, ya = x, y
+    uv0 = polynomial_forward(a, b, np.column_stack((xa, ya)))
+    for _ in range(max_iter):
+        if not len(active):
+            break
+        du = u[active] - uv0[:, 0]
+        dv = v[active] - uv0[:, 1]
+        # compute Jacobian
+        l = a[1] + a[3] * ya + 2.0 * a[4] * xa
+        m = a[2] + a[3] * xa + 2.0 * a[5] * ya
+        n = b[1] + b[3] * ya + 2.0 * b[4] * xa
+        o = b[2] + b[3] * xa + 2.0 * b[5] * ya
+        p = l * o - m * n  # determinant for inverse
+        invertible = np.abs(p) > epsilon
+        p = np.where(invertible, p, 1.0)
+        # increment by inverse of Jacobian, or else by its transpose
+        xa = xa + np.where(invertible, (o * du - m * dv) / p, l * du + n * dv)
+        ya = ya + np.where(invertible, (l * dv - n * du) / p, m * du + o * dv)
+        x[active] = xa
+        y[active] = ya
+        # compute closeness to goal, and drop converged points
+        uv0 = polynomial_forward(a, b, np.column_stack((xa, ya)))
+        e = np.abs(u[active] - uv0[:, 0]) + np.abs(v[active] - uv0[:, 1])
+        keep = e > epsilon
+        active = active[keep]
+        xa, ya, uv0 = xa[keep], ya[keep], uv0[keep]
+    return np.column_stack((x, y))
+
+
+class InverseGrid(object):
+    """ Inverse of a polynomial transform sampled on a regular grid.
+
+        bounds is (minx, miny, maxx, maxy) in transformed coordinates, and
+        shape the number of (rows, columns) of grid nodes. guess() returns a
+        bilinear interpolation of the inverse at each point, clamped to the
+        grid edges for points outside bounds.
+    """
+
+    def __init__(self, xcoef, ycoef, bounds, shape=(64, 64)):
+        minx, miny, maxx, maxy = [float(x) for x in bounds]
+        rows, cols = max(2, shape[0]), max(2, shape[1])
+        self.bounds = (minx, miny, maxx, maxy)
+        self.shape = (rows, cols)
+        self._origin = np.array([minx, miny])
+        # Degenerate bounds still give a usable (flat) grid
+        self._step = np.array([
+            (maxx - minx) / (cols - 1) or 1.0,
+            (maxy - miny) / (rows - 1) or 1.0,
+        ])
+        u, v = np.meshgrid(
+            minx + self._step[0] * np.arange(cols),
+            miny + self._step[1] * np.arange(rows),
+        )
+        nodes = np.column_stack((u.ravel(), v.ravel()))
+        self.values = polynomial_inverse(xcoef, ycoef, nodes).reshape(rows, cols, 2)
+        self._x = np.ascontiguousarray(self.values[:, :, 0]).ravel()
+        self._y = np.ascontiguousarray(self.values[:, :, 1]).ravel()
+
+    def guess(self, pts):
+        """ Return the interpolated inverse of each row of an (N, 2) array.
+        """
+        rows, cols = self.shape
+        fx = np.clip((pts[:, 0] - self._origin[0]) / self._step[0], 0, cols - 1)
+        fy = np.clip((pts[:, 1] - self._origin[1]) / self._step[1], 0, rows - 1)
+        i = np.minimum(fx.astype(np.intp), cols - 2)
+        j = np.minimum(fy.astype(np.intp), rows - 2)
+        tx = fx - i
+        ty = fy - j
+        # Flat index of the lower-left node of each point's cell
+        k = j * cols + i
+        guess = np.empty((len(pts), 2))
+        for column, values in enumerate((self._x, self._y)):
+            bottom = values[k] + tx * (values[k + 1] - values[k])
+            top = values[k + cols] + tx * (values[k + cols + 1] - values[k + cols])
+            guess[:, column] = bottom + ty * (top - bottom)
+        return guess
+
+
+class PolynomialTransform(tf.PolynomialTransform):
+    """ skimage PolynomialTransform with RECONSTRUCT's iterative inverse.
+    """
+
+    def __init__(self, params, xcoef, ycoef):
+        super(PolynomialTransform, self).__init__(params)
+        self.xcoef = xcoef
+        self.ycoef = ycoef
+
+    def inverse(self, coords):
+        """ Return coords mapped back through this transform, see polynomial_inverse.
+        """
+        pts = np.asarray(coords, dtype=np.float64).reshape(-1, 2)
+        return polynomial_inverse(self.xcoef, self.ycoef, pts)
+
 
 def get_skimage_transform(xcoef=None, ycoef=None, dim=None):
     """ Returns a skimage.transform.
@@ -36,73 +162,373 @@ def get_skimage_transform(xcoef=None, ycoef=None, dim=None):
             [a[0], a[1], a[2], a[4], a[3], a[5], b[0], b[1], b[2], b[4], b[3], b[5]]
         ).reshape((2, 6))
         # create matrix of coefficients
-        tforward = tf.PolynomialTransform(tmatrix)
-
-        def getrevt(pts):  # pts are a np.array
-            newpts = []  # list of final estimates of (x,y)
-            for i in range(len(pts)):
-                # (u,v) for which we want (x,y)
-                u, v = pts[i, 0], pts[i, 1]  # input pts
-                # initial guess of (x,y)
-                x0, y0 = 0.0, 0.0
-                # get forward tform of initial guess
-                uv0 = tforward(np.array([x0, y0]).reshape([1, 2]))[0]
-                u0 = uv0[0]
-                v0 = uv0[1]
-                e = 1.0  # reduce error to this limit
-                epsilon = 5e-10
-                i = 0
-                while e > epsilon and i < 100:  # NOTE: 10 -> 100
-                    i += 1
-                    # compute Jacobian
-                    l = a[1] + a[3] * y0 + 2.0 * a[4] * x0
-                    m = a[2] + a[3] * x0 + 2.0 * a[5] * y0
-                    n = b[1] + b[3] * y0 + 2.0 * b[4] * x0
-                    o = b[2] + b[3] * x0 + 2.0 * b[5] * y0
-                    p = l * o - m * n  # determinant for inverse
-                    if abs(p) > epsilon:
-                        # increment x0,y0 by inverse of Jacobian
-                        x0 = x0 + ((o * (u - u0) - m * (v - v0)) / p)
-                        y0 = y0 + ((l * (v - v0) - n * (u - u0)) / p)
-                    else:
-                        # try Jacobian transpose instead
-                        x0 = x0 + (l * (u - u0) + n * (v - v0))
-                        y0 = y0 + (m * (u - u0) + o * (v - v0))
-                    # get forward tform of current guess
-                    uv0 = tforward(np.array([x0, y0]).reshape([1, 2]))[0]
-                    u0 = uv0[0]
-                    v0 = uv0[1]
-                    # compute closeness to goal
-                    e = abs(u - u0) + abs(v - v0)
-                # append final estimate of (x,y) to newpts list
-                newpts.append((x0, y0))
-            newpts = np.asarray(newpts)
-            return newpts
-        tforward.inverse = getrevt
-        return tforward
-
-
-class Transform(object):
+        return PolynomialTransform(tmatrix, a, b)
+
+
+@lru_cache(maxsize=1024)
+def _shared_skimage_transform(key):
+    """ Return the skimage transform for a Transform.key, built once per key.
+    """
+    dim, xcoef, ycoef = key
+    return get_skimage_transform(xcoef=list(xcoef), ycoef=list(ycoef), dim=dim)
+
+
+def _design_matrices(src, dst, dim):
+    """ Return [(A, target), ...] for the x and y axes of a least squares fit
+        of a dim transform, such that A.dot(coefficients) ~ target.
+    """
+    x, y = src[:, 0], src[:, 1]
+    ones = np.ones(len(src))
+    if dim == 1:
+        return [(ones[:, None], dst[:, 0] - x), (ones[:, None], dst[:, 1] - y)]
+    if dim == 2:
+        return [(np.column_stack((ones, x)), dst[:, 0]), (np.column_stack((ones, y)), dst[:, 1])]
+    A = np.column_stack((ones, x, y, x * y, x * x, y * y))[:, :dim]
+    return [(A, dst[:, 0]), (A, dst[:, 1])]
+
+
+def _coefficients(solutions, dim):
+    """ Return (xcoef, ycoef) for a dim Transform from per-axis solutions.
+    """
+    xsol, ysol = [list(map(float, sol)) for sol in solutions]
+    if dim == 1:
+        xcoef = [xsol[0], 1.0, 0.0]
+        ycoef = [ysol[0], 0.0, 1.0]
+    else:
+        xcoef = xsol
+        ycoef = ysol
+    return xcoef + [0.0] * (6 - len(xcoef)), ycoef + [0.0] * (6 - len(ycoef))
+
+
+def n_parameters(dim):
+    """ Return the number of coefficients fit per axis for a dim transform.
+    """
+    return {0: 0, 1: 1, 2: 2}.get(dim, dim)
+
+
+def estimate_transforms(src, dst, groups, dim=3):
+    """ Return {group: Transform} fitting dst ~ Transform(src) for each group.
+
+        src and dst are (N, 2) arrays of corresponding points, and groups an
+        (N,) array of labels, e.g. section indices. The normal equations of
+        every group are built and solved at once. Groups with fewer points
+        than the transform has coefficients are left out.
+    """
+    src = np.asarray(src, dtype=np.float64).reshape(-1, 2)
+    dst = np.asarray(dst, dtype=np.float64).reshape(-1, 2)
+    labels, group_ids = np.unique(np.asarray(groups), return_inverse=True)
+    counts = np.bincount(group_ids, minlength=len(labels))
+    if dim == 0:
+        return {label: Transform(dim=0, xcoef=[0, 1, 0, 0, 0, 0], ycoef=[0, 0, 1, 0, 0, 0])
+                for label in labels}
+    if dim not in range(1, 7):
+        raise Exception("Cannot estimate a transform of dim {}".format(dim))
+
+    solutions = []
+    for A, target in _design_matrices(src, dst, dim):
+        p = A.shape[1]
+        ata = np.empty((len(labels), p, p))
+        atb = np.empty((len(labels), p))
+        for i in range(p):
+            atb[:, i] = np.bincount(group_ids, weights=A[:, i] * target, minlength=len(labels))
+            for j in range(i, p):
+                ata[:, i, j] = ata[:, j, i] = np.bincount(
+                    group_ids, weights=A[:, i] * A[:, j], minlength=len(labels))
+        solutions.append(np.einsum("kij,kj->ki", np.linalg.pinv(ata), atb))
+
+    transforms = {}
+    for k, label in enumerate(labels):
+        if counts[k] < n_parameters(dim):
+            continue
+        xcoef, ycoef = _coefficients([solutions[0][k], solutions[1][k]], dim)
+        transforms[label] = Transform(dim=dim, xcoef=xcoef, ycoef=ycoef)
+    return transforms
+
+
+def _split(points, counts):
+    """ Return points split into consecutive arrays of the given lengths.
+    """
+    return np.split(points, np.cumsum(counts)[:-1]) if len(counts) else []
+
+
+def _as_points(points):
+    return np.asarray(points, dtype=np.float64).reshape(-1, 2)
+
+
+class TransformOperations(object):
+    """ Operations shared by Transform, TransformChain and InverseTransform.
+
+        Subclasses define apply(points) and apply_inverse(points) on (N, 2) arrays.
+    """
+
+    def __call__(self, points):
+        return self.apply(points)
+
+    def apply_many(self, point_lists):
+        """ Return apply() of each array in point_lists, using one call on
+            their concatenation.
+        """
+        return self._many(self.apply, point_lists)
+
+    def inverse_many(self, point_lists):
+        """ Return apply_inverse() of each array in point_lists, using one
+            call on their concatenation.
+        """
+        return self._many(self.apply_inverse, point_lists)
+
+    @staticmethod
+    def _many(func, point_lists):
+        point_lists = [_as_points(points) for points in point_lists]
+        if not point_lists:
+            return []
+        counts = [len(points) for points in point_lists]
+        return _split(func(np.concatenate(point_lists)), counts)
+
+    def compose(self, other):
+        """ Return a transform that applies self, then other.
+        """
+        return TransformChain([self, other])
+
+    def inverted(self):
+        """ Return a transform that undoes this one.
+        """
+        return InverseTransform(self)
+
+
+class TransformChain(TransformOperations):
+    """ Transforms applied one after another, first to last.
+    """
+
+    def __init__(self, transforms):
+        self.transforms = []
+        for transform in transforms:
+            if isinstance(transform, TransformChain):
+                self.transforms.extend(transform.transforms)
+            else:
+                self.transforms.append(transform)
+
+    def apply(self, points):
+        points = _as_points(points)
+        for transform in self.transforms:
+            points = transform.apply(points)
+        return points
+
+    def apply_inverse(self, points):
+        points = _as_points(points)
+        for transform in reversed(self.transforms):
+            points = transform.apply_inverse(points)
+        return points
+
+    def inverted(self):
+        return TransformChain([t.inverted() for t in reversed(self.transforms)])
+
+
+class InverseTransform(TransformOperations):
+    """ The inverse of a transform without a closed-form inverse.
+    """
+
+    def __init__(self, transform):
+        self.transform = transform
+
+    def apply(self, points):
+        return self.transform.apply_inverse(points)
+
+    def apply_inverse(self, points):
+        return self.transform.apply(points)
+
+    def inverted(self):
+        return self.transform
+
+
+class Transform(TransformOperations):
     """ Class representing a RECONSTRUCT Transform.
     """
 
+    # Reassigning these is an edit, see edits. Lists edited in place are
+    # not noticed, so assign new ones
+    dim = edits.edited_property("dim")
+    xcoef = edits.edited_property("xcoef")
+    ycoef = edits.edited_property("ycoef")
+
     def __init__(self, **kwargs):
         """ Assign instance attributes to provided args/kwargs.
         """
-        self.dim = kwargs.get("dim")
-        self.xcoef = kwargs.get("xcoef")
-        self.ycoef = kwargs.get("ycoef")
+        self._dim = kwargs.get("dim")
+        self._xcoef = kwargs.get("xcoef")
+        self._ycoef = kwargs.get("ycoef")
+        self._tform_key = None
+        self._tform_cache = None
+        # (key, InverseGrid) pairs, see use_inverse_grid
+        self._inverse_grids = []
+
+    @property
+    def key(self):
+        """ Return a hashable (dim, xcoef, ycoef) tuple identifying this transform.
+        """
+        return (self.dim, tuple(self.xcoef or ()), tuple(self.ycoef or ()))
 
     @property
     def _tform(self):
         """ Return a skimage transform object.
+
+            Transforms with equal coefficients share one skimage transform,
+            which is looked up again only when dim, xcoef or ycoef change.
+        """
+        key = self.key
+        if key != self._tform_key:
+            self._tform_cache = _shared_skimage_transform(key)
+            self._tform_key = key
+        return self._tform_cache
+
+    def __getstate__(self):
+        """ Leave the skimage transform out of pickles.
+        """
+        state = self.__dict__.copy()
+        state["_tform_key"] = None
+        state["_tform_cache"] = None
+        state["_inverse_grids"] = []
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.__dict__.setdefault("_tform_key", None)
+        self.__dict__.setdefault("_tform_cache", None)
+        self.__dict__.setdefault("_inverse_grids", [])
+
+    @classmethod
+    def from_matrix(cls, matrix):
+        """ Return an affine (dim 3) Transform from a 3x3 matrix.
         """
-        return get_skimage_transform(
-            xcoef=self.xcoef,
-            ycoef=self.ycoef,
-            dim=self.dim
+        m = np.asarray(matrix, dtype=np.float64)
+        return cls(
+            dim=3,
+            xcoef=[float(m[0, 2]), float(m[0, 0]), float(m[0, 1]), 0.0, 0.0, 0.0],
+            ycoef=[float(m[1, 2]), float(m[1, 0]), float(m[1, 1]), 0.0, 0.0, 0.0],
         )
 
+    @classmethod
+    def scaling(cls, factor):
+        """ Return a Transform that multiplies points by factor.
+        """
+        return cls.from_matrix([[factor, 0, 0], [0, factor, 0], [0, 0, 1]])
+
+    @classmethod
+    def estimate(cls, src, dst, dim=3, ransac=False, residual_threshold=0.01,
+                 max_trials=100, random_state=None):
+        """ Return the dim Transform that best maps src onto dst, (N, 2) arrays
+            of corresponding points, by least squares.
+
+            dim 1 fits a translation, 2 a scale and translation, 3 an affine
+            transform and 4-6 RECONSTRUCT's polynomial terms (1, x, y, xy,
+            x^2, y^2), dim of them. With ransac=True the fit uses only the
+            largest set of points found within residual_threshold of a fit to
+            a random minimal sample. Returns None if there are too few points.
+        """
+        src = np.asarray(src, dtype=np.float64).reshape(-1, 2)
+        dst = np.asarray(dst, dtype=np.float64).reshape(-1, 2)
+        n = n_parameters(dim)
+        if len(src) < n:
+            return None
+        if ransac and n and len(src) > n:
+            random_state = np.random.RandomState(random_state)
+            best = None
+            for _ in range(max_trials):
+                sample = random_state.choice(len(src), n, replace=False)
+                candidate = estimate_transforms(src[sample], dst[sample], np.zeros(n), dim=dim)[0]
+                residuals = np.hypot(*(candidate.apply(src) - dst).T)
+                inliers = residuals < residual_threshold
+                if best is None or inliers.sum() > best.sum():
+                    best = inliers
+            if best.sum() >= n:
+                src, dst = src[best], dst[best]
+        return estimate_transforms(src, dst, np.zeros(len(src)), dim=dim)[0]
+
+    def matrix(self):
+        """ Return the 3x3 matrix of an affine transform, or None if not affine.
+
+            The matrix is a copy: the skimage transform it comes from is
+            shared by every Transform with the same coefficients.
+        """
+        if self.dim in range(0, 4):
+            return self._tform.params.copy()
+        if self.dim in range(4, 7) and self.isAffine():
+            a = self.xcoef
+            b = self.ycoef
+            return np.array([[a[1], a[2], a[0]], [b[1], b[2], b[0]], [0, 0, 1]], dtype=np.float64)
+        return None
+
+    def use_inverse_grid(self, bounds, shape=(64, 64)):
+        """ Speed up apply_inverse of a polynomial (dim 4-6) Transform over
+            bounds, (minx, miny, maxx, maxy) in Section coordinates.
+
+            Newton's method starts from an InverseGrid over bounds for points
+            that all lie within it. Grids are kept on this Transform, one per
+            bounds, so Sections sharing it each keep the grid over their own
+            extent; they are dropped when the coefficients change. Results
+            meet the same tolerance either way. Returns False (doing nothing)
+            for other dims.
+        """
+        if not isinstance(self._tform, PolynomialTransform):
+            return False
+        key = self.key
+        bounds = tuple(float(x) for x in bounds)
+        self._inverse_grids = [
+            (k, grid) for k, grid in self._inverse_grids if k == key and grid.bounds != bounds
+        ]
+        self._inverse_grids.append((key, InverseGrid(self.xcoef, self.ycoef, bounds, shape=shape)))
+        return True
+
+    def _inverse_grid_for(self, pts):
+        """ Return an inverse grid of this Transform covering pts, or None.
+        """
+        if not self._inverse_grids or not len(pts):
+            return None
+        key = self.key
+        low = pts.min(axis=0)
+        high = pts.max(axis=0)
+        for k, grid in self._inverse_grids:
+            minx, miny, maxx, maxy = grid.bounds
+            if k == key and minx <= low[0] and miny <= low[1] and maxx >= high[0] \
+               and maxy >= high[1]:
+                return grid
+        return None
+
+    def apply(self, points):
+        """ Return an (N, 2) array of points mapped through this transform.
+        """
+        return self._tform(_as_points(points))
+
+    def apply_inverse(self, points):
+        """ Return an (N, 2) array of points mapped back through this transform.
+        """
+        pts = _as_points(points)
+        grid = self._inverse_grid_for(pts)
+        if grid is not None:
+            return polynomial_inverse(self.xcoef, self.ycoef, pts, guess=grid.guess(pts))
+        return self._tform.inverse(pts)
+
+    def compose(self, other):
+        """ Return a transform that applies self, then other.
+
+            Two affine Transforms compose to a single affine Transform.
+        """
+        if isinstance(other, Transform):
+            first = self.matrix()
+            second = other.matrix()
+            if first is not None and second is not None:
+                return Transform.from_matrix(second.dot(first))
+        return super(Transform, self).compose(other)
+
+    def inverted(self):
+        """ Return a transform that undoes this one.
+
+            The inverse of an affine Transform is an affine Transform.
+        """
+        matrix = self.matrix()
+        if matrix is not None:
+            return Transform.from_matrix(np.linalg.inv(matrix))
+        return super(Transform, self).inverted()
+
     def __eq__(self, other):
         """ Allow use of == operator.
         """
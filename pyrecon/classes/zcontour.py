@@ -1,6 +1,44 @@
 import numpy
 from shapely.geometry import LineString, Polygon
 
+from .points import as_point_array, points_equal
+from .spatial import BoxTree
+
+
+def section_depths(sections):
+    """ Return {section index: z} for a mapping of Section index to Section,
+        the z of a Section being the sum of the thicknesses of those before it.
+    """
+    depths = {}
+    z = 0.0
+    for index in sorted(sections):
+        depths[index] = z
+        z += sections[index].thickness or 0.0
+    return depths
+
+
+def _depths_of(indices, depths):
+    """ Return the z of each Section index, see ZContour.coordinates.
+    """
+    if not isinstance(depths, dict):
+        return indices * depths
+    keys, inverse = numpy.unique(indices.astype(numpy.intp), return_inverse=True)
+    missing = [k for k in keys.tolist() if k not in depths]
+    if missing:
+        raise Exception("No depth for section(s): {}".format(missing))
+    return numpy.array([depths[k] for k in keys.tolist()], dtype=numpy.float64)[inverse]
+
+
+def _segments(coordinates, closed):
+    """ Return the start and end points of a polyline's segments. A single
+        point is one segment of zero length.
+    """
+    if len(coordinates) == 1:
+        return coordinates, coordinates
+    if closed is True:
+        return coordinates, numpy.roll(coordinates, -1, axis=0)
+    return coordinates[:-1], coordinates[1:]
+
 
 class ZContour(object):
     """ Class representing a RECONSTRUCT ZContour.
@@ -21,7 +59,10 @@ class ZContour(object):
         """
         to_compare = ["name", "points", "closed"]
         for k in to_compare:
-            if getattr(self, k) != getattr(other, k):
+            if k == "points":
+                if not points_equal(self.points, other.points):
+                    return False
+            elif getattr(self, k) != getattr(other, k):
                 return False
         return True
 
@@ -30,11 +71,66 @@ class ZContour(object):
         """
         return not self.__eq__(other)
 
+    @property
+    def points(self):
+        """ Return points as an (N, 3) float64 array of x, y and Section index.
+
+            The Section index is stored as a float with the coordinates; see
+            point_list for integer indices.
+        """
+        return self._points
+
+    @points.setter
+    def points(self, points):
+        self._points = as_point_array(points, dims=3)
+
+    @property
+    def point_list(self):
+        """ Return points as a list of (x, y, section) tuples, section an int
+            as read from the series file.
+        """
+        return [(x, y, int(section)) for x, y, section in self.points.tolist()]
+
+    def coordinates(self, depths):
+        """ Return points as an (N, 3) array of x, y and z.
+
+            depths maps each Section index to its z (see section_depths), or
+            is a single Section thickness.
+        """
+        coordinates = self.points.copy()
+        coordinates[:, 2] = _depths_of(self.points[:, 2], depths)
+        return coordinates
+
+    def length(self, depths):
+        """ Return the 3D length of this ZContour, see coordinates.
+        """
+        starts, ends = _segments(self.coordinates(depths), self.closed)
+        return float(numpy.sqrt(((ends - starts) ** 2).sum(axis=1)).sum())
+
+    def resample(self, spacing, depths):
+        """ Return points spaced evenly along this ZContour in 3D, no further
+            than spacing apart, as an (N, 3) array of x, y and z.
+
+            The first and last points are kept.
+        """
+        coordinates = self.coordinates(depths)
+        if len(coordinates) < 2:
+            return coordinates
+        if self.closed is True:
+            coordinates = numpy.vstack((coordinates, coordinates[:1]))
+        travelled = numpy.concatenate(([0.0], numpy.cumsum(
+            numpy.sqrt((numpy.diff(coordinates, axis=0) ** 2).sum(axis=1)))))
+        samples = numpy.linspace(
+            0.0, travelled[-1], max(int(numpy.ceil(travelled[-1] / spacing)), 1) + 1)
+        return numpy.column_stack([
+            numpy.interp(samples, travelled, coordinates[:, axis]) for axis in range(3)
+        ])
+
     @property
     def shape(self):
         """ Return a Shapely geometric object.
         """
-        if not self.points:
+        if not len(self.points):
             raise Exception("No points found: {}".format(self))
 
         array = numpy.asarray(self.points)
@@ -43,3 +139,81 @@ class ZContour(object):
         if len(array) == 2:
             return LineString(array)
         return Polygon(array)
+
+
+class ZContourIndex(object):
+    """ Spatial index of ZContours in x, y and z, see ZContour.coordinates.
+
+        Every segment of every ZContour is held in one set of arrays and a
+        BoxTree over their bounding boxes.
+    """
+
+    def __init__(self, zcontours, depths):
+        self.zcontours = [z for z in zcontours if len(z.points)]
+        starts, ends = [], []
+        for zcontour in self.zcontours:
+            segment_starts, segment_ends = _segments(zcontour.coordinates(depths), zcontour.closed)
+            starts.append(segment_starts)
+            ends.append(segment_ends)
+        counts = numpy.array([len(s) for s in starts], dtype=numpy.intp)
+        self._owners = numpy.repeat(numpy.arange(len(self.zcontours)), counts)
+        self._starts = numpy.concatenate(starts) if starts else numpy.zeros((0, 3))
+        self._ends = numpy.concatenate(ends) if ends else numpy.zeros((0, 3))
+        self._tree = BoxTree(
+            numpy.minimum(self._starts, self._ends), numpy.maximum(self._starts, self._ends))
+
+    def lengths(self):
+        """ Return the 3D length of every ZContour, in one pass over all segments.
+        """
+        return numpy.bincount(
+            self._owners, weights=numpy.sqrt(((self._ends - self._starts) ** 2).sum(axis=1)),
+            minlength=len(self.zcontours))
+
+    def _distances(self, segments, point):
+        """ Return the distance from point to each given segment.
+        """
+        starts, ends = self._starts[segments], self._ends[segments]
+        direction = ends - starts
+        squared = (direction ** 2).sum(axis=1)
+        with numpy.errstate(divide="ignore", invalid="ignore"):
+            t = numpy.where(
+                squared > 0, ((point - starts) * direction).sum(axis=1) / squared, 0.0)
+        closest = starts + numpy.clip(t, 0.0, 1.0)[:, None] * direction
+        return numpy.sqrt(((point - closest) ** 2).sum(axis=1))
+
+    def in_box(self, mins, maxs):
+        """ Return the ZContours passing through the box from mins to maxs,
+            each (x, y, z).
+        """
+        mins = numpy.asarray(mins, dtype=numpy.float64)
+        maxs = numpy.asarray(maxs, dtype=numpy.float64)
+        segments = self._tree.query(mins, maxs)
+        starts = self._starts[segments]
+        direction = self._ends[segments] - starts
+        # Clip each segment to the box (Liang-Barsky). Along axes a segment
+        # is parallel to, its bounding box overlapping the box is enough
+        with numpy.errstate(divide="ignore", invalid="ignore"):
+            low = (mins - starts) / direction
+            high = (maxs - starts) / direction
+        parallel = direction == 0
+        low[parallel] = -numpy.inf
+        high[parallel] = numpy.inf
+        enter = numpy.maximum(numpy.minimum(low, high).max(axis=1), 0.0)
+        leave = numpy.minimum(numpy.maximum(low, high).min(axis=1), 1.0)
+        owners = numpy.unique(self._owners[segments[enter <= leave]])
+        return [self.zcontours[i] for i in owners]
+
+    def nearest(self, point, k=1):
+        """ Return the k ZContours nearest to point, (x, y, z), as a list of
+            (ZContour, distance), nearest first.
+        """
+        found = []
+        seen = set()
+        for segment, distance in self._tree.iter_nearest(point, self._distances):
+            owner = self._owners[segment]
+            if owner not in seen:
+                seen.add(owner)
+                found.append((self.zcontours[owner], distance))
+                if len(found) == k:
+                    break
+        return found
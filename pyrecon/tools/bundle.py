@@ -0,0 +1,273 @@
+"""Functions for reading and writing binary Series bundles.
+
+A bundle is a directory holding a JSON header (Series attributes, Series
+contours, Section attributes and palettes) and one .npy file per contour
+column. Columns are shared by all Sections, so a Section is a slice of each,
+and the reader opens them with numpy.memmap instead of parsing anything.
+"""
+import json
+import os
+
+import numpy
+
+from pyrecon.classes import Contour, Image, Section, Series, Transform, ZContour
+from pyrecon.classes.contour_table import NO_COLOR, ContourTable
+from pyrecon.classes.series import LazySections
+
+BUNDLE_VERSION = 1
+HEADER_FILENAME = "header.json"
+COLUMNS = [
+    "points",
+    "offsets",
+    "name_codes",
+    "comment_codes",
+    "flags",
+    "modes",
+    "border_codes",
+    "fill_codes",
+    "transform_ids",
+    "borders",
+    "fills",
+]
+
+
+class _Palette(object):
+    """ Assigns a stable code to each distinct value.
+    """
+
+    def __init__(self):
+        self.values = []
+        self._codes = {}
+
+    def codes(self, values):
+        """ Return an int32 array of the codes of values, adding new ones.
+        """
+        codes = numpy.empty(len(values), dtype=numpy.int32)
+        for i, value in enumerate(values):
+            code = self._codes.get(value)
+            if code is None:
+                code = self._codes[value] = len(self.values)
+                self.values.append(value)
+            codes[i] = code
+        return codes
+
+
+def _from_json(value):
+    """ Return JSON lists as the tuples (or lists of tuples) the classes use.
+
+        Empty lists stay lists: the classes keep sequences of entries (points,
+        color lists) in lists and only non-empty fixed-size values in tuples.
+    """
+    if isinstance(value, list):
+        if not value:
+            return []
+        if all(isinstance(v, list) for v in value):
+            return [tuple(v) for v in value]
+        return tuple(value)
+    return value
+
+
+def _color_codes(palette, colors):
+    """ Return the codes of the rows of a ContourTable color palette, coding
+        NO_COLOR rows as None: NaN never compares equal, so they would
+        otherwise each get a new entry.
+    """
+    return palette.codes([
+        None if numpy.isnan(row).any() else tuple(row)
+        for row in colors.tolist()
+    ])
+
+
+def _color_array(values):
+    return numpy.array(
+        [NO_COLOR if v is None else v for v in values], dtype=numpy.float64).reshape(-1, 3)
+
+
+def _transform_to_json(transform):
+    return {"dim": transform.dim, "xcoef": transform.xcoef, "ycoef": transform.ycoef}
+
+
+def _contour_to_json(contour, attributes):
+    data = {k: getattr(contour, k) for k in attributes}
+    data["points"] = [list(point) for point in contour.point_list]
+    return data
+
+
+def _contour_from_json(data):
+    data = {k: _from_json(v) for k, v in data.items()}
+    data["points"] = list(data["points"])
+    return data
+
+
+def write_bundle(series, path):
+    """Write series, including every Section, as a bundle directory at path."""
+    if not os.path.exists(path):
+        os.makedirs(path)
+    header_path = os.path.join(path, HEADER_FILENAME)
+    if os.path.exists(header_path):
+        os.remove(header_path)
+
+    palettes = {
+        "names": _Palette(),
+        "comments": _Palette(),
+        "borders": _Palette(),
+        "fills": _Palette(),
+        "transforms": _Palette(),
+    }
+    columns = {k: [] for k in COLUMNS if k not in ("borders", "fills")}
+    transforms = []
+    sections = []
+    n_contours = 0
+    n_points = 0
+    for index in sorted(series.sections):
+        section = series.sections[index]
+        table = ContourTable.from_contours(section.contours)
+
+        # Re-code the Section's palettes against the bundle-wide ones
+        name_map = palettes["names"].codes(table.names)
+        comment_map = palettes["comments"].codes(table.comments)
+        border_map = _color_codes(palettes["borders"], table.borders)
+        fill_map = _color_codes(palettes["fills"], table.fills)
+        keys = [
+            t.key if t is not None else None
+            for t in table.transforms
+        ]
+        transform_map = palettes["transforms"].codes(keys)
+        for code, transform in zip(transform_map, table.transforms):
+            if code == len(transforms):
+                transforms.append(transform)
+
+        columns["points"].append(table.points)
+        columns["offsets"].append(table.offsets[1:] + n_points)
+        columns["name_codes"].append(name_map[table.name_codes])
+        columns["comment_codes"].append(comment_map[table.comment_codes])
+        columns["flags"].append(table.flags)
+        columns["modes"].append(table.modes)
+        columns["border_codes"].append(border_map[table.border_codes])
+        columns["fill_codes"].append(fill_map[table.fill_codes])
+        columns["transform_ids"].append(transform_map[table.transform_ids])
+
+        sections.append({
+            "index": section.index,
+            "name": section.name,
+            "thickness": section.thickness,
+            "alignLocked": section.alignLocked,
+            "_path": section._path,
+            "images": [
+                dict(
+                    _contour_to_json(image, [
+                        "src", "mag", "contrast", "brightness", "red", "green", "blue",
+                        "name", "hidden", "closed", "simplified", "border", "fill", "mode",
+                    ]),
+                    transform=_transform_to_json(image.transform),
+                )
+                for image in section.images
+            ],
+            "contours": [n_contours, n_contours + len(table)],
+        })
+        n_contours += len(table)
+        n_points += len(table.points)
+
+    arrays = {
+        "points": numpy.concatenate(columns["points"] or [numpy.empty((0, 2))]),
+        "offsets": numpy.concatenate(
+            [numpy.zeros(1, dtype=numpy.int64)] + columns["offsets"]),
+        "borders": _color_array(palettes["borders"].values),
+        "fills": _color_array(palettes["fills"].values),
+    }
+    for k in ["name_codes", "comment_codes", "border_codes", "fill_codes", "transform_ids"]:
+        arrays[k] = numpy.concatenate(columns[k] or [numpy.empty(0, dtype=numpy.int32)])
+    arrays["flags"] = numpy.concatenate(columns["flags"] or [numpy.empty(0, dtype=numpy.uint8)])
+    arrays["modes"] = numpy.concatenate(columns["modes"] or [numpy.empty(0, dtype=numpy.int32)])
+    for k in COLUMNS:
+        numpy.save(os.path.join(path, k + ".npy"), arrays[k])
+
+    header = {
+        "version": BUNDLE_VERSION,
+        "name": series.name,
+        "path": series.path,
+        "attributes": series.attributes(),
+        "contours": [
+            _contour_to_json(c, ["name", "closed", "mode", "border", "fill"])
+            for c in series.contours
+        ],
+        "zcontours": [
+            _contour_to_json(z, ["name", "closed", "mode", "border", "fill"])
+            for z in series.zcontours
+        ],
+        "sections": sections,
+        "names": palettes["names"].values,
+        "comments": palettes["comments"].values,
+        "transforms": [_transform_to_json(t) if t is not None else None for t in transforms],
+    }
+    # Written last, so a bundle with a header is complete
+    with open(header_path, "w") as f:
+        json.dump(header, f)
+
+
+def read_bundle(path, max_resident=None):
+    """Return a Series from the bundle directory at path.
+
+    Columns are memory-mapped and each Section is built from its slice on
+    first access, see LazySections.
+    """
+    with open(os.path.join(path, HEADER_FILENAME)) as f:
+        header = json.load(f)
+    if header.get("version") != BUNDLE_VERSION:
+        raise Exception("Unsupported bundle version: {}".format(header.get("version")))
+    arrays = {k: numpy.load(os.path.join(path, k + ".npy"), mmap_mode="r") for k in COLUMNS}
+    transforms = [Transform(**t) if t is not None else None for t in header["transforms"]]
+
+    data = {k: _from_json(v) for k, v in header["attributes"].items()}
+    series = Series(**data)
+    series.name = header["name"]
+    series.path = header["path"]
+    series.contours = [Contour(**_contour_from_json(c)) for c in header["contours"]]
+    series.zcontours = [ZContour(**_contour_from_json(z)) for z in header["zcontours"]]
+
+    sections = {entry["index"]: entry for entry in header["sections"]}
+
+    def load_section(index):
+        return _section_from_bundle(sections[index], arrays, header, transforms)
+
+    series.sections = LazySections(
+        [(index, index) for index in sorted(sections)], load_section, max_resident=max_resident)
+    return series
+
+
+def _section_from_bundle(entry, arrays, header, transforms):
+    """ Return the Section described by a header entry, with points viewing arrays.
+    """
+    start, stop = entry["contours"]
+    offsets = arrays["offsets"][start:stop + 1]
+    table = ContourTable(
+        points=arrays["points"][offsets[0]:offsets[-1]],
+        offsets=numpy.asarray(offsets) - offsets[0],
+        names=header["names"],
+        name_codes=arrays["name_codes"][start:stop],
+        comments=header["comments"],
+        comment_codes=arrays["comment_codes"][start:stop],
+        flags=arrays["flags"][start:stop],
+        modes=arrays["modes"][start:stop],
+        borders=arrays["borders"],
+        border_codes=arrays["border_codes"][start:stop],
+        fills=arrays["fills"],
+        fill_codes=arrays["fill_codes"][start:stop],
+        transforms=transforms,
+        transform_ids=arrays["transform_ids"][start:stop],
+    )
+    images = []
+    for image_data in entry["images"]:
+        image_data = _contour_from_json(image_data)
+        image_data["transform"] = Transform(**image_data["transform"])
+        image_data["_path"] = entry["_path"]
+        images.append(Image(**image_data))
+    return Section(
+        name=entry["name"],
+        index=entry["index"],
+        thickness=entry["thickness"],
+        alignLocked=entry["alignLocked"],
+        images=images,
+        contours=table.to_contours(),
+        _path=entry["_path"],
+    )
@@ -0,0 +1,389 @@
+"""Warp Section Images into Series coordinates one tile at a time.
+
+An Image is aligned by its Transform: a pixel at (col, row) of the file is at
+domain point ((col + 0.5) * mag, (height - row - 0.5) * mag) and at Series
+point transform.apply_inverse(domain point). Warping goes the other way, from
+Series points to file pixels, so only the forward transform is needed.
+
+Tiles are square, tile_size pixels wide, on a grid anchored at the Series
+origin; at scale s one tile pixel covers mag / s Series units.
+
+Source images are decoded once per process and reduction factor and kept,
+see ImageSource; tiles at scales below 1 sample a reduced copy, which JPEG
+files decode directly at that size.
+"""
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+import hashlib
+import math
+import os
+import threading
+
+import numpy
+from PIL import Image as PILImage
+from skimage.transform import warp
+
+from pyrecon.tools.series_cache import CACHE_DIRNAME, file_signature
+
+TILE_DIRNAME = "tiles"
+# Sources kept decoded by each process, see _source
+MAX_SOURCES = 4
+# Warped tiles kept on disk by each TiledWarper
+MAX_TILES = 4096
+
+_SOURCES = OrderedDict()
+_OPEN_LOCK = threading.Lock()
+
+
+@contextmanager
+def _open(path, max_pixels=None):
+    """ Open an image. If max_pixels is given, it is Pillow's decompression
+        bomb limit for this call instead of PIL.Image.MAX_IMAGE_PIXELS.
+    """
+    if max_pixels is None:
+        img = PILImage.open(path)
+    else:
+        with _OPEN_LOCK:
+            limit = PILImage.MAX_IMAGE_PIXELS
+            PILImage.MAX_IMAGE_PIXELS = max_pixels
+            try:
+                img = PILImage.open(path)
+            finally:
+                PILImage.MAX_IMAGE_PIXELS = limit
+    try:
+        yield img
+    finally:
+        img.close()
+
+
+def _draft_factor(factor):
+    """ Return the largest JPEG draft scale (1, 2, 4 or 8) dividing factor.
+    """
+    scale = 1
+    while scale < 8 and factor % (scale * 2) == 0:
+        scale *= 2
+    return scale
+
+
+class ImageSource(object):
+    """ Pixels of an image file, decoded whole on first use at each
+        reduction factor and then read by region.
+
+        max_pixels replaces PIL.Image.MAX_IMAGE_PIXELS for this file, see _open.
+    """
+
+    def __init__(self, path, max_pixels=None):
+        self.path = path
+        self.max_pixels = max_pixels
+        with _open(path, max_pixels=max_pixels) as img:
+            self.size = img.size
+            self.mode = img.mode
+        # dtype and channels of decoded pixels, without decoding any
+        self.pixel = numpy.asarray(PILImage.new(self.mode, (1, 1)))
+        self._decoded = {}
+
+    def reduced_size(self, factor=1):
+        """ Return the (width, height) of the image reduced by factor.
+        """
+        return tuple(-(-n // factor) for n in self.size)
+
+    def _decode(self, factor):
+        width, height = self.size
+        with _open(self.path, max_pixels=self.max_pixels) as img:
+            draft = _draft_factor(factor)
+            if draft > 1:
+                # JPEG decodes at 1/2, 1/4 or 1/8 size; others ignore this
+                img.draft(img.mode, (width // draft, height // draft))
+                if img.size == (width, height):
+                    draft = 1
+            if factor > draft:
+                img = img.reduce(factor // draft)
+            return numpy.asarray(img)
+
+    def read(self, box, factor=1):
+        """ Return the pixels in box, (left, upper, right, lower) in pixels of
+            the image reduced by factor, as an array.
+        """
+        if factor not in self._decoded:
+            self._decoded[factor] = self._decode(factor)
+        c0, r0, c1, r1 = box
+        return self._decoded[factor][r0:r1, c0:c1]
+
+
+def _source(path, max_pixels=None):
+    """ Return this process's ImageSource for the file at path, opened once
+        per version of the file.
+    """
+    key = (path, file_signature(path), max_pixels)
+    source = _SOURCES.pop(key, None)
+    if source is None:
+        source = ImageSource(path, max_pixels=max_pixels)
+    _SOURCES[key] = source
+    while len(_SOURCES) > MAX_SOURCES:
+        _SOURCES.popitem(last=False)
+    return source
+
+
+def warp_tile(src_path, mag, transform, bounds, shape, order=1, max_pixels=None):
+    """Return the part of the image at src_path covering bounds, (minx, miny,
+    maxx, maxy) in Series coordinates, as an array of shape (rows, cols).
+
+    Only the region of the file that the tile maps onto is interpolated.
+    Tiles whose pixels each cover several file pixels sample the image
+    reduced by that many, see ImageSource. Points outside the image are 0.
+    """
+    minx, miny, maxx, maxy = bounds
+    rows, cols = shape
+    res_x = (maxx - minx) / cols
+    res_y = (maxy - miny) / rows
+    cc, rr = numpy.meshgrid(numpy.arange(cols), numpy.arange(rows))
+    world = numpy.column_stack((
+        minx + (cc.ravel() + 0.5) * res_x,
+        maxy - (rr.ravel() + 0.5) * res_y,
+    ))
+    domain = transform.apply(world) / mag
+
+    source = _source(src_path, max_pixels=max_pixels)
+    # File pixels per tile pixel, judged from the tile's extent in the file
+    span = domain.max(axis=0) - domain.min(axis=0)
+    step = min(span[0] / max(cols - 1, 1), span[1] / max(rows - 1, 1))
+    factor = max(int(step + 1e-6), 1)
+    # Reduced pixel (i, j) covers file rows and columns from i * factor and
+    # j * factor, counting rows from the top
+    src_col = domain[:, 0] / factor - 0.5
+    src_row = (source.size[1] - domain[:, 1]) / factor - 0.5
+    width, height = source.reduced_size(factor)
+    # Pixels needed for interpolation, with a margin for the kernel
+    c0 = max(int(math.floor(src_col.min())) - 1, 0)
+    r0 = max(int(math.floor(src_row.min())) - 1, 0)
+    c1 = min(int(math.ceil(src_col.max())) + 2, width)
+    r1 = min(int(math.ceil(src_row.max())) + 2, height)
+    if c0 >= c1 or r0 >= r1:
+        # Tile is outside the image, keep its dtype and channels
+        return numpy.zeros((rows, cols) + source.pixel.shape[2:], dtype=source.pixel.dtype)
+    region = source.read((c0, r0, c1, r1), factor=factor)
+
+    coords = numpy.array([
+        (src_row - r0).reshape(rows, cols),
+        (src_col - c0).reshape(rows, cols),
+    ])
+    channels = [region] if region.ndim == 2 else [region[..., k] for k in range(region.shape[2])]
+    warped = [
+        warp(channel, coords, order=order, mode="constant", cval=0, preserve_range=True)
+        for channel in channels
+    ]
+    out = warped[0] if region.ndim == 2 else numpy.stack(warped, axis=-1)
+    if numpy.issubdtype(region.dtype, numpy.integer):
+        info = numpy.iinfo(region.dtype)
+        out = numpy.clip(numpy.round(out), info.min, info.max)
+    return out.astype(region.dtype)
+
+
+def _warp_tile_star(args):
+    return warp_tile(*args)
+
+
+class TiledWarper(object):
+    """ Warps a pyrecon Image into Series coordinates tile by tile.
+
+        Warped tiles are stored as .npy files under cache_dir (by default a
+        tiles folder in the Series cache directory), keyed by the image file,
+        mag and transform, so a tile is computed once; at most max_tiles are
+        kept, the least recently used being removed first. Missing tiles are
+        computed in executor, or in a pool of worker processes started on
+        first use if workers > 1; call close() to shut that pool down.
+        max_pixels is passed to ImageSource.
+    """
+
+    def __init__(self, image, tile_size=256, cache_dir=None, cache=True, workers=None, order=1,
+                 executor=None, max_tiles=MAX_TILES, max_pixels=None):
+        self.image = image
+        self.src_path = os.path.join(image._path, image.src)
+        self.tile_size = tile_size
+        self.workers = workers
+        self.order = order
+        self.max_tiles = max_tiles
+        self.max_pixels = max_pixels
+        self._executor = executor
+        self._owns_executor = False
+        # Cached tile paths, least recently used first, read from disk on first use
+        self._cached = None
+        self.cache_dir = None
+        if cache:
+            cache_dir = cache_dir or os.path.join(image._path, CACHE_DIRNAME, TILE_DIRNAME)
+            self.cache_dir = os.path.join(cache_dir, self._key())
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        """ Shut down the worker pool started by this warper, if any.
+        """
+        if self._owns_executor:
+            self._executor.shutdown()
+            self._executor = None
+            self._owns_executor = False
+
+    def _key(self):
+        """ Return a digest identifying the file, alignment and tiling.
+        """
+        identity = (
+            os.path.abspath(self.src_path),
+            file_signature(self.src_path),
+            self.image.mag,
+            self.image.transform.key,
+            self.tile_size,
+            self.order,
+        )
+        return hashlib.sha1(repr(identity).encode("utf-8")).hexdigest()
+
+    def resolution(self, scale=1.0):
+        """ Return the Series units per output pixel at scale.
+        """
+        return self.image.mag / scale
+
+    def bounds(self, samples=16):
+        """ Return (minx, miny, maxx, maxy) of the whole image in Series coordinates.
+        """
+        width, height = _source(self.src_path, max_pixels=self.max_pixels).size
+        t = numpy.linspace(0.0, 1.0, samples)
+        edges = numpy.concatenate([
+            numpy.column_stack((t * width, numpy.zeros(samples))),
+            numpy.column_stack((t * width, numpy.full(samples, height))),
+            numpy.column_stack((numpy.zeros(samples), t * height)),
+            numpy.column_stack((numpy.full(samples, width), t * height)),
+        ]) * self.image.mag
+        world = self.image.transform.apply_inverse(edges)
+        return tuple(float(x) for x in numpy.concatenate((world.min(axis=0), world.max(axis=0))))
+
+    def tile_bounds(self, tx, ty, scale=1.0):
+        """ Return the Series coordinate bounds of tile (tx, ty).
+        """
+        size = self.tile_size * self.resolution(scale)
+        return (tx * size, ty * size, (tx + 1) * size, (ty + 1) * size)
+
+    def tiles(self, bounds, scale=1.0):
+        """ Return the (tx, ty) of every tile overlapping bounds.
+        """
+        size = self.tile_size * self.resolution(scale)
+        minx, miny, maxx, maxy = bounds
+        tx0, ty0 = int(math.floor(minx / size)), int(math.floor(miny / size))
+        tx1 = max(int(math.ceil(maxx / size)) - 1, tx0)
+        ty1 = max(int(math.ceil(maxy / size)) - 1, ty0)
+        return [(tx, ty) for ty in range(ty0, ty1 + 1) for tx in range(tx0, tx1 + 1)]
+
+    def _tile_path(self, tx, ty, scale):
+        return os.path.join(self.cache_dir, "{}_{}_{}.npy".format(repr(float(scale)), tx, ty))
+
+    def _cached_paths(self):
+        """ Return the OrderedDict of cached tile paths, least recently used first.
+        """
+        if self._cached is None:
+            self._cached = OrderedDict()
+            if os.path.isdir(self.cache_dir):
+                paths = [
+                    os.path.join(self.cache_dir, name) for name in os.listdir(self.cache_dir)
+                    if name.endswith(".npy") and not name.endswith(".tmp.npy")
+                ]
+                for path in sorted(paths, key=os.path.getmtime):
+                    self._cached[path] = None
+        return self._cached
+
+    def _load_tile(self, path):
+        """ Return a cached tile, or None if it is not cached.
+        """
+        cached = self._cached_paths()
+        if path not in cached or not os.path.exists(path):
+            cached.pop(path, None)
+            return None
+        cached.move_to_end(path)
+        # The mtime orders tiles for the next warper using this directory
+        os.utime(path)
+        return numpy.load(path)
+
+    def _save_tile(self, path, array):
+        """ Cache a tile, removing the least recently used beyond max_tiles.
+        """
+        os.makedirs(self.cache_dir, exist_ok=True)
+        tmp_path = path + ".tmp.npy"
+        numpy.save(tmp_path, array)
+        os.replace(tmp_path, path)
+        cached = self._cached_paths()
+        cached[path] = None
+        cached.move_to_end(path)
+        while len(cached) > max(self.max_tiles, 0):
+            old_path, _ = cached.popitem(last=False)
+            if os.path.exists(old_path):
+                os.remove(old_path)
+
+    def _map(self, jobs):
+        """ Return warp_tile results for jobs, in order.
+        """
+        if self._executor is None and self.workers and self.workers > 1 and len(jobs) > 1:
+            self._executor = ProcessPoolExecutor(max_workers=self.workers)
+            self._owns_executor = True
+        if self._executor is not None and len(jobs) > 1:
+            return list(self._executor.map(_warp_tile_star, jobs))
+        return [warp_tile(*job) for job in jobs]
+
+    def get_tiles(self, tiles, scale=1.0):
+        """ Return {(tx, ty): array} for tiles, from the cache where possible.
+        """
+        result = {}
+        missing = []
+        for tile in tiles:
+            array = None
+            if self.cache_dir is not None:
+                array = self._load_tile(self._tile_path(*tile, scale))
+            if array is None:
+                missing.append(tile)
+            else:
+                result[tile] = array
+
+        jobs = [
+            (self.src_path, self.image.mag, self.image.transform,
+             self.tile_bounds(tx, ty, scale), (self.tile_size, self.tile_size), self.order,
+             self.max_pixels)
+            for tx, ty in missing
+        ]
+        for tile, array in zip(missing, self._map(jobs)):
+            if self.cache_dir is not None:
+                self._save_tile(self._tile_path(*tile, scale), array)
+            result[tile] = array
+        return result
+
+    def render(self, bounds=None, scale=1.0):
+        """ Return the warped image covering bounds (default: the whole image)
+            at scale, built from the tiles it overlaps. Row 0 is the top (maxy).
+        """
+        if bounds is None:
+            bounds = self.bounds()
+        minx, miny, maxx, maxy = bounds
+        res = self.resolution(scale)
+        tiles = self.tiles(bounds, scale=scale)
+        arrays = self.get_tiles(tiles, scale=scale)
+        txs = sorted(set(tx for tx, _ in tiles))
+        tys = sorted(set(ty for _, ty in tiles), reverse=True)
+        n = self.tile_size
+        sample = arrays[tiles[0]]
+        mosaic = numpy.zeros((len(tys) * n, len(txs) * n) + sample.shape[2:], dtype=sample.dtype)
+        for (tx, ty), array in arrays.items():
+            row = tys.index(ty) * n
+            col = txs.index(tx) * n
+            mosaic[row:row + n, col:col + n] = array
+
+        size = n * res
+        left = int(round((minx - txs[0] * size) / res))
+        top = int(round(((tys[0] + 1) * size - maxy) / res))
+        width = max(int(round((maxx - minx) / res)), 1)
+        height = max(int(round((maxy - miny) / res)), 1)
+        return mosaic[top:top + height, left:left + width]
+
+    def export(self, path, bounds=None, scale=1.0):
+        """ Write the warped image covering bounds at scale to an image file.
+        """
+        PILImage.fromarray(self.render(bounds=bounds, scale=scale)).save(path)
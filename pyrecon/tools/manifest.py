@@ -0,0 +1,209 @@
+"""Lightweight index of a Series' Sections, built without full parsing."""
+from collections import defaultdict
+import fnmatch
+import json
+import os
+
+from lxml import etree
+
+from pyrecon.classes import Transform
+from pyrecon.tools.reconstruct_reader import (
+    extract_transform_attributes, find_series_file, list_section_paths, parse_points
+)
+from pyrecon.tools.series_cache import CACHE_DIRNAME, file_hash, file_signature
+
+MANIFEST_FILENAME = "{}.manifest.json"
+MANIFEST_VERSION = 1
+
+
+def _union_bounds(a, b):
+    """Return the [minx, miny, maxx, maxy] covering two bounds, either of which may be None."""
+    if a is None:
+        return b
+    if b is None:
+        return a
+    return [min(a[0], b[0]), min(a[1], b[1]), max(a[2], b[2]), max(a[3], b[3])]
+
+
+def scan_section_file(path):
+    """Return a manifest entry for a Section file.
+
+    Only attributes are read: no Contour or Image objects are built. Bounds
+    are [minx, miny, maxx, maxy] of the normalized points of each contour name,
+    or None if none of its contours have points.
+    """
+    size, mtime = file_signature(path)
+    entry = {
+        "path": os.path.basename(path),
+        "size": size,
+        "mtime": mtime,
+        "hash": file_hash(path),
+        "contours": {},
+    }
+    names = entry["contours"]
+    transform = None
+    has_image = False
+    for event, elem in etree.iterparse(path, events=("start", "end")):
+        if event == "end":
+            if elem.tag == "Transform":
+                elem.clear()
+            continue
+        if elem.tag == "Section":
+            entry["index"] = int(elem.get("index"))
+            entry["thickness"] = float(elem.get("thickness"))
+        elif elem.tag == "Transform":
+            transform = Transform(**extract_transform_attributes(elem))
+            has_image = False
+        elif elem.tag == "Image":
+            has_image = True
+        elif elem.tag == "Contour" and not has_image:
+            # Image domain contours describe the Image, not a trace
+            points = parse_points(elem.get("points"))
+            bounds = None
+            if len(points):
+                if transform.dim:
+                    points = transform.apply_inverse(points)
+                bounds = [float(x) for x in list(points.min(axis=0)) + list(points.max(axis=0))]
+            name = elem.get("name")
+            if name in names:
+                names[name]["count"] += 1
+                bounds = _union_bounds(names[name]["bounds"], bounds)
+            else:
+                names[name] = {"count": 1}
+            names[name]["bounds"] = bounds
+    return entry
+
+
+class SeriesManifest(object):
+    """ Index of the Sections in a Series: path, size, hash, thickness, and
+        the count and bounds of every contour name in each Section.
+    """
+
+    def __init__(self, series_name, sections=None):
+        self.series_name = series_name
+        self.sections = {}
+        self._by_name = defaultdict(list)
+        for entry in (sections or {}).values():
+            self.add(entry)
+
+    def add(self, entry):
+        """ Add or replace the entry for a Section.
+        """
+        if entry["index"] in self.sections:
+            self.remove(entry["index"])
+        self.sections[entry["index"]] = entry
+        for name in entry["contours"]:
+            self._by_name[name].append(entry["index"])
+            self._by_name[name].sort()
+
+    def remove(self, index):
+        """ Remove the entry for a Section.
+        """
+        entry = self.sections.pop(index)
+        for name in entry["contours"]:
+            self._by_name[name].remove(index)
+            if not self._by_name[name]:
+                del self._by_name[name]
+
+    def names(self):
+        """ Return a sorted list of every contour name in the Series.
+        """
+        return sorted(self._by_name)
+
+    def _matching_names(self, pattern):
+        if pattern in self._by_name:
+            return [pattern]
+        return [name for name in self._by_name if fnmatch.fnmatchcase(name, pattern)]
+
+    def sections_with(self, pattern):
+        """ Return indices of Sections with a contour name matching a glob pattern.
+        """
+        indices = set()
+        for name in self._matching_names(pattern):
+            indices.update(self._by_name[name])
+        return sorted(indices)
+
+    def sections_in_range(self, start, stop):
+        """ Return entries for Sections with start <= index <= stop, in index order.
+        """
+        return [self.sections[i] for i in sorted(self.sections) if start <= i <= stop]
+
+    def contour_counts(self, pattern):
+        """ Return {section index: number of contours matching a glob pattern}.
+        """
+        counts = defaultdict(int)
+        for name in self._matching_names(pattern):
+            for index in self._by_name[name]:
+                counts[index] += self.sections[index]["contours"][name]["count"]
+        return dict(counts)
+
+    def bounds(self, pattern):
+        """ Return {section index: [minx, miny, maxx, maxy]} of contours matching
+            a glob pattern. Sections where none of them have points are left out.
+        """
+        bounds = {}
+        for name in self._matching_names(pattern):
+            for index in self._by_name[name]:
+                box = _union_bounds(
+                    bounds.get(index), self.sections[index]["contours"][name]["bounds"])
+                if box is not None:
+                    bounds[index] = box
+        return bounds
+
+    def save(self, path):
+        """ Write this manifest to a JSON file.
+        """
+        data = {
+            "version": MANIFEST_VERSION,
+            "series_name": self.series_name,
+            "sections": [self.sections[i] for i in sorted(self.sections)],
+        }
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(data, f)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path):
+        """ Return a SeriesManifest read from a JSON file, or None if unusable.
+        """
+        try:
+            with open(path) as f:
+                data = json.load(f)
+        except (IOError, ValueError):
+            return None
+        if data.get("version") != MANIFEST_VERSION:
+            return None
+        return cls(data["series_name"], {entry["index"]: entry for entry in data["sections"]})
+
+
+def manifest_path(path, series_name, cache_dir=None):
+    """Return where the manifest of the Series in path is stored."""
+    directory = cache_dir or os.path.join(path, CACHE_DIRNAME)
+    return os.path.join(directory, MANIFEST_FILENAME.format(series_name))
+
+
+def build_manifest(path, cache_dir=None, save=True):
+    """Return the SeriesManifest for the Series in path.
+
+    A previously saved manifest is reused: only Section files whose size or
+    mtime changed are scanned again. The result is saved unless save is False.
+    """
+    series_name = os.path.basename(find_series_file(path)).replace(".ser", "")
+    manifest_fp = manifest_path(path, series_name, cache_dir=cache_dir)
+    previous = SeriesManifest.load(manifest_fp)
+    previous_entries = {}
+    if previous is not None:
+        previous_entries = {entry["path"]: entry for entry in previous.sections.values()}
+
+    manifest = SeriesManifest(series_name)
+    for _, section_path in list_section_paths(path, series_name):
+        entry = previous_entries.get(os.path.basename(section_path))
+        if entry is None or (entry["size"], entry["mtime"]) != file_signature(section_path):
+            entry = scan_section_file(section_path)
+        manifest.add(entry)
+
+    if save:
+        os.makedirs(os.path.dirname(manifest_fp), exist_ok=True)
+        manifest.save(manifest_fp)
+    return manifest
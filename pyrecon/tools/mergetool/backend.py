@@ -7,11 +7,21 @@ import itertools
 
 import numpy
 from PIL import Image
+from shapely.geometry import Polygon
 
 from .models import Base, Contour, ContourMatch
+from pyrecon.classes import Section, Series, Transform
+from pyrecon.classes.contour import LOD_TOLERANCES
 from .utils import is_contacting, is_exact_duplicate, is_potential_duplicate
+from pyrecon.classes.points import points_equal
+from pyrecon.classes.transform import estimate_transforms
 from pyrecon.tools.reconstruct_reader import process_series_directory
 
+# simplified_shape level used to rule out distant contours before exact tests
+COARSE_LEVEL = 2
+# Douglas-Peucker tolerance of frontend display points, in pixels
+DISPLAY_TOLERANCE = 0.5
+
 
 def create_database(engine):
     """ Uses the provided engine to create the database.
@@ -51,10 +61,112 @@ def load_db_contours_from_pyrecon_section(session, section, series_number):
     return db_contours
 
 
+def _realignment_correspondences(section_a, section_b):
+    """ Return (src, dst) normalized points of contours traced identically in
+        section_b and section_a: same name and points, so only the section
+        alignment can differ.
+    """
+    traced = {}
+    for contour in section_a.contours:
+        points = numpy.asarray(contour.points, dtype=numpy.float64)
+        traced.setdefault((contour.name, points.tobytes()), contour)
+    src = []
+    dst = []
+    for contour in section_b.contours:
+        points = numpy.asarray(contour.points, dtype=numpy.float64)
+        match = traced.get((contour.name, points.tobytes()))
+        if match is not None and len(points):
+            src.append(contour.normalized_points)
+            dst.append(match.normalized_points)
+    return src, dst
+
+
+def estimate_realignment(series_a, series_b, dim=3, ransac=False, **kwargs):
+    """ Returns {section index: Transform} mapping normalized coordinates of
+        series_b onto those of series_a, for each section in both.
+
+        Correspondences come from contours with the same name and points in
+        both series. Without ransac, every section is fit in one batched
+        least squares solve; kwargs are passed to Transform.estimate otherwise.
+    """
+    src = []
+    dst = []
+    groups = []
+    for index in sorted(series_a.sections):
+        if index not in series_b.sections:
+            continue
+        section_src, section_dst = _realignment_correspondences(
+            series_a.sections[index], series_b.sections[index])
+        if not section_src:
+            continue
+        section_src = numpy.concatenate(section_src)
+        src.append(section_src)
+        dst.append(numpy.concatenate(section_dst))
+        groups.append(numpy.full(len(section_src), index))
+    if not src:
+        return {}
+    if not ransac:
+        return {
+            int(index): transform for index, transform in estimate_transforms(
+                numpy.concatenate(src), numpy.concatenate(dst), numpy.concatenate(groups),
+                dim=dim).items()
+        }
+    transforms = {}
+    for section_src, section_dst, section_groups in zip(src, dst, groups):
+        transform = Transform.estimate(section_src, section_dst, dim=dim, ransac=True, **kwargs)
+        if transform is not None:
+            transforms[int(section_groups[0])] = transform
+    return transforms
+
+
+def align_series_list(series_list, dim=3, ransac=False, **kwargs):
+    """ Returns {(series number, section index): [shape, ...]} with the shape of
+        every contour mapped into the frame of series_list[0].
+
+        Each other series' sections are realigned with estimate_realignment,
+        and all contours of a section are mapped with one call per section.
+        Sections without a realignment keep their own frame.
+    """
+    primary = series_list[0]
+    shapes = {}
+    for index, section in primary.sections.items():
+        shapes[(0, index)] = [contour.shape for contour in section.contours]
+    for series_number, series in enumerate(series_list[1:], 1):
+        realignment = estimate_realignment(primary, series, dim=dim, ransac=ransac, **kwargs)
+        for index, section in series.sections.items():
+            transform = realignment.get(index)
+            if transform is None:
+                shapes[(series_number, index)] = [c.shape for c in section.contours]
+                continue
+            aligned = transform.apply_many(section.normalized_points())
+            shapes[(series_number, index)] = [
+                contour.shape_from(points) for contour, points in zip(section.contours, aligned)
+            ]
+    return shapes
+
+
+def _are_apart(contour_a, contour_b, level=COARSE_LEVEL):
+    """ Returns True if 2 contours' shapes certainly do not touch, judged from
+        their simplified shapes.
+
+        Each simplified shape is within LOD_TOLERANCES[level - 1] of its exact
+        shape, so a gap wider than twice that is also a gap between the exact
+        shapes.
+    """
+    gap = contour_a.simplified_shape(level).distance(contour_b.simplified_shape(level))
+    return gap > 2 * LOD_TOLERANCES[level - 1]
+
+
 def _create_db_contourmatch_from_db_contours_and_pyrecon_series_list(db_contour_A,
                                                                      db_contour_B,
-                                                                     series_list):
+                                                                     series_list,
+                                                                     shapes=None):
     """ Returns a db.ContourMatch from 2 db.Contours and a pyrecon.section, or None.
+
+        If shapes (see align_series_list) is given, contours are compared
+        using those shapes instead of their own. Otherwise contours whose
+        bounding boxes overlap but whose simplified shapes are far apart are
+        rejected before the exact shapes are compared (see _are_apart).
     """
     pyrecon_contour_a = series_list[
         db_contour_A.series
@@ -72,13 +184,17 @@ def _create_db_contourmatch_from_db_contours_and_pyrecon_series_list(db_contour_
     ]
     if pyrecon_contour_a.name != pyrecon_contour_b.name:
         return None
-    elif pyrecon_contour_a.shape.type != pyrecon_contour_b.shape.type:
-        return None
 
-    shape_a = pyrecon_contour_a.shape
-    shape_b = pyrecon_contour_b.shape
+    if shapes is not None:
+        shape_a = shapes[(db_contour_A.series, db_contour_A.section)][db_contour_A.index]
+        shape_b = shapes[(db_contour_B.series, db_contour_B.section)][db_contour_B.index]
+    else:
+        shape_a = pyrecon_contour_a.shape
+        shape_b = pyrecon_contour_b.shape
+    if shape_a.geom_type != shape_b.geom_type:
+        return None
     try:
-        if (pyrecon_contour_a.points == pyrecon_contour_b.points) and \
+        if points_equal(pyrecon_contour_a.points, pyrecon_contour_b.points) and \
            (pyrecon_contour_a.transform != pyrecon_contour_b.transform):
             if is_exact_duplicate(shape_a, shape_b):
                 match_type = "exact"
@@ -96,6 +212,8 @@ def _create_db_contourmatch_from_db_contours_and_pyrecon_series_list(db_contour_
                 )
         elif not is_contacting(shape_a, shape_b):
             return None
+        elif shapes is None and _are_apart(pyrecon_contour_a, pyrecon_contour_b):
+            return None
         elif is_exact_duplicate(shape_a, shape_b):
             match_type = "exact"
             return ContourMatch(
@@ -118,7 +236,8 @@ def _create_db_contourmatch_from_db_contours_and_pyrecon_series_list(db_contour_
     return None
 
 
-def _create_db_contourmatches_from_db_contours_and_pyrecon_series_list(db_contours, series_list):
+def _create_db_contourmatches_from_db_contours_and_pyrecon_series_list(db_contours, series_list,
+                                                                       shapes=None):
     """ Returns db.ContourMatch objects for contours in a pyrecon.Section.
     """
     matches = []
@@ -128,18 +247,18 @@ def _create_db_contourmatches_from_db_contours_and_pyrecon_series_list(db_contou
             if idx >= idy:
                 continue
             match = _create_db_contourmatch_from_db_contours_and_pyrecon_series_list(
-                db_contour_A, db_contour_B, series_list)
+                db_contour_A, db_contour_B, series_list, shapes=shapes)
             if match:
                 matches.append(match)
     return matches
 
 
 def load_db_contourmatches_from_db_contours_and_pyrecon_series_list(session, db_contours,
-                                                                    series_list):
+                                                                    series_list, shapes=None):
     """ From a pyrecon.Section object, insert db.ContourMatch entities into the db.
     """
     db_contourmatches = _create_db_contourmatches_from_db_contours_and_pyrecon_series_list(
-        db_contours, series_list)
+        db_contours, series_list, shapes=shapes)
     session.add_all(db_contourmatches)
     session.commit()
     return db_contourmatches
@@ -225,10 +344,8 @@ def transform_contour_for_frontend(contour, db_id, section, series_name, keep=Tr
 
     # Converting to pixels
     contour_copy = deepcopy(contour)
-    contour_copy.points = list(map(tuple, numpy.asarray(contour_copy.points) / image.mag))
-    contour_copy.points = list(map(tuple,
-        contour_copy.transform._tform.inverse(numpy.asarray(contour_copy.points))
-    ))
+    to_pixels = Transform.scaling(1.0 / image.mag).compose(contour_copy.transform.inverted())
+    contour_copy.points = list(map(tuple, to_pixels.apply(contour_copy.points)))
 
     translation_vector = numpy.array([0, img_height])
     flip_vector = numpy.array([1, -1])
@@ -236,9 +353,14 @@ def transform_contour_for_frontend(contour, db_id, section, series_name, keep=Tr
         translation_vector + (numpy.asarray(list(contour_copy.shape.exterior.coords)) * flip_vector)
     ))
     contour_bounds = contour_copy.shape.bounds
+    # Simplified from the pixel points themselves: shape would apply the
+    # contour's transform to them again
+    display_shape = Polygon(contour_copy.points).simplify(
+        DISPLAY_TOLERANCE, preserve_topology=True)
     return {
         "name": contour_copy.name,
         "points": contour_copy.points,
+        "display_points": list(display_shape.exterior.coords),
         "image_path": section.images[0]._path + "/{}".format(section.images[0].src),
         "image_height": img_height,
         "image_width": img_width,
@@ -458,41 +580,58 @@ def get_output_contours_from_series_dict(session, series_dict):
     return to_keep
 
 
-def create_output_series(session, to_keep, series_path_list, series_name=None):
+def create_output_series(session, to_keep, series_path_list, series_name=None,
+                         max_resident=None):
+    """ Returns a new pyrecon.Series holding only the contours in to_keep.
+
+        If max_resident is given, input Sections are loaded lazily and at most
+        that many per series are held in memory at a time.
+    """
     series_list = []
     for path in series_path_list:
-        series = process_series_directory(path)
+        series = process_series_directory(
+            path, lazy=max_resident is not None, max_resident=max_resident)
         series_list.append(series)
 
     main_series = series_list[0]
-    output_series = deepcopy(main_series)
+    output_series = Series(**deepcopy(main_series.attributes()))
+    output_series.path = main_series.path
+    output_series.contours = deepcopy(main_series.contours)
+    output_series.zcontours = deepcopy(main_series.zcontours)
     if not series_name:
         output_series.name = "merged-{}".format(datetime.utcnow())
     else:
         output_series.name = series_name
 
-    # Make sure we grab all sections, since series may contain different sections
-    for series in series_list[1:]:
-        series = deepcopy(series)
-        output_series.sections.update(series.sections)
+    # Contours to keep, by (series, section), looked up while each section
+    # is loaded below so lazily loaded sections are read only once
+    db_contours = [session.query(Contour).get(keep_dict["db_id"]) for keep_dict in to_keep]
+    wanted = {}
+    for i, db_contour in enumerate(db_contours):
+        wanted.setdefault((db_contour.series, db_contour.section), []).append(i)
 
-    # Delete section contours so that we only keep the ones selected in mergetool
+    # Make sure we grab all sections, since series may contain different sections.
+    # Only Section attributes and images are copied, so that we only keep the
+    # contours selected in mergetool
     section_name_template = "{}.".format(series_name) + "{}"
-    for section in output_series.sections.values():
-        section.name = section_name_template.format(section.index)
-        section.contours = []
+    reconstruct_contours = {}
+    for series_index, series in enumerate(series_list):
+        for section in series.sections.values():
+            output_series.sections[section.index] = Section(
+                name=section_name_template.format(section.index),
+                index=section.index,
+                thickness=section.thickness,
+                alignLocked=section.alignLocked,
+                images=deepcopy(section.images),
+                contours=[],
+                _path=section._path,
+            )
+            for i in wanted.get((series_index, section.index), ()):
+                reconstruct_contours[i] = section.contours[db_contours[i].index]
 
     # TODO: multithread this?
-    for keep_dict in to_keep:
-        db_id = keep_dict["db_id"]
-        db_contour = session.query(Contour).get(db_id)
-        reconstruct_contour = series_list[
-            db_contour.series
-        ].sections[
-            db_contour.section
-        ].contours[
-            db_contour.index
-        ]
+    for i, keep_dict in enumerate(to_keep):
+        reconstruct_contour = reconstruct_contours[i]
         reconstruct_contour.name = keep_dict["name"]
-        output_series.sections[db_contour.section].contours.append(reconstruct_contour)
+        output_series.sections[db_contours[i].section].contours.append(reconstruct_contour)
     return output_series
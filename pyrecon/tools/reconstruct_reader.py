@@ -1,12 +1,24 @@
 """Functions for creating Python objects from RECONSTRUCT XML files."""
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import redirect_stdout
+from functools import partial
+import fnmatch
+import io
 import re
 import os
+import threading
+import time
 
 from lxml import etree
+import numpy
 
 from pyrecon.classes import (
     Contour, Image, Section, Series, Transform, ZContour
 )
+from pyrecon.classes.compact import compact_contour, compact_section, compact_zcontour
+from pyrecon.classes.series import LazySections
+from pyrecon.tools.series_cache import SectionCache
 
 
 def str_to_bool(string):
@@ -14,25 +26,182 @@ def str_to_bool(string):
     return string.capitalize() == "True"
 
 
-def process_series_directory(path, data_check=False):
-    """Return a Series, fully loaded with data found in the provided path."""
+# Reported to the progress callback of process_series_directory after each Section
+LoadProgress = namedtuple("LoadProgress", [
+    "sections_done", "sections_total", "bytes_read", "bytes_total", "elapsed", "eta"
+])
+
+
+class LoadCancelled(Exception):
+    """Raised by process_series_directory when its CancelToken is cancelled."""
+
+
+class CancelToken(object):
+    """ Lets another thread stop a running process_series_directory.
+    """
+
+    def __init__(self):
+        self._event = threading.Event()
+
+    def cancel(self):
+        """ Request that the load stops before the next Section.
+        """
+        self._event.set()
+
+    @property
+    def cancelled(self):
+        return self._event.is_set()
+
+
+class ContourFilter(object):
+    """ Selects which Section contours the reader builds.
+
+        name: glob pattern the contour name must match, e.g. "d01*"
+        sections: (first, last) range of Section indices to read, inclusive
+        hidden: if not None, the hidden flag contours must have
+        bounds: (minx, miny, maxx, maxy) box that normalized contour points
+                must overlap
+    """
+
+    def __init__(self, name=None, sections=None, hidden=None, bounds=None):
+        self.name = name
+        self.sections = sections
+        self.hidden = hidden
+        self.bounds = bounds
+
+    def accepts_section(self, index):
+        """ Return True if the Section with this index should be read.
+        """
+        if self.sections is None:
+            return True
+        first, last = self.sections
+        return first <= index <= last
+
+    def accepts_node(self, node):
+        """ Return True if a Contour XML element passes the attribute checks.
+        """
+        if self.name is not None and not fnmatch.fnmatchcase(node.get("name"), self.name):
+            return False
+        if self.hidden is not None and str_to_bool(node.get("hidden")) != self.hidden:
+            return False
+        return True
+
+    def accepts_points(self, points, transform):
+        """ Return True if points, normalized by transform, overlap bounds.
+        """
+        if self.bounds is None:
+            return True
+        array = numpy.asarray(points, dtype=numpy.float64)
+        if transform.dim:
+            array = transform.apply_inverse(array)
+        minx, miny, maxx, maxy = self.bounds
+        return (array[:, 0].min() <= maxx and array[:, 0].max() >= minx and
+                array[:, 1].min() <= maxy and array[:, 1].max() >= miny)
+
+    def accepts(self, contour):
+        """ Return True if an already built Contour passes every check.
+        """
+        if self.name is not None and not fnmatch.fnmatchcase(contour.name, self.name):
+            return False
+        if self.hidden is not None and contour.hidden != self.hidden:
+            return False
+        return self.accepts_points(contour.points, contour.transform)
+
+    def apply(self, section):
+        """ Remove the contours this filter rejects from an already built Section.
+        """
+        if not self.accepts_section(section.index):
+            section.contours = []
+        else:
+            section.contours = [c for c in section.contours if self.accepts(c)]
+        return section
+
+
+def process_series_directory(path, data_check=False, workers=None, points_as_array=False,
+                             cache=False, cache_dir=None, lazy=False, max_resident=None,
+                             manifest=False, contour_filter=None, progress=None, cancel=None,
+                             compact=False):
+    """Return a Series, fully loaded with data found in the provided path.
+
+    If workers is greater than 1, Section files are parsed in a pool of that
+    many processes. Sections are added to series.sections in index order either way.
+    If points_as_array is True, points are stored as NumPy arrays instead of
+    lists of tuples.
+    If cache is True, parsed Sections are kept on disk (in cache_dir, or next
+    to the Series) and only Section files that changed are parsed again.
+    If lazy is True, series.sections is a LazySections that parses each Section
+    on first access and holds at most max_resident of them; data_check then
+    runs per Section as it is loaded and the thickness check is skipped.
+    If manifest is True, series.manifest is a SeriesManifest, updated from a
+    fast scan of changed Section files and saved next to the Section cache.
+    If contour_filter (a ContourFilter) is given, Section files outside its
+    section range are not read and non-matching contours are not built.
+    If progress is given, it is called with a LoadProgress after each Section.
+    If cancel (a CancelToken) is cancelled, LoadCancelled is raised before
+    the next Section is read. Neither can be combined with lazy, which reads
+    no Sections here.
+    If compact is True, Contours, Images and ZContours are stored as the
+    memory-lean classes of pyrecon.classes.compact.
+    """
+    if lazy and (progress is not None or cancel is not None):
+        raise Exception("progress and cancel cannot be used with lazy: Sections are read on access")
+
     # Gather Series from provided path
-    series_files = []
-    for filename in os.listdir(path):
-        if ".ser" in filename:
-            series_files.append(filename)
-    assert len(series_files) == 1, "There is more than one Series file in the provided directory"
-    series_file = series_files[0]
-    series_path = os.path.join(path, series_file)
-    series = process_series_file(series_path)
+    series_path = find_series_file(path)
+    series = process_series_file(series_path, points_as_array=points_as_array)
+    if compact:
+        series.contours = [compact_contour(c) for c in series.contours]
+        series.zcontours = [compact_zcontour(z) for z in series.zcontours]
+    if manifest:
+        from pyrecon.tools.manifest import build_manifest
+        series.manifest = build_manifest(path, cache_dir=cache_dir)
 
     # Gather Sections from provided path
-    section_regex = re.compile(r"{}.[0-9]+$".format(series.name))
-    for filename in os.listdir(path):
-        if re.match(section_regex, filename):
-            section_path = os.path.join(path, filename)
-            section = process_section_file(section_path, data_check=data_check)
-            series.sections[section.index] = section
+    section_paths = list_section_paths(path, series.name)
+    if contour_filter is not None:
+        section_paths = [(i, p) for i, p in section_paths if contour_filter.accepts_section(i)]
+    section_cache = SectionCache(path, cache_dir=cache_dir) if cache else None
+    section_kwargs = {
+        "data_check": data_check,
+        "points_as_array": points_as_array,
+        "contour_filter": contour_filter,
+    }
+    if lazy:
+        loader = partial(
+            _load_section, section_cache=section_cache, transforms={}, compact=compact,
+            **section_kwargs)
+        series.sections = LazySections(section_paths, loader, max_resident=max_resident)
+        return series
+
+    if cancel is not None and cancel.cancelled:
+        raise LoadCancelled()
+    sections = _load_sections(
+        [p for _, p in section_paths],
+        workers=workers,
+        section_cache=section_cache,
+        **section_kwargs
+    )
+    sizes = [os.path.getsize(p) for _, p in section_paths]
+    bytes_total = sum(sizes)
+    bytes_read = 0
+    start = time.time()
+    # Sections from workers or the cache have their own Transform objects
+    transforms = {}
+    for sections_done, (section, size) in enumerate(zip(sections, sizes), 1):
+        intern_transforms(section, transforms)
+        if compact:
+            compact_section(section)
+        series.sections[section.index] = section
+        bytes_read += size
+        if progress is not None:
+            elapsed = time.time() - start
+            eta = elapsed / bytes_read * (bytes_total - bytes_read) if bytes_read else None
+            progress(LoadProgress(
+                sections_done, len(sizes), bytes_read, bytes_total, elapsed, eta))
+        if cancel is not None and cancel.cancelled and sections_done < len(sizes):
+            # Closing the generator cancels any pending worker tasks
+            sections.close()
+            raise LoadCancelled()
 
     if data_check:
         thickness_set = set([sec.thickness for _, sec in series.sections.items()])
@@ -44,7 +213,144 @@ def process_series_directory(path, data_check=False):
     return series
 
 
-def process_series_file(path):
+def iter_sections(path, indices=None, data_check=False, points_as_array=False,
+                  contour_filter=None):
+    """Yield the Sections of the Series in path one at a time, in index order.
+
+    Only the Section being yielded is held in memory, so batch jobs can run
+    over Series larger than RAM. If indices is given, only those Sections are read.
+    """
+    series_name = os.path.basename(find_series_file(path)).replace(".ser", "")
+    if indices is not None:
+        indices = set(indices)
+    for index, section_path in list_section_paths(path, series_name):
+        if indices is not None and index not in indices:
+            continue
+        if contour_filter is not None and not contour_filter.accepts_section(index):
+            continue
+        yield process_section_file(
+            section_path,
+            data_check=data_check,
+            points_as_array=points_as_array,
+            contour_filter=contour_filter,
+        )
+
+
+def find_series_file(path):
+    """Return the path of the single Series file in the provided directory."""
+    series_files = []
+    for filename in os.listdir(path):
+        if ".ser" in filename:
+            series_files.append(filename)
+    assert len(series_files) == 1, "There is more than one Series file in the provided directory"
+    return os.path.join(path, series_files[0])
+
+
+def list_section_paths(path, series_name):
+    """Return (index, path) pairs for a Series' Section files, sorted by index."""
+    section_regex = re.compile(r"{}.[0-9]+$".format(series_name))
+    section_paths = []
+    for filename in os.listdir(path):
+        if re.match(section_regex, filename):
+            index = int(filename.rsplit(".", 1)[-1])
+            section_paths.append((index, os.path.join(path, filename)))
+    return sorted(section_paths)
+
+
+def _load_section(section_path, section_cache=None, transforms=None, compact=False, **kwargs):
+    """Return the Section for section_path, using section_cache where possible.
+
+    If transforms is given, the Section's Transforms are interned in it.
+    If compact is True, its contents are converted with compact_section.
+    """
+    if section_cache is None:
+        section = process_section_file(section_path, transforms=transforms, **kwargs)
+        return compact_section(section) if compact else section
+    # Whole Sections are cached, so filter after reading
+    contour_filter = kwargs.pop("contour_filter", None)
+    points_as_array = kwargs.get("points_as_array", False)
+    section = section_cache.get(section_path, points_as_array=points_as_array)
+    if section is None:
+        section = process_section_file(section_path, **kwargs)
+        section_cache.put(section_path, section, points_as_array=points_as_array)
+    elif kwargs.get("data_check"):
+        check_section_data(section)
+    if contour_filter is not None:
+        contour_filter.apply(section)
+    if transforms is not None:
+        intern_transforms(section, transforms)
+    if compact:
+        compact_section(section)
+    return section
+
+
+def _load_sections(section_paths, workers=None, section_cache=None, **kwargs):
+    """Yield Sections for section_paths in order, using section_cache where possible."""
+    if section_cache is None:
+        for section in _parse_section_files(section_paths, workers=workers, **kwargs):
+            yield section
+        return
+
+    # Whole Sections are cached, so filter after reading
+    contour_filter = kwargs.pop("contour_filter", None)
+    points_as_array = kwargs.get("points_as_array", False)
+    # Cached Sections are only unpickled as they are yielded, so the caller
+    # can report progress or stop between them
+    fresh = set(
+        p for p in section_paths
+        if section_cache.is_fresh(p, points_as_array=points_as_array))
+
+    # Parsed Sections come back in the same order as to_parse
+    to_parse = [p for p in section_paths if p not in fresh]
+    parsed = _parse_section_files(to_parse, workers=workers, **kwargs)
+    for section_path in section_paths:
+        if section_path not in fresh:
+            section = next(parsed)
+            section_cache.put(section_path, section, points_as_array=points_as_array)
+        else:
+            section = section_cache.get(section_path, points_as_array=points_as_array)
+            if section is None:
+                # The entry failed the hash check after all
+                section = process_section_file(section_path, **kwargs)
+                section_cache.put(section_path, section, points_as_array=points_as_array)
+            elif kwargs.get("data_check"):
+                check_section_data(section)
+        if contour_filter is not None:
+            contour_filter.apply(section)
+        yield section
+
+
+def _parse_section_files(section_paths, workers=None, **kwargs):
+    """Return an iterator of Sections parsed from section_paths, in order."""
+    if workers and workers > 1 and section_paths:
+        return _process_section_files_parallel(section_paths, workers, **kwargs)
+    return (process_section_file(p, **kwargs) for p in section_paths)
+
+
+def _process_section_file_captured(path, **kwargs):
+    """Return a Section and anything printed while processing its file."""
+    output = io.StringIO()
+    with redirect_stdout(output):
+        section = process_section_file(path, **kwargs)
+    return section, output.getvalue()
+
+
+def _process_section_files_parallel(paths, workers, **kwargs):
+    """Yield Sections parsed in a process pool, in the order of paths.
+
+    Warnings printed by workers are replayed here so they come out in order.
+    """
+    # Batch the work so that process overhead doesn't outweigh small files
+    chunksize = max(1, len(paths) // (workers * 4))
+    func = partial(_process_section_file_captured, **kwargs)
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        for section, output in executor.map(func, paths, chunksize=chunksize):
+            if output:
+                print(output, end="")
+            yield section
+
+
+def process_series_file(path, points_as_array=False):
     """Return a Series object from Series XML file."""
     tree = etree.parse(path)
     root = tree.getroot()
@@ -59,20 +365,31 @@ def process_series_file(path):
     for elem in root:
         if elem.tag == "Contour":
             # TODO: no Contour import
-            contour_data = extract_series_contour_attributes(elem)
+            contour_data = extract_series_contour_attributes(
+                elem, points_as_array=points_as_array)
             contour = Contour(**contour_data)
             series.contours.append(contour)
         elif elem.tag == "ZContour":
             # TODO: no ZContour import
-            zcontour_data = extract_zcontour_attributes(elem)  # TODO
+            zcontour_data = extract_zcontour_attributes(  # TODO
+                elem, points_as_array=points_as_array)
             zcontour = ZContour(**zcontour_data)
             series.zcontours.append(zcontour)
 
     return series
 
 
-def process_section_file(path, data_check=False):
-    """Return a Section object from a Section XML file."""
+def process_section_file(path, data_check=False, points_as_array=False, contour_filter=None,
+                         transforms=None):
+    """Return a Section object from a Section XML file.
+
+    If points_as_array is True, points are stored as (N, 2) float64 arrays.
+    If contour_filter is given, only the contours it accepts are built.
+    Equal Transforms are shared; pass a dict as transforms to share them
+    with other Sections, see intern_transforms.
+    """
+    if transforms is None:
+        transforms = {}
     tree = etree.parse(path)
     root = tree.getroot()
 
@@ -87,6 +404,7 @@ def process_section_file(path, data_check=False):
         # make Transform object
         transform_data = extract_transform_attributes(node)
         transform = Transform(**transform_data)
+        transform = transforms.setdefault(transform.key, transform)
         children = [child for child in node]
 
         # Image node
@@ -105,52 +423,77 @@ def process_section_file(path, data_check=False):
                 raise Exception("No support for Images with out a Contour.")
             else:
                 image_contour_data = extract_section_contour_attributes(
-                    image_contours[0])
+                    image_contours[0], points_as_array=points_as_array)
                 image_data.update(image_contour_data)
 
             image = Image(**image_data)
-            if data_check:
-                # Check if ref exists
-                image_path = os.path.join(image._path, image.src)
-                if not os.path.isfile(image_path):
-                    print("WARNING: Could not find referenced image: {}".format(image_path))
-
             section.images.append(image)
 
         # Non-Image Node
         else:
             for child in children:
                 if child.tag == "Contour":
-                    contour_data = extract_section_contour_attributes(child)
+                    # Check cheap attributes before converting anything
+                    if contour_filter is not None and not contour_filter.accepts_node(child):
+                        continue
+                    contour_data = extract_section_contour_attributes(
+                        child, points_as_array=points_as_array)
+                    if contour_filter is not None and \
+                       not contour_filter.accepts_points(contour_data["points"], transform):
+                        continue
                     contour_data["transform"] = transform
                     contour = Contour(**contour_data)
                     section.contours.append(contour)
 
     if data_check:
-        if not section.images:
-            print("WARNING: section {} is missing an Image.".format(section.index))
-        elif len(section.images) > 1:
-            print("WARNING: section {} contains more than one Image.".format(section.index))
+        check_section_data(section)
 
     return section
 
 
+def intern_transforms(section, transforms):
+    """Replace the Transforms of section's Images and Contours with equal ones
+    from transforms, a dict of Transforms by key, adding any that are new.
+    """
+    shared = {}
+    for item in section.images + section.contours:
+        transform = item.transform
+        if transform is None:
+            continue
+        if id(transform) not in shared:
+            shared[id(transform)] = transforms.setdefault(transform.key, transform)
+        item.transform = shared[id(transform)]
+
+
+def check_section_data(section):
+    """Print warnings for missing or unexpected Images in a Section."""
+    for image in section.images:
+        # Check if ref exists
+        image_path = os.path.join(image._path, image.src)
+        if not os.path.isfile(image_path):
+            print("WARNING: Could not find referenced image: {}".format(image_path))
+    if not section.images:
+        print("WARNING: section {} is missing an Image.".format(section.index))
+    elif len(section.images) > 1:
+        print("WARNING: section {} contains more than one Image.".format(section.index))
+
+
+def parse_points(points, dims=2):
+    """Return a RECONSTRUCT points string as an (N, dims) float64 array."""
+    values = numpy.array(points.replace(",", " ").split(), dtype=numpy.float64)
+    return values.reshape(-1, dims)
+
 
 def _get_points_int(points):
-    return zip(
-        [int(x.replace(",", "")) for x in points.split()][0::2],
-        [int(x.replace(",", "")) for x in points.split()][1::2]
-    )
+    values = [int(x) for x in points.replace(",", " ").split()]
+    return list(zip(values[0::2], values[1::2]))
 
 
 def _get_points_float(points):
-    return zip(
-        [float(x.replace(",", "")) for x in points.split()][0::2],
-        [float(x.replace(",", "")) for x in points.split()][1::2]
-    )
+    return [tuple(point) for point in parse_points(points).tolist()]
 
 
-def extract_series_contour_attributes(node):
+def extract_series_contour_attributes(node, points_as_array=False):
     """Return a dict of Series' Contour's attributes."""
     attributes = {
         "name": str(node.get("name")),
@@ -160,6 +503,9 @@ def extract_series_contour_attributes(node):
         "fill": tuple(float(x) for x in node.get("fill").strip().split(" ")),
     }
 
+    if points_as_array:
+        attributes["points"] = parse_points(node.get("points"))
+        return attributes
     try:
         attributes["points"] = _get_points_int(node.get("points"))
     except ValueError:
@@ -168,8 +514,9 @@ def extract_series_contour_attributes(node):
     return attributes
 
 
-def extract_section_contour_attributes(node):
+def extract_section_contour_attributes(node, points_as_array=False):
     """Return a dict of Section Contour's attributes."""
+    points = node.get("points")
     attributes = {
         "name": str(node.get("name")),
         "comment": str(node.get("comment")),
@@ -179,7 +526,7 @@ def extract_section_contour_attributes(node):
         "mode": int(node.get("mode")),
         "border": tuple(float(x) for x in node.get("border").strip().split(" ")),
         "fill": tuple(float(x) for x in node.get("fill").strip().split(" ")),
-        "points": _get_points_float(node.get("points")),
+        "points": parse_points(points) if points_as_array else _get_points_float(points),
     }
     return attributes
 
@@ -322,13 +669,17 @@ def extract_transform_attributes(node):
     return attributes
 
 
-def extract_zcontour_attributes(node):
+def extract_zcontour_attributes(node, points_as_array=False):
+    if points_as_array:
+        points = parse_points(node.get("points"), dims=3)
+    else:
+        points = [(float(x.split(" ")[0]), float(x.split(" ")[1]), int(x.split(" ")[2])) for x in [x.strip() for x in node.get("points").split(",")] if len(tuple(float(x) for x in x.split(" ") if x != "")) == 3]
     attributes = {
         "name": str(node.get("name")),
         "closed": str_to_bool(node.get("closed")),
         "border": tuple(float(x) for x in node.get("border").split(" ")),
         "fill": tuple(float(x) for x in node.get("fill").split(" ")),
         "mode": int(node.get("mode")),
-        "points": [(float(x.split(" ")[0]), float(x.split(" ")[1]), int(x.split(" ")[2])) for x in [x.strip() for x in node.get("points").split(",")] if len(tuple(float(x) for x in x.split(" ") if x != "")) == 3],
+        "points": points,
     }
     return attributes
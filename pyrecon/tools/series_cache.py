@@ -0,0 +1,112 @@
+"""Persistent on-disk cache of parsed RECONSTRUCT Sections."""
+import hashlib
+import os
+import pickle
+import tempfile
+
+CACHE_DIRNAME = ".pyrecon_cache"
+CACHE_VERSION = 6
+
+
+def file_signature(path):
+    """Return the (size, mtime) signature of a file, mtime in nanoseconds."""
+    stat = os.stat(path)
+    return stat.st_size, stat.st_mtime_ns
+
+
+def file_hash(path):
+    """Return the SHA-1 hex digest of a file's contents."""
+    digest = hashlib.sha1()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class SectionCache(object):
+    """ Pickled Sections stored next to a Series, or in cache_dir.
+
+        Each entry records the size, mtime and content hash of the Section
+        file it was parsed from. An entry is used when the size matches and
+        either the mtime or the content hash matches, so a file that was only
+        touched is not re-parsed.
+    """
+
+    def __init__(self, series_path, cache_dir=None):
+        self.cache_dir = cache_dir or os.path.join(series_path, CACHE_DIRNAME)
+
+    def _entry_path(self, section_path, points_as_array=False):
+        filename = os.path.basename(section_path)
+        if points_as_array:
+            filename += "-array"
+        return os.path.join(self.cache_dir, filename + ".pickle")
+
+    def is_fresh(self, section_path, points_as_array=False):
+        """ Return True if a cached Section for section_path is likely usable,
+            judged from the entry's header and the file's size and mtime only.
+        """
+        entry_path = self._entry_path(section_path, points_as_array=points_as_array)
+        if not os.path.exists(entry_path):
+            return False
+        size, _ = file_signature(section_path)
+        try:
+            with open(entry_path, "rb") as f:
+                header = pickle.load(f)
+        except (EOFError, pickle.UnpicklingError):
+            return False
+        return header.get("version") == CACHE_VERSION and header.get("size") == size
+
+    def get(self, section_path, points_as_array=False):
+        """ Return the cached Section for section_path, or None if stale or missing.
+        """
+        entry_path = self._entry_path(section_path, points_as_array=points_as_array)
+        if not os.path.exists(entry_path):
+            return None
+        size, mtime = file_signature(section_path)
+        try:
+            with open(entry_path, "rb") as f:
+                # The header is stored first so stale entries are rejected
+                # without unpickling the Section
+                header = pickle.load(f)
+                if header.get("version") != CACHE_VERSION or header["size"] != size:
+                    return None
+                if header["mtime"] != mtime and header["hash"] != file_hash(section_path):
+                    return None
+                section = pickle.load(f)
+        except (EOFError, KeyError, pickle.UnpicklingError):
+            return None
+        if header["mtime"] != mtime:
+            # Only touched, remember the new mtime to skip hashing next time
+            self._write(entry_path, dict(header, mtime=mtime), section)
+
+        # The Series directory may have moved since the entry was written
+        section._path = os.path.dirname(section_path)
+        for image in section.images:
+            image._path = section._path
+        return section
+
+    def put(self, section_path, section, points_as_array=False):
+        """ Store a parsed Section for section_path.
+        """
+        size, mtime = file_signature(section_path)
+        header = {
+            "version": CACHE_VERSION,
+            "size": size,
+            "mtime": mtime,
+            "hash": file_hash(section_path),
+        }
+        entry_path = self._entry_path(section_path, points_as_array=points_as_array)
+        self._write(entry_path, header, section)
+
+    def _write(self, entry_path, header, section):
+        os.makedirs(self.cache_dir, exist_ok=True)
+        # Write to a temporary file first so readers never see a partial entry
+        fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir)
+        try:
+            with os.fdopen(fd, "wb") as f:
+                pickle.dump(header, f, protocol=pickle.HIGHEST_PROTOCOL)
+                pickle.dump(section, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, entry_path)
+        except Exception:
+            os.remove(tmp_path)
+            raise
@@ -0,0 +1,132 @@
+"""Object statistics of a Series, as listed by RECONSTRUCT's object list.
+
+An object is every trace with the same name. Each Section is measured once,
+with Section.trace_metrics(), and its measurements are kept, so after editing
+some Sections only those are measured again.
+"""
+from collections import namedtuple
+
+import numpy
+
+ObjectStats = namedtuple("ObjectStats", [
+    "count",  # number of traces
+    "sections",  # number of Sections with a trace
+    "start",  # first Section index
+    "end",  # last Section index
+    "z_range",  # (bottom, top) z, from the cumulative Section thicknesses
+    "flat_area",  # open trace length times thickness
+    "volume",  # closed trace area times thickness (Cavalieri)
+    "surface_area",  # closed trace perimeter times thickness, plus end caps
+])
+
+# Columns of the per-name rows of section_measurements
+COUNT, AREA, PERIMETER, OPEN_LENGTH = range(4)
+
+
+def section_measurements(section):
+    """Return {name: row} for the traces of a Section, in normalized coordinates.
+
+    Each row holds the number of traces, the area and perimeter of closed
+    traces and the length of open traces, see COUNT, AREA, PERIMETER and
+    OPEN_LENGTH. Traces are measured from their normalized points, see
+    Section.trace_metrics. Traces without points are left out.
+    """
+    if not section.contours:
+        return {}
+    metrics = section.trace_metrics()
+    codes = {}
+    inverse = numpy.array(
+        [codes.setdefault(c.name, len(codes)) for c in section.contours], dtype=numpy.intp)
+    closed = numpy.array([c.closed is True for c in section.contours], dtype=bool)
+    measured = ~numpy.isnan(metrics.length)
+    area = numpy.where(measured & closed, numpy.abs(metrics.area), 0.0)
+    length = numpy.where(measured, metrics.length, 0.0)
+    rows = numpy.column_stack([
+        numpy.bincount(inverse, weights=column, minlength=len(codes))
+        for column in (measured, area, length * closed, length * ~closed)
+    ])
+    return {name: rows[code] for name, code in codes.items() if rows[code, COUNT]}
+
+
+def _signature(section):
+    """Return a value that changes when a Section's measurements may change.
+    """
+    # Transforms may be edited in place, so their coefficients are compared too
+    return (id(section), section.thickness, tuple(
+        (id(c), getattr(c, "_revision", None), c.transform and c.transform.key, c.closed, c.name)
+        for c in section.contours))
+
+
+class SeriesStatistics(object):
+    """ Object statistics of a Series, updated incrementally.
+
+        Measurements of every Section are taken on construction. After
+        editing Sections, call update() to measure again those that changed,
+        or update(indices) to measure only the given ones without loading
+        the others of a lazily loaded Series.
+    """
+
+    def __init__(self, series):
+        self.series = series
+        # Section index: (signature, thickness, measurements)
+        self._sections = {}
+        self.update()
+
+    def update(self, indices=None):
+        """ Measure the given Sections again, or every Section that changed
+            since it was last measured; return the measured indices.
+        """
+        sections = self.series.sections
+        for index in list(self._sections):
+            if index not in sections:
+                del self._sections[index]
+        if indices is None:
+            indices = list(sections)
+            force = False
+        else:
+            force = True
+        measured = []
+        for index in indices:
+            if index not in sections:
+                self._sections.pop(index, None)
+                continue
+            section = sections[index]
+            signature = _signature(section)
+            if not force and index in self._sections and self._sections[index][0] == signature:
+                continue
+            self._sections[index] = (
+                signature, section.thickness or 0.0, section_measurements(section))
+            measured.append(index)
+        return measured
+
+    def objects(self):
+        """ Return {name: ObjectStats} of every object in the Series, from the
+            current measurements.
+        """
+        z = 0.0
+        rows = {}
+        for index in sorted(self._sections):
+            _, thickness, measurements = self._sections[index]
+            for name, row in measurements.items():
+                rows.setdefault(name, []).append((index, z, thickness, row))
+            z += thickness
+
+        objects = {}
+        for name, entries in rows.items():
+            data = numpy.array([row for _, _, _, row in entries])
+            thickness = numpy.array([t for _, _, t, _ in entries])
+            (first, bottom, _, _), (last, top, last_thickness, _) = entries[0], entries[-1]
+            # Closed area of the first and last Sections that have any
+            caps = data[:, AREA][data[:, AREA] > 0]
+            caps = caps[0] + caps[-1] if len(caps) else 0.0
+            objects[name] = ObjectStats(
+                count=int(data[:, COUNT].sum()),
+                sections=len(entries),
+                start=first,
+                end=last,
+                z_range=(bottom, top + last_thickness),
+                flat_area=float(numpy.dot(data[:, OPEN_LENGTH], thickness)),
+                volume=float(numpy.dot(data[:, AREA], thickness)),
+                surface_area=float(numpy.dot(data[:, PERIMETER], thickness) + caps),
+            )
+        return objects
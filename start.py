@@ -12,15 +12,15 @@ import numpy
 import os
 import sys
 
+from PIL import Image as PILImage
 from PyQt5 import QtCore, QtGui, QtWidgets
-from skimage import io
-from skimage.transform import warp
 from sqlalchemy import create_engine
 from sqlalchemy.exc import OperationalError
 from sqlalchemy.orm import sessionmaker
 
-from pyrecon.classes.transform import get_skimage_transform
-from pyrecon.tools.reconstruct_reader import process_series_directory
+from pyrecon.classes import Image, Transform
+from pyrecon.tools.image_warp import TiledWarper
+from pyrecon.tools.reconstruct_reader import CancelToken, LoadCancelled, process_series_directory
 from pyrecon.tools.reconstruct_writer import write_series
 from pyrecon.tools.mergetool import backend
 
@@ -28,6 +28,8 @@ from pyrecon.tools.mergetool import backend
 MERGETOOL_DIR = "mergetool"
 DB_FILENAME = "{project_name}.db"
 JSON_FILENAME = "{project_name}.json"
+# Show Section images warped into alignment in resolveDialog (--warp-images)
+WARP_IMAGES = "--warp-images" in sys.argv[1:]
 
 
 def get_db_session():
@@ -73,7 +75,7 @@ def init_mergetool_project(series_path_list):
     os.environ["MERGETOOL_JSON_FILEPATH"] = json_fp
 
 
-def start_database(series_path_list, app):
+def start_database(series_path_list, app, realign=False):
     db_session = get_db_session()
 
     splash_pix = QtGui.QPixmap('loading2.gif')
@@ -86,13 +88,36 @@ def start_database(series_path_list, app):
     i = 0
     progressBar.setValue(i)
 
+    # Stops loading before the next Section; clicks are handled in show_load_progress
+    cancel = CancelToken()
+    cancelButton = QtWidgets.QPushButton("Cancel", splash)
+    cancelButton.move(0, progressBar.height())
+    cancelButton.clicked.connect(cancel.cancel)
+    cancelButton.show()
+
+    def show_load_progress(progress):
+        progressBar.setMaximum(progress.sections_total)
+        progressBar.setValue(progress.sections_done)
+        progressBar.setFormat("%v/%m sections ({:.1f} MB/s, {:.0f}s left)".format(
+            progress.bytes_read / max(progress.elapsed, 1e-6) / 2**20,
+            progress.eta or 0
+        ))
+        app.processEvents()
+
     # Load series from series_path_list
     print (series_path_list)
     series_list = []
     for series_path in series_path_list:
         series_path = series_path if os.path.isdir(series_path) \
                       else os.path.dirname(series_path)
-        series_list.append(process_series_directory(series_path, data_check=True))
+        try:
+            series_list.append(process_series_directory(
+                series_path, data_check=True, progress=show_load_progress, cancel=cancel))
+        except LoadCancelled:
+            splash.close()
+            return None
+    cancelButton.hide()
+    progressBar.resetFormat()
 
     # Assign "Main" Series (one with ideal alignment)
     main_series_path = series_path_list[0] if os.path.isdir(series_path_list[0]) \
@@ -119,7 +144,8 @@ def start_database(series_path_list, app):
     progressBar.setValue(i)
     app.processEvents()
 
-    # Find matches
+    # Find matches, optionally with every Series mapped into the Main Series' alignment
+    shapes = backend.align_series_list(series_list) if realign else None
 
     for section_index in section_indices:
 
@@ -131,7 +157,8 @@ def start_database(series_path_list, app):
         backend.load_db_contourmatches_from_db_contours_and_pyrecon_series_list(
             db_session,
             db_contours,
-            series_list
+            series_list,
+            shapes=shapes
         )
 
     i += 1
@@ -1221,21 +1248,27 @@ class resolveDialog(QtWidgets.QDialog):
             else:
                 # Transform image and create pixmap from it
                 image_transform = self.itemData[i]['image_transform']
-                tform = get_skimage_transform(
-                    dim=image_transform['dim'],
-                    xcoef=image_transform['xcoef'],
-                    ycoef=image_transform['ycoef'],
-                )
-                pixmap = QtGui.QPixmap(image_path)
-#                 img = io.imread(image_path, as_grey=True)
-#                 t_img = img  # Ignoring warp for now
-#                 t_img = warp(img, tform)
-#                 t_img = (t_img * 255).round().astype('uint8')
-#                 l, w = len(t_img), len(t_img[0])
-#                 qimage = QtGui.QImage(t_img.tobytes(), l, w, QtGui.QImage.Format_Grayscale8)
-#                 pixmap = QtGui.QPixmap(qimage)
-
-            points = self.itemData[i]['points']
+                if WARP_IMAGES:
+                    # Warp the image over its own extent, tile by tile
+                    mag = self.itemData[i]['mag']
+                    image = Image(
+                        src=os.path.basename(image_path),
+                        _path=os.path.dirname(image_path),
+                        mag=mag,
+                        transform=Transform(**image_transform),
+                    )
+                    bounds = (0, 0, self.itemData[i]['image_width'] * mag,
+                              self.itemData[i]['image_height'] * mag)
+                    t_img = TiledWarper(image).render(bounds=bounds)
+                    t_img = numpy.ascontiguousarray(
+                        PILImage.fromarray(t_img).convert("L"), dtype=numpy.uint8)
+                    l, w = t_img.shape
+                    qimage = QtGui.QImage(t_img.data, w, l, w, QtGui.QImage.Format_Grayscale8)
+                    pixmap = QtGui.QPixmap.fromImage(qimage.copy())
+                else:
+                    pixmap = QtGui.QPixmap(image_path)
+
+            points = self.itemData[i]['display_points']
             polygon = QtGui.QPolygon()
             for point in points:
                 polygon.append(QtCore.QPoint(*point))
@@ -1602,7 +1635,7 @@ class OutputSeriesDialog(QtWidgets.QDialog):
         self.close()
 
 
-def startLoadDialogs():
+def startLoadDialogs(realign=False):
     app = QtWidgets.QApplication(sys.argv)
     initialWindow = RestoreDialog()
     if (initialWindow.restoreBool == False):
@@ -1613,7 +1646,11 @@ def startLoadDialogs():
             app.quit()
         else:
             init_mergetool_project(fileList)
-            jsonData = start_database(fileList, app)
+            jsonData = start_database(fileList, app, realign=realign)
+            if jsonData is None:
+                # Loading was cancelled
+                app.quit()
+                return
 
     elif (len(initialWindow.returnFileList()) > 0):
         # Existing mergetool project
@@ -1634,7 +1671,8 @@ def startLoadDialogs():
 
 
 def main():
-    startLoadDialogs()
+    # --realign: match contours after fitting each Series to the Main Series' alignment
+    startLoadDialogs(realign="--realign" in sys.argv[1:])
 
 
 main()
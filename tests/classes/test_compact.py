@@ -0,0 +1,80 @@
+import pickle
+from unittest import TestCase
+
+import numpy
+
+from pyrecon.classes import Contour, Image, Transform, ZContour
+from pyrecon.classes.compact import (
+    CompactContour, CompactImage, CompactZContour, compact_contour, compact_image,
+    compact_zcontour
+)
+from pyrecon.tools import reconstruct_reader
+
+SECTION_PATH = "tests/tools/_data/_VRJXH.98"
+
+
+class CompactTests(TestCase):
+
+    def setUp(self):
+        self.section = reconstruct_reader.process_section_file(SECTION_PATH)
+
+    def test_compact_contour(self):
+        for contour in self.section.contours:
+            compact = compact_contour(contour)
+            self.assertIsInstance(compact, Contour)
+            self.assertIsInstance(compact.points, numpy.ndarray)
+            self.assertEqual(compact, contour)
+            self.assertEqual(contour, compact)
+            self.assertEqual(compact.point_list, contour.point_list)
+            self.assertTrue(compact.shape.equals(contour.shape))
+
+    def test_shared_values(self):
+        contour = self.section.contours[0]
+        first = compact_contour(contour)
+        second = compact_contour(contour)
+        self.assertIs(first.border, second.border)
+        self.assertIs(first.fill, second.fill)
+        self.assertIs(first.name, second.name)
+        self.assertIs(first.transform, contour.transform)
+
+    def test_points_reassigned(self):
+        compact = CompactContour(
+            closed=False,
+            points=[(0, 0), (1, 1)],
+            transform=Transform(dim=0, xcoef=[0, 1, 0, 0, 0, 0], ycoef=[0, 0, 1, 0, 0, 0]),
+        )
+        self.assertEqual(compact.shape.length, numpy.sqrt(2))
+        compact.points = [(0, 0), (3, 4)]
+        self.assertEqual(compact.points.dtype, numpy.float64)
+        self.assertEqual(compact.shape.length, 5)
+        self.assertEqual(set(vars(compact)), set())
+
+    def test_compact_image_zcontour(self):
+        image = self.section.images[0]
+        compact = compact_image(image)
+        self.assertEqual(compact, image)
+        self.assertIsInstance(compact, Image)
+        self.assertEqual(compact.attributes(), image.attributes())
+        zcontour = ZContour(name="z", closed=False, points=[(1, 2, 3), (4, 5, 6)])
+        self.assertEqual(compact_zcontour(zcontour), zcontour)
+        self.assertEqual(compact_zcontour(zcontour).points.shape, (2, 3))
+        self.assertIsInstance(compact_zcontour(zcontour), ZContour)
+
+    def test_pickle(self):
+        compact = compact_contour(self.section.contours[0])
+        compact.shape
+        copy = pickle.loads(pickle.dumps(compact))
+        self.assertEqual(copy, compact)
+        self.assertIsNone(copy._shape)
+
+    def test_process_series_directory_compact(self):
+        series = reconstruct_reader.process_series_directory("tests/tools/_data", compact=True)
+        section = series.sections[98]
+        self.assertTrue(all(isinstance(c, CompactContour) for c in section.contours))
+        self.assertEqual(section.contours, self.section.contours)
+        self.assertIsInstance(section.images[0], CompactImage)
+        self.assertIsInstance(series.contours[0], CompactContour)
+        self.assertTrue(all(isinstance(z, CompactZContour) for z in series.zcontours))
+        lazy = reconstruct_reader.process_series_directory(
+            "tests/tools/_data", compact=True, lazy=True)
+        self.assertIsInstance(lazy.sections[98].contours[0], CompactContour)
@@ -1,6 +1,9 @@
 from unittest import TestCase
 
+import numpy
+
 from pyrecon.classes import Contour, Transform
+from pyrecon.classes.contour import LOD_TOLERANCES
 
 
 class ContourTests(TestCase):
@@ -69,3 +72,52 @@ class ContourTests(TestCase):
             transform=transform,
         )
         self.assertEqual(point_contour.shape.type, "Point")
+
+    def test_shape_cached(self):
+        transform = Transform(
+            dim=1,
+            xcoef=[1, 0, 0, 0, 0, 0],
+            ycoef=[2, 0, 0, 0, 0, 0],
+        )
+        contour = Contour(
+            closed=True,
+            points=[(0.0, 0.0), (4.0, 0.0), (4.0, 4.0), (0.0, 4.0)],
+            transform=transform,
+        )
+        shape = contour.shape
+        self.assertIs(contour.shape, shape)
+        self.assertIs(contour.normalized_points, contour.normalized_points)
+        self.assertEqual(contour.shape.bounds, (-1.0, -2.0, 3.0, 2.0))
+
+        contour.points = [(0.0, 0.0), (2.0, 0.0), (2.0, 2.0)]
+        self.assertEqual(contour.shape.bounds, (-1.0, -2.0, 1.0, 0.0))
+        contour.transform = Transform(dim=0, xcoef=[0, 1, 0, 0, 0, 0], ycoef=[0, 0, 1, 0, 0, 0])
+        self.assertEqual(contour.shape.bounds, (0.0, 0.0, 2.0, 2.0))
+        contour.transform.xcoef = [5, 1, 0, 0, 0, 0]
+        contour.transform.dim = 1
+        self.assertEqual(contour.shape.bounds, (-5.0, 0.0, -3.0, 2.0))
+        contour.closed = False
+        self.assertEqual(contour.shape.type, "LineString")
+
+    def test_simplified_shape(self):
+        angles = numpy.linspace(0, 2 * numpy.pi, 400, endpoint=False)
+        contour = Contour(
+            closed=True,
+            points=list(zip(numpy.cos(angles), numpy.sin(angles))),
+            transform=Transform(dim=0, xcoef=[0, 1, 0, 0, 0, 0], ycoef=[0, 0, 1, 0, 0, 0]),
+        )
+        self.assertIs(contour.simplified_shape(0), contour.shape)
+        counts = [len(contour.simplified_shape(level).exterior.coords) for level in range(4)]
+        self.assertEqual(counts, sorted(counts, reverse=True))
+        self.assertLess(counts[-1], counts[0])
+        for level in range(1, 4):
+            coarse = contour.simplified_shape(level)
+            self.assertIs(contour.simplified_shape(level), coarse)
+            self.assertTrue(coarse.is_valid)
+            self.assertLessEqual(
+                coarse.hausdorff_distance(contour.shape), LOD_TOLERANCES[level - 1] + 1e-12)
+
+        coarse = contour.simplified_shape(3)
+        contour.points = [(x * 2, y * 2) for x, y in contour.points]
+        self.assertIsNot(contour.simplified_shape(3), coarse)
+        self.assertAlmostEqual(contour.simplified_shape(3).bounds[2], 2.0, places=1)
@@ -0,0 +1,71 @@
+import os
+from unittest import TestCase
+
+import numpy
+
+from pyrecon.classes import Contour, Section, Transform
+from pyrecon.classes.contour_table import NO_MODE, ContourTable
+from pyrecon.tools import reconstruct_reader
+
+DATA_LOC = "tests/tools/_data"
+
+
+class ContourTableTests(TestCase):
+
+    def setUp(self):
+        path = os.path.join(DATA_LOC, "_VRJXH.98")
+        self.section = reconstruct_reader.process_section_file(path)
+
+    def test_from_contours(self):
+        contours = self.section.contours
+        table = ContourTable.from_contours(contours)
+        self.assertEqual(len(table), len(contours))
+        self.assertEqual(table.points.shape, (sum(len(c.points) for c in contours), 2))
+        self.assertEqual(table.counts().tolist(), [len(c.points) for c in contours])
+        # Identical Transforms and colors are stored once
+        self.assertEqual(len(table.transforms), 1)
+        self.assertLess(len(table.borders), len(contours))
+
+    def test_round_trip(self):
+        table = ContourTable.from_contours(self.section.contours)
+        self.assertEqual(table.to_contours(), self.section.contours)
+        for contour, row in zip(self.section.contours, table):
+            self.assertEqual(row.hidden, contour.hidden)
+            self.assertEqual(row.comment, contour.comment)
+        self.assertEqual(table[-1], self.section.contours[-1])
+        with self.assertRaises(IndexError):
+            table[len(table)]
+
+    def test_views(self):
+        table = ContourTable.from_contours(self.section.contours)
+        contour = table[1]
+        self.assertIsInstance(contour.points, numpy.ndarray)
+        self.assertTrue(numpy.shares_memory(contour.points, table.points))
+
+    def test_missing_values(self):
+        transform = Transform(dim=0, xcoef=[0, 1, 0, 0, 0, 0], ycoef=[0, 0, 1, 0, 0, 0])
+        contour = Contour(name="a", closed=True, simplified=False, mode=11,
+                          points=[(0, 0), (1, 0), (1, 1)], transform=transform)
+        row = ContourTable.from_contours([contour])[0]
+        self.assertIsNone(row.border)
+        self.assertIsNone(row.fill)
+        self.assertEqual(row, contour)
+
+    def test_missing_mode(self):
+        contours = [Contour(name="a", closed=True, mode=mode, points=[(0, 0), (1, 0), (1, 1)])
+                    for mode in (None, 0, -13)]
+        table = ContourTable.from_contours(contours)
+        self.assertEqual(table.modes[0], NO_MODE)
+        self.assertEqual([row.mode for row in table], [None, 0, -13])
+
+    def test_section_contour_table(self):
+        table = self.section.contour_table()
+        self.assertIs(self.section.contour_table(), table)
+        self.section.contours = self.section.contours[1:]
+        self.assertEqual(len(self.section.contour_table()), len(table) - 1)
+        self.section.contours.append(table[0])
+        self.assertEqual(len(self.section.contour_table()), len(table))
+
+        empty = Section(contours=[]).contour_table()
+        self.assertEqual(len(empty), 0)
+        self.assertEqual(empty.points.shape, (0, 2))
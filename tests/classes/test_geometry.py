@@ -0,0 +1,60 @@
+from unittest import TestCase
+
+import numpy
+
+from pyrecon.classes.geometry import (
+    INVALID, LINE, POINT, POLYGON, build_shape, classify_traces, trace_metrics
+)
+
+
+class GeometryTests(TestCase):
+
+    def test_classify_traces(self):
+        traces = [
+            [(1.0, 1.0)],
+            [(1.0, 1.0), (2.0, 2.0)],
+            [(0, 0), (1, 0), (1, 1), (0, 1)],
+            # Open
+            [(0, 0), (1, 0), (1, 1), (0, 1)],
+            # Back and forth
+            [(15.9352, 10.8615), (15.9332, 10.8508), (15.9352, 10.8615)],
+            # Repeated point within tolerance
+            [(13.9099, 8.16357), (13.9099, 8.16356), (13.8962, 8.19828)],
+            # Collinear
+            [(0, 0), (1, 1), (2, 2), (1, 1)],
+            # Bow tie
+            [(0, 0), (2, 2), (2, 0), (0, 1)],
+            # Touches itself
+            [(13.583, 9.11925), (13.6035, 9.09733), (13.6142, 9.07453),
+             (13.6035, 9.09732), (13.583, 9.11925), (13.5765, 9.12278)],
+        ]
+        closed = [True] * len(traces)
+        closed[3] = False
+        self.assertEqual(
+            classify_traces(traces, closed),
+            [POINT, LINE, POLYGON, LINE, LINE, LINE, LINE, INVALID, INVALID],
+        )
+        self.assertEqual(classify_traces([], []), [])
+
+    def test_build_shape_repair(self):
+        bow_tie = [(0, 0), (2, 2), (2, 0), (0, 1)]
+        self.assertEqual(build_shape(bow_tie, INVALID).geom_type, "LineString")
+        repaired = build_shape(bow_tie, INVALID, repair=True)
+        self.assertTrue(repaired.is_valid)
+        self.assertGreater(repaired.area, 0)
+
+    def test_trace_metrics(self):
+        traces = [
+            [(0, 0), (2, 0), (2, 2), (0, 2)],
+            [(0, 0), (0, 2), (2, 2), (2, 0)],
+            [(0, 0), (3, 0), (3, 4)],
+            [(1.5, 2.5)],
+            [],
+        ]
+        metrics = trace_metrics(traces, [True, True, False, False, True])
+        numpy.testing.assert_allclose(metrics.area, [4, -4, 0, 0, numpy.nan])
+        numpy.testing.assert_allclose(metrics.length, [8, 8, 7, 0, numpy.nan])
+        numpy.testing.assert_allclose(metrics.centroid, [
+            (1, 1), (1, 1), (2, 4 / 3.0), (1.5, 2.5), (numpy.nan, numpy.nan)])
+        numpy.testing.assert_allclose(metrics.extent, [
+            (0, 0, 2, 2), (0, 0, 2, 2), (0, 0, 3, 4), (1.5, 2.5, 1.5, 2.5), [numpy.nan] * 4])
@@ -0,0 +1,150 @@
+from unittest import TestCase
+
+import numpy
+from shapely.geometry import Point, box
+
+from pyrecon.classes import Contour, Section, Transform
+from pyrecon.classes.compact import compact_section
+from pyrecon.tools import reconstruct_reader
+
+SECTION_PATH = "tests/tools/_data/_VRJXH.98"
+
+
+class SectionTests(TestCase):
+
+    def setUp(self):
+        self.section = reconstruct_reader.process_section_file(SECTION_PATH)
+
+    def test_normalized_points(self):
+        normalized = self.section.normalized_points()
+        self.assertEqual(len(normalized), len(self.section.contours))
+        for contour, points in zip(self.section.contours, normalized):
+            numpy.testing.assert_allclose(
+                points, contour.transform.apply_inverse(contour.points))
+        self.assertIs(self.section.normalized_points(), normalized)
+        self.section.contours.pop()
+        self.assertEqual(len(self.section.normalized_points()), len(normalized) - 1)
+
+    def test_normalized_points_contour_changed(self):
+        normalized = self.section.normalized_points()
+        contour = self.section.contours[0]
+        self.assertIs(contour.normalized_points, normalized[0])
+        contour.points = numpy.asarray(contour.points) + 1
+        self.assertIsNot(self.section.normalized_points(), normalized)
+
+    def test_cache_invalidated(self):
+        table = self.section.contour_table()
+        self.assertIs(self.section.contour_table(), table)
+        contour = self.section.contours[0]
+        contour.name = "renamed"
+        table = self.section.contour_table()
+        self.assertEqual(table.names[table.name_codes[0]], "renamed")
+        contour.hidden = not contour.hidden
+        self.assertIsNot(self.section.contour_table(), table)
+
+        # Editing a Transform shared by several contours in place
+        normalized = self.section.normalized_points()
+        contour.transform.xcoef = [contour.transform.xcoef[0] + 1] + list(contour.transform.xcoef[1:])
+        contour.transform.dim = max(contour.transform.dim, 1)
+        self.assertIsNot(self.section.normalized_points(), normalized)
+        numpy.testing.assert_allclose(
+            self.section.normalized_points()[0], contour.transform.apply_inverse(contour.points))
+
+    def test_use_inverse_grids(self):
+        transform = Transform(dim=6, xcoef=[0.5, 1, 0, 0.001, 0, 0], ycoef=[0, 0, 1, 0, 0.002, 0])
+        contours = [
+            Contour(points=[(1.0, 1.0), (2.0, 3.0)], transform=transform, closed=False),
+            Contour(points=[(4.0, 2.0)], transform=transform, closed=False),
+        ]
+        section = Section(contours=contours)
+        expected = [contour.transform.apply_inverse(contour.points) for contour in contours]
+        section.use_inverse_grids()
+        self.assertEqual(transform._inverse_grids[0][1].bounds, (1.0, 1.0, 4.0, 3.0))
+        for points, contour in zip(expected, contours):
+            numpy.testing.assert_allclose(contour.transform.apply_inverse(contour.points), points)
+
+    def test_shapes(self):
+        kinds = self.section.classify_contours()
+        shapes = self.section.shapes()
+        self.assertEqual([shape.geom_type for shape in shapes], kinds)
+        for contour, shape in zip(self.section.contours, shapes):
+            self.assertIs(contour.shape, shape)
+        self.section.contours[0].closed = not self.section.contours[0].closed
+        self.assertEqual(self.section.classify_contours()[0], "LineString")
+
+    def test_trace_metrics(self):
+        metrics = self.section.trace_metrics()
+        self.assertEqual(len(metrics.area), len(self.section.contours))
+        for i, (contour, shape) in enumerate(zip(self.section.contours, self.section.shapes())):
+            if shape.geom_type == "Polygon" or not contour.closed:
+                self.assertAlmostEqual(abs(metrics.area[i]), shape.area)
+                self.assertAlmostEqual(metrics.length[i], shape.length)
+                numpy.testing.assert_allclose(metrics.extent[i], shape.bounds)
+            if shape.geom_type == "Polygon":
+                numpy.testing.assert_allclose(metrics.centroid[i], shape.centroid.coords[0])
+        self.assertIs(self.section.trace_metrics(), metrics)
+        self.section.contours[0].points = numpy.asarray(self.section.contours[0].points) + 1
+        self.assertIsNot(self.section.trace_metrics(), metrics)
+
+    def test_contour_queries(self):
+        shapes = self.section.shapes()
+        polygon = next(shape for shape in shapes if shape.geom_type == "Polygon")
+        x, y = polygon.representative_point().coords[0]
+        expected = [c for c, shape in zip(self.section.contours, shapes)
+                    if shape.intersects(Point(x, y))]
+        self.assertTrue(expected)
+        self.assertEqual(self.section.contours_at(x, y), expected)
+
+        minx, miny, maxx, maxy = polygon.bounds
+        bounds = (minx, miny, (minx + maxx) / 2, (miny + maxy) / 2)
+        expected = [c for c, shape in zip(self.section.contours, shapes)
+                    if shape.intersects(box(*bounds))]
+        self.assertEqual(self.section.contours_in(bounds), expected)
+
+        nearest = self.section.nearest_contours(x + 1, y, k=3)
+        distances = sorted(shape.distance(Point(x + 1, y)) for shape in shapes)
+        numpy.testing.assert_allclose([d for _, d in nearest], distances[:3])
+        for contour, distance in nearest:
+            self.assertAlmostEqual(contour.shape.distance(Point(x + 1, y)), distance)
+
+    def test_contour_index_rebuilt(self):
+        tree, _ = self.section.contour_index()
+        self.assertIs(self.section.contour_index()[0], tree)
+        contour = self.section.contours[0]
+        contour.points = numpy.asarray(contour.points) + 1000
+        self.assertIsNot(self.section.contour_index()[0], tree)
+        x, y = contour.shape.centroid.coords[0]
+        self.assertIs(self.section.nearest_contours(x, y)[0][0], contour)
+
+        # Editing a Transform in place moves its contours in the index too
+        tree, _ = self.section.contour_index()
+        transform = contour.transform
+        transform.xcoef = [transform.xcoef[0] - 5000] + list(transform.xcoef[1:])
+        transform.dim = max(transform.dim, 1)
+        self.assertIsNot(self.section.contour_index()[0], tree)
+        x, y = contour.shape.centroid.coords[0]
+        self.assertIn(contour, self.section.contours_at(x, y))
+        self.assertIs(self.section.nearest_contours(x, y)[0][0], contour)
+
+    def test_contour_index_invalidate(self):
+        tree, _ = self.section.contour_index()
+        # Queries and reads leave the index in place
+        self.section.contours_at(0, 0)
+        self.section.contours[0].shape
+        self.assertIs(self.section.contour_index()[0], tree)
+        # Replacing a contour in place needs invalidate()
+        moved = Contour(
+            name="moved", closed=True, points=[(1000, 1000), (1001, 1000), (1001, 1001)],
+            transform=self.section.contours[0].transform)
+        self.section.contours[0] = moved
+        self.section.invalidate()
+        self.assertEqual(self.section.contours_at(1000.5, 1000.2), [moved])
+
+    def test_compact_contour_edits(self):
+        compact_section(self.section)
+        table = self.section.contour_table()
+        self.section.contours[0].name = "renamed"
+        table = self.section.contour_table()
+        self.assertEqual(table.names[table.name_codes[0]], "renamed")
+        self.section.contours[0].closed = not self.section.contours[0].closed
+        self.assertIsNot(self.section.contour_table(), table)
@@ -0,0 +1,59 @@
+from unittest import TestCase
+
+from pyrecon.classes import Section
+from pyrecon.classes.series import LazySections
+
+
+class LazySectionsTests(TestCase):
+
+    def setUp(self):
+        self.loaded = []
+
+        def loader(path):
+            self.loaded.append(path)
+            return Section(name=path, index=int(path.rsplit(".", 1)[-1]))
+
+        self.sections = LazySections(
+            [(i, "series.{}".format(i)) for i in range(1, 6)],
+            loader,
+            max_resident=2,
+        )
+
+    def test_keys_do_not_load(self):
+        self.assertEqual(list(self.sections), [1, 2, 3, 4, 5])
+        self.assertEqual(len(self.sections), 5)
+        self.assertIn(3, self.sections)
+        self.assertNotIn(6, self.sections)
+        self.assertEqual(self.loaded, [])
+
+    def test_load_on_access(self):
+        self.assertEqual(self.sections[2].index, 2)
+        self.assertIs(self.sections[2], self.sections[2])
+        self.assertEqual(self.loaded, ["series.2"])
+        with self.assertRaises(KeyError):
+            self.sections[6]
+
+    def test_lru_eviction(self):
+        self.sections[1]
+        self.sections[2]
+        self.sections[1]
+        self.sections[3]
+        self.assertEqual(self.sections.resident(), [1, 3])
+        self.sections[2]
+        self.assertEqual(self.loaded, ["series.1", "series.2", "series.3", "series.2"])
+
+    def test_assigned_sections_are_kept(self):
+        section = self.sections[1]
+        self.sections[1] = section
+        self.sections[6] = Section(index=6)
+        for index in range(2, 6):
+            self.sections[index]
+        self.assertIs(self.sections[1], section)
+        self.assertEqual(list(self.sections), [1, 2, 3, 4, 5, 6])
+        self.assertEqual(self.sections.resident(), [1, 4, 5, 6])
+
+    def test_delete(self):
+        del self.sections[2]
+        self.assertEqual(list(self.sections), [1, 3, 4, 5])
+        with self.assertRaises(KeyError):
+            del self.sections[2]
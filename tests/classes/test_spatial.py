@@ -0,0 +1,40 @@
+from unittest import TestCase
+
+import numpy
+
+from pyrecon.classes.spatial import BoxTree
+
+
+def _point_distances(points):
+    def distances(indices, point):
+        return numpy.sqrt(((points[indices] - point) ** 2).sum(axis=1))
+    return distances
+
+
+class BoxTreeTests(TestCase):
+
+    def setUp(self):
+        random = numpy.random.RandomState(0)
+        self.mins = random.uniform(0, 100, (500, 2))
+        self.maxs = self.mins + random.uniform(0, 5, (500, 2))
+        self.tree = BoxTree(self.mins, self.maxs, node_size=8)
+
+    def test_query(self):
+        for mins, maxs in [((10, 10), (30, 20)), ((50, 0), (50, 100)), ((200, 200), (300, 300))]:
+            expected = numpy.flatnonzero(
+                ((self.mins <= maxs) & (self.maxs >= mins)).all(axis=1))
+            numpy.testing.assert_array_equal(self.tree.query(mins, maxs), expected)
+        self.assertEqual(len(BoxTree(numpy.zeros((0, 2)), numpy.zeros((0, 2))).query((0, 0), (1, 1))), 0)
+
+    def test_nearest(self):
+        # Objects are the boxes' lower corners
+        distances = _point_distances(self.mins)
+        point = numpy.array([42.0, 17.0])
+        indices, found = self.tree.nearest(point, distances, k=5)
+        expected = numpy.argsort(distances(numpy.arange(len(self.mins)), point))[:5]
+        numpy.testing.assert_array_equal(indices, expected)
+        numpy.testing.assert_allclose(found, distances(expected, point))
+
+        small = BoxTree(self.mins[:3], self.maxs[:3])
+        indices, _ = small.nearest(point, distances, k=10)
+        self.assertEqual(sorted(indices.tolist()), [0, 1, 2])
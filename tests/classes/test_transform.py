@@ -0,0 +1,158 @@
+import pickle
+from unittest import TestCase
+
+import numpy
+
+from pyrecon.classes import Transform
+from pyrecon.classes.transform import (
+    estimate_transforms, polynomial_forward, polynomial_inverse
+)
+
+XCOEF = [1.5, 1.02, 0.03, 0.001, -0.002, 0.0005]
+YCOEF = [-0.7, -0.01, 0.98, 0.0008, 0.0003, -0.001]
+
+
+class TransformTests(TestCase):
+
+    def test_polynomial_inverse(self):
+        pts = numpy.random.RandomState(0).uniform(-20, 20, size=(500, 2))
+        transform = Transform(dim=6, xcoef=XCOEF, ycoef=YCOEF)
+        inverse = transform._tform.inverse(pts)
+        self.assertEqual(inverse.shape, pts.shape)
+        numpy.testing.assert_allclose(transform._tform(inverse), pts, atol=1e-8)
+        numpy.testing.assert_allclose(polynomial_forward(XCOEF, YCOEF, inverse), pts, atol=1e-8)
+
+    def test_polynomial_inverse_guess(self):
+        pts = numpy.array([[3.0, 4.0], [-2.0, 7.5]])
+        exact = polynomial_inverse(XCOEF, YCOEF, pts)
+        guessed = polynomial_inverse(XCOEF, YCOEF, pts, guess=exact + 0.01)
+        numpy.testing.assert_allclose(guessed, exact, atol=1e-8)
+
+    def test_polynomial_inverse_empty(self):
+        self.assertEqual(polynomial_inverse(XCOEF, YCOEF, numpy.empty((0, 2))).shape, (0, 2))
+
+    def test_tform_shared(self):
+        transform1 = Transform(dim=6, xcoef=list(XCOEF), ycoef=list(YCOEF))
+        transform2 = Transform(dim=6, xcoef=list(XCOEF), ycoef=list(YCOEF))
+        self.assertIs(transform1._tform, transform1._tform)
+        self.assertIs(transform1._tform, transform2._tform)
+
+    def test_tform_invalidated(self):
+        transform = Transform(dim=3, xcoef=[0, 1, 0, 0, 0, 0], ycoef=[0, 0, 1, 0, 0, 0])
+        tform = transform._tform
+        transform.xcoef[0] = 5
+        self.assertIsNot(transform._tform, tform)
+        numpy.testing.assert_allclose(transform._tform([[0.0, 0.0]]), [[5.0, 0.0]])
+        transform.ycoef = [2, 0, 1, 0, 0, 0]
+        numpy.testing.assert_allclose(transform._tform([[0.0, 0.0]]), [[5.0, 2.0]])
+
+    def test_pickle(self):
+        transform = Transform(dim=6, xcoef=XCOEF, ycoef=YCOEF)
+        transform._tform
+        copy = pickle.loads(pickle.dumps(transform))
+        self.assertEqual(copy, transform)
+        self.assertIsNone(copy._tform_cache)
+        self.assertIs(copy._tform, transform._tform)
+
+    def test_apply_many(self):
+        transform = Transform(dim=6, xcoef=XCOEF, ycoef=YCOEF)
+        point_lists = [[(1.0, 2.0), (3.0, 4.0)], [], [(5.0, 6.0)]]
+        results = transform.inverse_many(point_lists)
+        self.assertEqual([len(r) for r in results], [2, 0, 1])
+        numpy.testing.assert_allclose(results[2], transform.apply_inverse([(5.0, 6.0)]))
+        forward = transform.apply_many(results)
+        numpy.testing.assert_allclose(numpy.concatenate(forward), [(1, 2), (3, 4), (5, 6)])
+
+    def test_compose_affine(self):
+        first = Transform(dim=3, xcoef=[1, 2, 0.5, 0, 0, 0], ycoef=[-1, 0.1, 1.5, 0, 0, 0])
+        second = Transform.scaling(0.25)
+        composed = first.compose(second)
+        self.assertIsInstance(composed, Transform)
+        pts = numpy.array([[1.0, 2.0], [-3.0, 0.5]])
+        numpy.testing.assert_allclose(composed.apply(pts), second.apply(first.apply(pts)))
+        numpy.testing.assert_allclose(first.inverted().apply(first.apply(pts)), pts)
+        self.assertIsInstance(first.inverted(), Transform)
+
+    def test_compose_polynomial(self):
+        polynomial = Transform(dim=6, xcoef=XCOEF, ycoef=YCOEF)
+        scaling = Transform.scaling(2.0)
+        composed = scaling.compose(polynomial.inverted())
+        pts = numpy.array([[1.0, 2.0], [-3.0, 0.5]])
+        numpy.testing.assert_allclose(composed.apply(pts), polynomial.apply_inverse(pts * 2))
+        numpy.testing.assert_allclose(composed.apply_inverse(composed.apply(pts)), pts)
+        numpy.testing.assert_allclose(composed.inverted().apply(composed.apply(pts)), pts)
+
+    def test_matrix_is_a_copy(self):
+        transform = Transform(dim=3, xcoef=[1, 2, 0.5, 0, 0, 0], ycoef=[3, 0.25, 2, 0, 0, 0])
+        transform.matrix()[0, 0] = 100.0
+        other = Transform(dim=3, xcoef=[1, 2, 0.5, 0, 0, 0], ycoef=[3, 0.25, 2, 0, 0, 0])
+        self.assertEqual(other.matrix()[0, 0], 2.0)
+        numpy.testing.assert_allclose(other.apply([(1.0, 0.0)]), [(3.0, 3.25)])
+
+    def test_inverse_grid(self):
+        transform = Transform(dim=6, xcoef=[5] + XCOEF[1:], ycoef=YCOEF)
+        pts = numpy.random.RandomState(1).uniform(-30, 30, size=(500, 2))
+        expected = transform.apply_inverse(pts)
+        self.assertTrue(transform.use_inverse_grid((-20, -20, 20, 20), shape=(16, 16)))
+        # Points outside the grid converge too, from a clamped guess
+        result = transform.apply_inverse(pts)
+        numpy.testing.assert_allclose(result, expected, atol=1e-8)
+        residual = numpy.abs(transform.apply(result) - pts).sum(axis=1)
+        self.assertLessEqual(residual.max(), 5e-10)
+        # Not shared with equal Transforms
+        other = Transform(dim=6, xcoef=[5] + XCOEF[1:], ycoef=YCOEF)
+        self.assertEqual(other._inverse_grids, [])
+        self.assertFalse(Transform.scaling(2).use_inverse_grid((0, 0, 1, 1)))
+
+    def test_inverse_grids_by_extent(self):
+        transform = Transform(dim=6, xcoef=[5] + XCOEF[1:], ycoef=YCOEF)
+        transform.use_inverse_grid((-20, -20, 0, 0), shape=(8, 8))
+        transform.use_inverse_grid((0, 0, 20, 20), shape=(8, 8))
+        transform.use_inverse_grid((0, 0, 20, 20), shape=(8, 8))
+        self.assertEqual(len(transform._inverse_grids), 2)
+        low = numpy.array([[-10.0, -5.0], [-1.0, -19.0]])
+        high = numpy.array([[10.0, 5.0], [1.0, 19.0]])
+        self.assertEqual(transform._inverse_grid_for(low).bounds, (-20.0, -20.0, 0.0, 0.0))
+        self.assertEqual(transform._inverse_grid_for(high).bounds, (0.0, 0.0, 20.0, 20.0))
+        self.assertIsNone(transform._inverse_grid_for(numpy.vstack((low, high))))
+        for pts in [low, high]:
+            numpy.testing.assert_allclose(
+                transform.apply(transform.apply_inverse(pts)), pts, atol=1e-9)
+        # Dropped once the coefficients change
+        transform.xcoef = [6] + XCOEF[1:]
+        self.assertIsNone(transform._inverse_grid_for(low))
+        numpy.testing.assert_allclose(
+            transform.apply(transform.apply_inverse(low)), low, atol=1e-9)
+
+    def test_estimate(self):
+        src = numpy.random.RandomState(2).uniform(0, 30, size=(100, 2))
+        cases = [
+            (1, [2, 1, 0, 0, 0, 0], [3, 0, 1, 0, 0, 0]),
+            (2, [2, 1.1, 0, 0, 0, 0], [3, 0.9, 0, 0, 0, 0]),
+            (3, [2, 1.1, 0.1, 0, 0, 0], [3, -0.1, 0.9, 0, 0, 0]),
+            (6, XCOEF, YCOEF),
+        ]
+        for dim, xcoef, ycoef in cases:
+            dst = Transform(dim=dim, xcoef=xcoef, ycoef=ycoef).apply(src)
+            estimated = Transform.estimate(src, dst, dim=dim)
+            self.assertEqual(estimated.dim, dim)
+            numpy.testing.assert_allclose(estimated.xcoef, xcoef, atol=1e-9)
+            numpy.testing.assert_allclose(estimated.ycoef, ycoef, atol=1e-9)
+
+            # Outliers are ignored with RANSAC
+            dst[:10] += 5
+            estimated = Transform.estimate(src, dst, dim=dim, ransac=True, random_state=0)
+            numpy.testing.assert_allclose(estimated.xcoef, xcoef, atol=1e-9)
+        self.assertIsNone(Transform.estimate(src[:2], src[:2], dim=3))
+
+    def test_estimate_transforms(self):
+        src = numpy.random.RandomState(3).uniform(0, 30, size=(60, 2))
+        groups = numpy.repeat([5, 7, 9], 20)
+        first = Transform(dim=3, xcoef=[1, 1, 0, 0, 0, 0], ycoef=[0, 0, 1, 0, 0, 0])
+        second = Transform(dim=3, xcoef=[0, 0.5, 0, 0, 0, 0], ycoef=[2, 0, 2, 0, 0, 0])
+        dst = numpy.concatenate([first.apply(src[:20]), second.apply(src[20:40]), src[40:]])
+        transforms = estimate_transforms(src, dst, groups, dim=3)
+        self.assertEqual(sorted(transforms), [5, 7, 9])
+        numpy.testing.assert_allclose(transforms[5].xcoef, first.xcoef, atol=1e-9)
+        numpy.testing.assert_allclose(transforms[7].ycoef, second.ycoef, atol=1e-9)
+        numpy.testing.assert_allclose(transforms[9].apply(src[40:]), src[40:], atol=1e-9)
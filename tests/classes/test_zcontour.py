@@ -0,0 +1,82 @@
+from unittest import TestCase
+
+import numpy
+
+from pyrecon.classes import Section, ZContour, ZContourIndex
+from pyrecon.classes.zcontour import section_depths
+
+
+class ZContourTests(TestCase):
+
+    def setUp(self):
+        self.zcontour = ZContour(
+            name="z", closed=False, points=[(0.0, 0.0, 1), (3.0, 0.0, 1), (3.0, 4.0, 3)])
+
+    def test_points(self):
+        self.assertEqual(self.zcontour.points.shape, (3, 3))
+        self.assertEqual(self.zcontour.point_list[2], (3.0, 4.0, 3))
+        self.assertIsInstance(self.zcontour.point_list[2][2], int)
+        self.assertEqual(self.zcontour, ZContour(
+            name="z", closed=False, points=[(0, 0, 1), (3, 0, 1), (3, 4, 3)]))
+
+    def test_section_depths(self):
+        sections = {3: Section(thickness=0.1), 1: Section(thickness=0.05), 2: Section(thickness=0.05)}
+        self.assertEqual(section_depths(sections), {1: 0.0, 2: 0.05, 3: 0.1})
+
+    def test_length(self):
+        self.assertAlmostEqual(self.zcontour.length(0.0), 7.0)
+        self.assertAlmostEqual(self.zcontour.length({1: 0.0, 3: 3.0}), 3.0 + 5.0)
+        with self.assertRaisesRegex(Exception, r"No depth for section\(s\): \[3\]"):
+            self.zcontour.length({1: 0.0})
+        self.zcontour.closed = True
+        self.assertAlmostEqual(self.zcontour.length(0.0), 12.0)
+
+    def test_resample(self):
+        points = self.zcontour.resample(0.5, 0.0)
+        self.assertEqual(len(points), 15)
+        numpy.testing.assert_allclose(points[0], (0, 0, 0))
+        numpy.testing.assert_allclose(points[-1], (3, 4, 0))
+        steps = numpy.sqrt((numpy.diff(points, axis=0) ** 2).sum(axis=1))
+        numpy.testing.assert_allclose(steps, 0.5)
+
+
+class ZContourIndexTests(TestCase):
+
+    def setUp(self):
+        random = numpy.random.RandomState(0)
+        self.zcontours = [
+            ZContour(name=str(i), closed=False, points=numpy.column_stack((
+                numpy.cumsum(random.uniform(-1, 1, 6)) + random.uniform(0, 50),
+                numpy.cumsum(random.uniform(-1, 1, 6)) + random.uniform(0, 50),
+                numpy.arange(6) + random.randint(0, 20),
+            )))
+            for i in range(60)
+        ]
+        self.depths = 0.5
+        self.index = ZContourIndex(self.zcontours, self.depths)
+
+    def test_lengths(self):
+        numpy.testing.assert_allclose(
+            self.index.lengths(), [z.length(self.depths) for z in self.zcontours])
+
+    def test_in_box(self):
+        mins, maxs = (10.0, 10.0, 2.0), (30.0, 25.0, 6.0)
+        expected = []
+        for zcontour in self.zcontours:
+            # Dense samples stand in for the segments
+            points = zcontour.resample(0.001, self.depths)
+            if ((points >= mins) & (points <= maxs)).all(axis=1).any():
+                expected.append(zcontour.name)
+        found = [z.name for z in self.index.in_box(mins, maxs)]
+        self.assertEqual(sorted(found), sorted(expected))
+        self.assertTrue(expected)
+
+    def test_nearest(self):
+        point = numpy.array([25.0, 25.0, 4.0])
+        nearest = self.index.nearest(point, k=3)
+        distances = sorted(
+            (numpy.sqrt(((z.resample(0.001, self.depths) - point) ** 2).sum(axis=1)).min(), z.name)
+            for z in self.zcontours)
+        self.assertEqual([z.name for z, _ in nearest], [name for _, name in distances[:3]])
+        for (_, found), (expected, _) in zip(nearest, distances):
+            self.assertAlmostEqual(found, expected, places=3)
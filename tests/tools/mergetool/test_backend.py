@@ -0,0 +1,129 @@
+import os
+import shutil
+import tempfile
+from unittest import TestCase
+
+import numpy
+from PIL import Image as PILImage
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from pyrecon.classes import Contour, Image, Section, Series, Transform
+from pyrecon.tools import reconstruct_reader
+from pyrecon.tools.mergetool import backend, models
+
+IDENTITY = Transform(dim=0, xcoef=[0, 1, 0, 0, 0, 0], ycoef=[0, 0, 1, 0, 0, 0])
+SHIFTED = Transform(dim=3, xcoef=[1.5, 1, 0.02, 0, 0, 0], ycoef=[-0.5, -0.02, 1, 0, 0, 0])
+
+
+def _series(transform, index=1):
+    points = [
+        [(1.0, 1.0), (4.0, 1.0), (4.0, 5.0)],
+        [(10.0, 2.0), (12.0, 3.0), (11.0, 6.0), (9.0, 4.0)],
+    ]
+    contours = [
+        Contour(name="c{}".format(i), closed=True, points=p, transform=transform)
+        for i, p in enumerate(points)
+    ]
+    series = Series()
+    series.sections = {index: Section(index=index, contours=contours)}
+    return series
+
+
+class BackendTests(TestCase):
+
+    def test_estimate_realignment(self):
+        series_a = _series(IDENTITY)
+        series_b = _series(SHIFTED)
+        for ransac in [False, True]:
+            transforms = backend.estimate_realignment(series_a, series_b, ransac=ransac)
+            self.assertEqual(list(transforms), [1])
+            for a, b in zip(series_a.sections[1].contours, series_b.sections[1].contours):
+                numpy.testing.assert_allclose(
+                    transforms[1].apply(b.normalized_points), a.normalized_points, atol=1e-9)
+
+    def test_estimate_realignment_no_common_traces(self):
+        series_b = _series(SHIFTED)
+        series_b.sections[1].contours[0].name = "other"
+        series_b.sections[1].contours.pop()
+        self.assertEqual(backend.estimate_realignment(_series(IDENTITY), series_b), {})
+        self.assertEqual(backend.estimate_realignment(_series(IDENTITY), _series(SHIFTED, 2)), {})
+
+    def test_align_series_list(self):
+        series_list = [_series(IDENTITY), _series(SHIFTED)]
+        shapes = backend.align_series_list(series_list)
+        self.assertEqual(sorted(shapes), [(0, 1), (1, 1)])
+        for shape_a, shape_b in zip(shapes[(0, 1)], shapes[(1, 1)]):
+            self.assertTrue(shape_a.equals_exact(shape_b, 1e-9))
+
+        db_a = models.Contour(id=1, series=0, section=1, index=0)
+        db_b = models.Contour(id=2, series=1, section=1, index=0)
+        match = backend._create_db_contourmatch_from_db_contours_and_pyrecon_series_list(
+            db_a, db_b, series_list)
+        self.assertEqual(match.match_type, "potential_realigned")
+        match = backend._create_db_contourmatch_from_db_contours_and_pyrecon_series_list(
+            db_a, db_b, series_list, shapes=shapes)
+        self.assertEqual(match.match_type, "exact")
+
+    def test_distant_contours_not_matched(self):
+        series_list = [_series(IDENTITY), _series(IDENTITY)]
+        contour_b = series_list[1].sections[1].contours[0]
+        db_a = models.Contour(id=1, series=0, section=1, index=0)
+        db_b = models.Contour(id=2, series=1, section=1, index=0)
+        match = backend._create_db_contourmatch_from_db_contours_and_pyrecon_series_list(
+            db_a, db_b, series_list)
+        self.assertEqual(match.match_type, "exact")
+        self.assertFalse(backend._are_apart(series_list[0].sections[1].contours[0], contour_b))
+
+        contour_b.points = [(x + 3.5, y) for x, y in contour_b.points]
+        self.assertTrue(backend._are_apart(series_list[0].sections[1].contours[0], contour_b))
+        self.assertIsNone(backend._create_db_contourmatch_from_db_contours_and_pyrecon_series_list(
+            db_a, db_b, series_list))
+
+    def test_create_output_series_reads_sections_once(self):
+        engine = create_engine("sqlite://")
+        backend.create_database(engine)
+        session = sessionmaker(bind=engine)()
+        session.add_all([
+            models.Contour(id=1, series=0, section=98, index=2),
+            models.Contour(id=2, series=0, section=98, index=0),
+        ])
+        session.commit()
+        to_keep = [{"db_id": 1, "name": "kept"}, {"db_id": 2, "name": "other"}]
+        expected = reconstruct_reader.process_section_file("tests/tools/_data/_VRJXH.98")
+
+        parsed = []
+        process_section_file = reconstruct_reader.process_section_file
+
+        def counting(path, **kwargs):
+            parsed.append(path)
+            return process_section_file(path, **kwargs)
+        reconstruct_reader.process_section_file = counting
+        try:
+            output = backend.create_output_series(
+                session, to_keep, ["tests/tools/_data"], series_name="out", max_resident=0)
+        finally:
+            reconstruct_reader.process_section_file = process_section_file
+
+        self.assertEqual(len(parsed), 1)
+        contours = output.sections[98].contours
+        self.assertEqual([c.name for c in contours], ["kept", "other"])
+        self.assertEqual(contours[0].points, expected.contours[2].points)
+        self.assertEqual(output.sections[98].thickness, expected.thickness)
+
+    def test_transform_contour_for_frontend_display_points(self):
+        tmp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmp_dir)
+        PILImage.new("L", (100, 100)).save(os.path.join(tmp_dir, "image.png"))
+        image = Image(src="image.png", _path=tmp_dir, mag=1.0, transform=IDENTITY)
+        translated = Transform(dim=1, xcoef=[5, 1, 0, 0, 0, 0], ycoef=[3, 0, 1, 0, 0, 0])
+        # Many nearly collinear points, so simplifying drops some
+        points = [(x / 4.0, 0.0) for x in range(40)] + [(10.0, 10.0), (0.0, 10.0)]
+        contour = Contour(name="c", closed=True, points=points, transform=translated)
+        section = Section(index=1, images=[image], contours=[contour])
+
+        data = backend.transform_contour_for_frontend(contour, 1, section, "series")
+        self.assertLess(len(data["display_points"]), len(data["points"]))
+        # Display points are a subset of points, in the same pixel frame
+        self.assertTrue(set(data["display_points"]) <= set(data["points"]))
+        self.assertEqual(data["display_points"][0], data["points"][0])
@@ -0,0 +1,78 @@
+import os
+import shutil
+import tempfile
+from unittest import TestCase
+
+from lxml import etree
+import numpy
+
+from pyrecon.tools import bundle, reconstruct_reader, reconstruct_writer
+
+DATA_LOC = "tests/tools/_data"
+
+
+class BundleTests(TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.series = reconstruct_reader.process_series_directory(DATA_LOC)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def test_round_trip(self):
+        bundle.write_bundle(self.series, self.tmp_dir)
+        series = bundle.read_bundle(self.tmp_dir)
+        self.assertEqual(series.name, self.series.name)
+        self.assertEqual(series.attributes(), self.series.attributes())
+        self.assertEqual(series.contours, self.series.contours)
+        self.assertEqual(series.zcontours, self.series.zcontours)
+        self.assertEqual(list(series.sections), list(self.series.sections))
+
+        section = series.sections[98]
+        expected = self.series.sections[98]
+        self.assertEqual(section.attributes(), expected.attributes())
+        self.assertEqual(section.images, expected.images)
+        self.assertEqual(section.contours, expected.contours)
+
+    def test_points_are_memory_mapped(self):
+        bundle.write_bundle(self.series, self.tmp_dir)
+        series = bundle.read_bundle(self.tmp_dir, max_resident=1)
+        self.assertEqual(series.sections.resident(), [])
+        points = series.sections[98].contours[0].points
+        self.assertIsInstance(points, numpy.memmap)
+
+    def test_write_xml(self):
+        bundle.write_bundle(self.series, self.tmp_dir)
+        series = bundle.read_bundle(self.tmp_dir)
+        self.assertEqual(
+            etree.tostring(reconstruct_writer.entire_section_to_xml(series.sections[98])),
+            etree.tostring(reconstruct_writer.entire_section_to_xml(self.series.sections[98])),
+        )
+        self.assertEqual(
+            etree.tostring(reconstruct_writer.entire_series_to_xml(series)),
+            etree.tostring(reconstruct_writer.entire_series_to_xml(self.series)),
+        )
+
+    def test_missing_colors_share_palette_entry(self):
+        for section in self.series.sections.values():
+            for contour in section.contours:
+                contour.border = None
+        bundle.write_bundle(self.series, self.tmp_dir)
+        borders = numpy.load(os.path.join(self.tmp_dir, "borders.npy"))
+        self.assertEqual(len(borders), 1)
+        self.assertTrue(numpy.isnan(borders).all())
+        series = bundle.read_bundle(self.tmp_dir)
+        self.assertIsNone(series.sections[98].contours[0].border)
+
+    def test_missing_mode(self):
+        self.series.sections[98].contours[0].mode = None
+        bundle.write_bundle(self.series, self.tmp_dir)
+        contours = bundle.read_bundle(self.tmp_dir).sections[98].contours
+        self.assertIsNone(contours[0].mode)
+        self.assertEqual(contours[1].mode, self.series.sections[98].contours[1].mode)
+
+    def test_from_json(self):
+        self.assertEqual(bundle._from_json([]), [])
+        self.assertEqual(bundle._from_json([1.0, 0.5]), (1.0, 0.5))
+        self.assertEqual(bundle._from_json([[1.0, 2.0]]), [(1.0, 2.0)])
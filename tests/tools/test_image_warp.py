@@ -0,0 +1,128 @@
+from concurrent.futures import ThreadPoolExecutor
+import os
+import shutil
+import tempfile
+from unittest import TestCase
+
+import numpy
+from PIL import Image as PILImage
+
+from pyrecon.classes import Image, Transform
+from pyrecon.tools.image_warp import ImageSource, TiledWarper
+from pyrecon.tools.series_cache import CACHE_DIRNAME
+
+
+class TiledWarperTests(TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.pixels = (numpy.arange(40 * 60) % 251).astype(numpy.uint8).reshape(40, 60)
+        PILImage.fromarray(self.pixels).save(os.path.join(self.tmp_dir, "image.png"))
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def _image(self, transform, mag=1.0):
+        return Image(src="image.png", _path=self.tmp_dir, mag=mag, transform=transform)
+
+    def test_render_identity(self):
+        transform = Transform(dim=0, xcoef=[0, 1, 0, 0, 0, 0], ycoef=[0, 0, 1, 0, 0, 0])
+        warper = TiledWarper(self._image(transform, mag=0.5), tile_size=16)
+        self.assertEqual(warper.bounds(), (0.0, 0.0, 30.0, 20.0))
+        numpy.testing.assert_array_equal(warper.render(), self.pixels)
+        # Half scale samples the image reduced by 2
+        numpy.testing.assert_array_equal(
+            warper.render(scale=0.5), numpy.asarray(PILImage.fromarray(self.pixels).reduce(2)))
+
+    def test_render_translated(self):
+        transform = Transform(dim=1, xcoef=[2, 1, 0, 0, 0, 0], ycoef=[3, 0, 1, 0, 0, 0])
+        warper = TiledWarper(self._image(transform), tile_size=16)
+        self.assertEqual(warper.bounds(), (-2.0, -3.0, 58.0, 37.0))
+        numpy.testing.assert_array_equal(warper.render(), self.pixels)
+        # Only the tiles a view needs are warped
+        view = warper.render(bounds=(10, 5, 20, 15))
+        numpy.testing.assert_array_equal(view, self.pixels[22:32, 12:22])
+        (cache_dir,) = os.listdir(os.path.join(self.tmp_dir, CACHE_DIRNAME, "tiles"))
+        tiles = os.listdir(os.path.join(self.tmp_dir, CACHE_DIRNAME, "tiles", cache_dir))
+        self.assertEqual(len(tiles), len(warper.tiles(warper.bounds())))
+
+    def test_workers(self):
+        transform = Transform(dim=3, xcoef=[1, 0.9, 0.1, 0, 0, 0], ycoef=[2, -0.1, 1.1, 0, 0, 0])
+        serial = TiledWarper(self._image(transform), tile_size=16, cache=False).render()
+        parallel = TiledWarper(self._image(transform), tile_size=16, cache=False, workers=2)
+        with parallel:
+            numpy.testing.assert_array_equal(parallel.render(), serial)
+            # One pool serves every call
+            executor = parallel._executor
+            parallel.render(scale=0.5)
+            self.assertIs(parallel._executor, executor)
+        self.assertIsNone(parallel._executor)
+        self.assertFalse(os.path.exists(os.path.join(self.tmp_dir, CACHE_DIRNAME)))
+
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            warper = TiledWarper(
+                self._image(transform), tile_size=16, cache=False, executor=executor)
+            numpy.testing.assert_array_equal(warper.render(), serial)
+            warper.close()
+            self.assertIs(warper._executor, executor)
+
+    def test_max_tiles(self):
+        transform = Transform(dim=0, xcoef=[0, 1, 0, 0, 0, 0], ycoef=[0, 0, 1, 0, 0, 0])
+        warper = TiledWarper(self._image(transform), tile_size=16, max_tiles=3)
+        tiles = warper.tiles(warper.bounds())
+        self.assertGreater(len(tiles), 3)
+        warper.get_tiles(tiles)
+        self.assertEqual(len(os.listdir(warper.cache_dir)), 3)
+        # The most recently computed tiles are kept, and reading one refreshes it
+        cached = list(warper._cached_paths())
+        self.assertEqual(cached, [warper._tile_path(*tile, 1.0) for tile in tiles[-3:]])
+        warper.get_tiles([tiles[-3]])
+        self.assertEqual(list(warper._cached_paths())[-1], warper._tile_path(*tiles[-3], 1.0))
+        # Another warper on the same directory finds the same tiles
+        other = TiledWarper(self._image(transform), tile_size=16, max_tiles=3)
+        self.assertEqual(set(other._cached_paths()), set(warper._cached_paths()))
+
+
+class ImageSourceTests(TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.pixels = (numpy.arange(300 * 200 * 3) % 251).astype(numpy.uint8).reshape(300, 200, 3)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def _save(self, filename, **kwargs):
+        path = os.path.join(self.tmp_dir, filename)
+        PILImage.fromarray(self.pixels).save(path, **kwargs)
+        return path
+
+    def test_read(self):
+        source = ImageSource(self._save("image.png"))
+        self.assertEqual(source.size, (200, 300))
+        self.assertEqual(source.pixel.dtype, numpy.uint8)
+        self.assertEqual(source.pixel.shape[2:], (3,))
+        numpy.testing.assert_array_equal(source.read((30, 100, 70, 140)), self.pixels[100:140, 30:70])
+
+    def test_read_reduced(self):
+        source = ImageSource(self._save("image.png"))
+        self.assertEqual(source.reduced_size(3), (67, 100))
+        reduced = numpy.asarray(PILImage.fromarray(self.pixels).reduce(3))
+        numpy.testing.assert_array_equal(source.read((5, 6, 20, 30), factor=3), reduced[6:30, 5:20])
+
+        # JPEG files are decoded at the reduced size directly
+        source = ImageSource(self._save("image.jpg"))
+        self.assertEqual(source.read((0, 0, 100, 150), factor=4).shape, (75, 50, 3))
+
+    def test_max_pixels(self):
+        path = self._save("image.png")
+        limit = PILImage.MAX_IMAGE_PIXELS
+        with self.assertRaises(PILImage.DecompressionBombError):
+            ImageSource(path, max_pixels=1000)
+        self.assertEqual(PILImage.MAX_IMAGE_PIXELS, limit)
+        PILImage.MAX_IMAGE_PIXELS = 1000
+        try:
+            source = ImageSource(path, max_pixels=10 ** 6)
+            numpy.testing.assert_array_equal(source.read((0, 0, 10, 4)), self.pixels[:4, :10])
+        finally:
+            PILImage.MAX_IMAGE_PIXELS = limit
@@ -0,0 +1,90 @@
+import os
+import shutil
+import tempfile
+from unittest import TestCase
+
+from pyrecon.tools import manifest, reconstruct_reader
+
+DATA_LOC = "tests/tools/_data"
+
+
+class ManifestTests(TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.series_dir = os.path.join(self.tmp_dir, "series")
+        shutil.copytree(DATA_LOC, self.series_dir)
+        self.section_path = os.path.join(self.series_dir, "_VRJXH.98")
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def test_scan_section_file(self):
+        entry = manifest.scan_section_file(self.section_path)
+        section = reconstruct_reader.process_section_file(self.section_path)
+        self.assertEqual(entry["index"], 98)
+        self.assertEqual(entry["path"], "_VRJXH.98")
+        self.assertEqual(entry["thickness"], section.thickness)
+        self.assertEqual(
+            sum(data["count"] for data in entry["contours"].values()),
+            len(section.contours),
+        )
+        self.assertNotIn("domain1", entry["contours"])
+        self.assertEqual(entry["contours"]["d04plin08"]["count"], 2)
+        self.assertEqual(
+            entry["contours"]["d110_p_04_st"]["bounds"],
+            [21.7326, 15.9305, 21.7691, 15.964],
+        )
+
+    def test_scan_section_file_empty_contour(self):
+        with open(self.section_path) as f:
+            text = f.read()
+        contour = '<Contour name="{}" hidden="false" closed="true" simplified="false" ' \
+                  'border="1 0 0" fill="1 0 0" mode="-13" points=""/>'
+        text = text.replace(
+            '<Contour name="d110_p_04_st"',
+            contour.format("empty") + "\n" + contour.format("d110_p_04_st") +
+            '\n<Contour name="d110_p_04_st"', 1)
+        with open(self.section_path, "w") as f:
+            f.write(text)
+        entry = manifest.scan_section_file(self.section_path)
+        self.assertEqual(entry["contours"]["empty"], {"count": 1, "bounds": None})
+        self.assertEqual(entry["contours"]["d110_p_04_st"], {
+            "count": 2, "bounds": [21.7326, 15.9305, 21.7691, 15.964]})
+        series_manifest = manifest.SeriesManifest("_VRJXH", {98: entry})
+        self.assertEqual(series_manifest.bounds("empty"), {})
+        self.assertEqual(
+            series_manifest.bounds("d110_p_04_st"), {98: [21.7326, 15.9305, 21.7691, 15.964]})
+
+    def test_queries(self):
+        series_manifest = manifest.build_manifest(self.series_dir, save=False)
+        self.assertEqual(series_manifest.sections_with("d98*"), [98])
+        self.assertEqual(series_manifest.sections_with("d99*"), [])
+        self.assertEqual(series_manifest.contour_counts("d04*"), {98: 3})
+        self.assertEqual(
+            [entry["index"] for entry in series_manifest.sections_in_range(90, 100)], [98])
+        self.assertEqual(series_manifest.sections_in_range(1, 10), [])
+        self.assertEqual(
+            series_manifest.bounds("d110_p_04_st"), {98: [21.7326, 15.9305, 21.7691, 15.964]})
+        self.assertIn("d123_p_07", series_manifest.names())
+
+    def test_build_manifest_saves_and_reuses(self):
+        series_manifest = manifest.build_manifest(self.series_dir)
+        manifest_fp = manifest.manifest_path(self.series_dir, "_VRJXH")
+        self.assertTrue(os.path.exists(manifest_fp))
+
+        loaded = manifest.SeriesManifest.load(manifest_fp)
+        self.assertEqual(loaded.sections, series_manifest.sections)
+
+        # Unchanged Sections are not scanned again
+        loaded.sections[98]["thickness"] = 1.0
+        loaded.save(manifest_fp)
+        self.assertEqual(manifest.build_manifest(self.series_dir).sections[98]["thickness"], 1.0)
+
+        with open(self.section_path, "a") as f:
+            f.write("\n")
+        self.assertEqual(manifest.build_manifest(self.series_dir).sections[98]["thickness"], 0.048)
+
+    def test_process_series_directory_manifest(self):
+        series = reconstruct_reader.process_series_directory(self.series_dir, manifest=True)
+        self.assertEqual(list(series.manifest.sections), list(series.sections))
@@ -1,10 +1,14 @@
 import os
+import shutil
+import tempfile
 from unittest import TestCase
 
 from lxml import etree
+import numpy
 
 from pyrecon.classes import Section, Series
 from pyrecon.tools import reconstruct_reader
+from pyrecon.tools.series_cache import SectionCache
 
 DATA_LOC = "tests/tools/_data"
 
@@ -17,6 +21,179 @@ class ReconstructReaderTests(TestCase):
         self.assertIsInstance(series, Series)
         self.assertIsNotNone(series.contours)
 
+    def test_process_series_directory_workers(self):
+        path = DATA_LOC
+        series = reconstruct_reader.process_series_directory(path)
+        parallel_series = reconstruct_reader.process_series_directory(path, workers=2)
+        self.assertEqual(list(parallel_series.sections), list(series.sections))
+        for index, section in series.sections.items():
+            self.assertEqual(parallel_series.sections[index].contours, section.contours)
+
+    def test_process_series_directory_lazy(self):
+        series = reconstruct_reader.process_series_directory(DATA_LOC, lazy=True, max_resident=1)
+        self.assertEqual(list(series.sections), [98])
+        self.assertEqual(series.sections.resident(), [])
+        self.assertEqual(len(series.sections[98].contours), 7)
+        self.assertEqual(series.sections.resident(), [98])
+        with self.assertRaises(Exception):
+            reconstruct_reader.process_series_directory(
+                DATA_LOC, lazy=True, progress=lambda progress: None)
+        with self.assertRaises(Exception):
+            reconstruct_reader.process_series_directory(
+                DATA_LOC, lazy=True, cancel=reconstruct_reader.CancelToken())
+
+    def test_process_section_file_contour_filter(self):
+        path = os.path.join(DATA_LOC, "_VRJXH.98")
+        section = reconstruct_reader.process_section_file(path)
+
+        contour_filter = reconstruct_reader.ContourFilter(name="d04*")
+        filtered = reconstruct_reader.process_section_file(path, contour_filter=contour_filter)
+        self.assertEqual(
+            [c.name for c in filtered.contours],
+            [c.name for c in section.contours if c.name.startswith("d04")],
+        )
+        self.assertEqual(len(filtered.images), 1)
+
+        contour_filter = reconstruct_reader.ContourFilter(hidden=False)
+        filtered = reconstruct_reader.process_section_file(path, contour_filter=contour_filter)
+        self.assertEqual(filtered.contours, section.contours)
+        contour_filter = reconstruct_reader.ContourFilter(hidden=True)
+        filtered = reconstruct_reader.process_section_file(path, contour_filter=contour_filter)
+        self.assertEqual(filtered.contours, [])
+
+        contour_filter = reconstruct_reader.ContourFilter(bounds=(21.0, 15.0, 22.0, 16.0))
+        filtered = reconstruct_reader.process_section_file(path, contour_filter=contour_filter)
+        self.assertEqual([c.name for c in filtered.contours], ["d110_p_04_st"])
+
+    def test_process_series_directory_contour_filter(self):
+        contour_filter = reconstruct_reader.ContourFilter(sections=(1, 10))
+        series = reconstruct_reader.process_series_directory(
+            DATA_LOC, contour_filter=contour_filter)
+        self.assertEqual(list(series.sections), [])
+
+        contour_filter = reconstruct_reader.ContourFilter(name="d98*", sections=(98, 98))
+        series = reconstruct_reader.process_series_directory(
+            DATA_LOC, contour_filter=contour_filter)
+        self.assertEqual(
+            [c.name for c in series.sections[98].contours], ["d98_cfa_03_perf", "d98_c_03"])
+
+    def test_contour_filter_apply(self):
+        path = os.path.join(DATA_LOC, "_VRJXH.98")
+        contour_filter = reconstruct_reader.ContourFilter(name="d98*")
+        section = contour_filter.apply(reconstruct_reader.process_section_file(path))
+        self.assertEqual(
+            section.contours,
+            reconstruct_reader.process_section_file(path, contour_filter=contour_filter).contours,
+        )
+
+    def _make_series_dir(self, indices):
+        series_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, series_dir)
+        shutil.copy(os.path.join(DATA_LOC, "_VRJXH.ser"), series_dir)
+        with open(os.path.join(DATA_LOC, "_VRJXH.98")) as f:
+            section_xml = f.read()
+        for index in indices:
+            with open(os.path.join(series_dir, "_VRJXH.{}".format(index)), "w") as f:
+                f.write(section_xml.replace('index="98"', 'index="{}"'.format(index)))
+        return series_dir
+
+    def test_process_series_directory_progress(self):
+        series_dir = self._make_series_dir([1, 2, 3])
+        reports = []
+        reconstruct_reader.process_series_directory(series_dir, progress=reports.append)
+        self.assertEqual([r.sections_done for r in reports], [1, 2, 3])
+        self.assertEqual(set(r.sections_total for r in reports), {3})
+        self.assertEqual(reports[-1].bytes_read, reports[-1].bytes_total)
+        self.assertEqual(reports[-1].eta, 0)
+        self.assertLess(reports[0].bytes_read, reports[1].bytes_read)
+
+    def test_process_series_directory_cancel(self):
+        series_dir = self._make_series_dir([1, 2, 3])
+        cancel = reconstruct_reader.CancelToken()
+        cancel.cancel()
+        with self.assertRaises(reconstruct_reader.LoadCancelled):
+            reconstruct_reader.process_series_directory(series_dir, cancel=cancel)
+
+        for kwargs in [{}, {"workers": 2}]:
+            cancel = reconstruct_reader.CancelToken()
+            reports = []
+
+            def progress(report):
+                reports.append(report)
+                cancel.cancel()
+
+            with self.assertRaises(reconstruct_reader.LoadCancelled):
+                reconstruct_reader.process_series_directory(
+                    series_dir, progress=progress, cancel=cancel, **kwargs)
+            self.assertEqual(len(reports), 1)
+
+    def test_process_series_directory_cancel_warm_cache(self):
+        series_dir = self._make_series_dir([1, 2, 3, 4, 5])
+        reconstruct_reader.process_series_directory(series_dir, cache=True)
+        events = []
+        get = SectionCache.get
+
+        def logged_get(section_cache, section_path, **kwargs):
+            events.append("get")
+            return get(section_cache, section_path, **kwargs)
+
+        cancel = reconstruct_reader.CancelToken()
+
+        def progress(report):
+            events.append("progress")
+            if report.sections_done == 2:
+                cancel.cancel()
+
+        SectionCache.get = logged_get
+        try:
+            with self.assertRaises(reconstruct_reader.LoadCancelled):
+                reconstruct_reader.process_series_directory(
+                    series_dir, cache=True, progress=progress, cancel=cancel)
+        finally:
+            SectionCache.get = get
+        self.assertEqual(events, ["get", "progress", "get", "progress"])
+
+    def test_process_series_directory_shares_transforms(self):
+        series_dir = self._make_series_dir([1, 2])
+        for kwargs in [{}, {"workers": 2}]:
+            series = reconstruct_reader.process_series_directory(series_dir, **kwargs)
+            transforms = {}
+            for section in series.sections.values():
+                for contour in section.contours:
+                    shared = transforms.setdefault(contour.transform.key, contour.transform)
+                    self.assertIs(contour.transform, shared)
+            self.assertLess(len(transforms), 2 * len(series.sections[1].contours))
+
+    def test_iter_sections(self):
+        sections = list(reconstruct_reader.iter_sections(DATA_LOC))
+        self.assertEqual([section.index for section in sections], [98])
+        self.assertEqual(len(sections[0].contours), 7)
+
+        sections = list(reconstruct_reader.iter_sections(DATA_LOC, indices=[1, 2]))
+        self.assertEqual(sections, [])
+
+    def test_process_section_file_points_as_array(self):
+        path = os.path.join(DATA_LOC, "_VRJXH.98")
+        section = reconstruct_reader.process_section_file(path)
+        array_section = reconstruct_reader.process_section_file(path, points_as_array=True)
+        self.assertEqual(array_section.images, section.images)
+        self.assertEqual(array_section.contours, section.contours)
+        for contour, array_contour in zip(section.contours, array_section.contours):
+            self.assertEqual(array_contour.points.shape, (len(contour.points), 2))
+            self.assertEqual(array_contour.point_list, contour.points)
+
+    def test_parse_points(self):
+        points = reconstruct_reader.parse_points("1 2,\n    3.5 -4,\n    ")
+        self.assertEqual(points.dtype, numpy.float64)
+        self.assertEqual(points.tolist(), [[1.0, 2.0], [3.5, -4.0]])
+
+        points = reconstruct_reader.parse_points("1 2 5,\n    3 4 6,\n    ", dims=3)
+        self.assertEqual(points.shape, (2, 3))
+
+    def test_list_section_paths(self):
+        section_paths = reconstruct_reader.list_section_paths(DATA_LOC, "_VRJXH")
+        self.assertEqual(section_paths, [(98, os.path.join(DATA_LOC, "_VRJXH.98"))])
+
     def test_process_series_file(self):
         path = os.path.join(DATA_LOC, "_VRJXH.ser")
         series = reconstruct_reader.process_series_file(path)
@@ -292,3 +469,11 @@ class ReconstructReaderTests(TestCase):
             'fill': (1.0, 0.5, 0.0),
         }
         self.assertEqual(zcontour_attributes, expected_attributes)
+
+        zcontour_attributes = reconstruct_reader.extract_zcontour_attributes(
+            node, points_as_array=True)
+        self.assertEqual(zcontour_attributes["points"].shape, (22, 3))
+        self.assertEqual(
+            [tuple(point) for point in zcontour_attributes["points"].tolist()],
+            expected_attributes["points"],
+        )
@@ -0,0 +1,76 @@
+import os
+import shutil
+import tempfile
+from unittest import TestCase
+
+from pyrecon.tools import reconstruct_reader
+from pyrecon.tools.series_cache import CACHE_DIRNAME, SectionCache
+
+DATA_LOC = "tests/tools/_data"
+
+
+class SectionCacheTests(TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.series_dir = os.path.join(self.tmp_dir, "series")
+        shutil.copytree(DATA_LOC, self.series_dir)
+        self.section_path = os.path.join(self.series_dir, "_VRJXH.98")
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def test_get_missing(self):
+        cache = SectionCache(self.series_dir)
+        self.assertIsNone(cache.get(self.section_path))
+
+    def test_put_get(self):
+        cache = SectionCache(self.series_dir)
+        section = reconstruct_reader.process_section_file(self.section_path)
+        cache.put(self.section_path, section)
+        cached = cache.get(self.section_path)
+        self.assertEqual(cached.index, section.index)
+        self.assertEqual(cached.contours, section.contours)
+        self.assertEqual(cached.images, section.images)
+        # Entries are kept separately for each points representation
+        self.assertIsNone(cache.get(self.section_path, points_as_array=True))
+
+    def test_get_edited(self):
+        cache = SectionCache(self.series_dir)
+        section = reconstruct_reader.process_section_file(self.section_path)
+        cache.put(self.section_path, section)
+        with open(self.section_path, "a") as f:
+            f.write("\n")
+        self.assertIsNone(cache.get(self.section_path))
+
+    def test_is_fresh(self):
+        cache = SectionCache(self.series_dir)
+        self.assertFalse(cache.is_fresh(self.section_path))
+        cache.put(self.section_path, reconstruct_reader.process_section_file(self.section_path))
+        self.assertTrue(cache.is_fresh(self.section_path))
+        self.assertFalse(cache.is_fresh(self.section_path, points_as_array=True))
+        with open(self.section_path, "a") as f:
+            f.write("\n")
+        self.assertFalse(cache.is_fresh(self.section_path))
+
+    def test_get_touched(self):
+        cache = SectionCache(self.series_dir)
+        section = reconstruct_reader.process_section_file(self.section_path)
+        cache.put(self.section_path, section)
+        stat = os.stat(self.section_path)
+        os.utime(self.section_path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+        self.assertIsNotNone(cache.get(self.section_path))
+
+    def test_process_series_directory_cache(self):
+        series = reconstruct_reader.process_series_directory(self.series_dir, cache=True)
+        self.assertTrue(os.path.isdir(os.path.join(self.series_dir, CACHE_DIRNAME)))
+        cached_series = reconstruct_reader.process_series_directory(self.series_dir, cache=True)
+        self.assertEqual(list(cached_series.sections), list(series.sections))
+        self.assertEqual(cached_series.sections[98].contours, series.sections[98].contours)
+
+    def test_process_series_directory_cache_dir(self):
+        cache_dir = os.path.join(self.tmp_dir, "cache")
+        reconstruct_reader.process_series_directory(
+            self.series_dir, cache=True, cache_dir=cache_dir)
+        self.assertTrue(os.listdir(cache_dir))
+        self.assertFalse(os.path.exists(os.path.join(self.series_dir, CACHE_DIRNAME)))
@@ -0,0 +1,81 @@
+from unittest import TestCase
+
+from pyrecon.classes import Contour, Section, Series, Transform
+from pyrecon.tools import reconstruct_reader
+from pyrecon.tools.statistics import SeriesStatistics, section_measurements
+
+IDENTITY = Transform(dim=0, xcoef=[0, 1, 0, 0, 0, 0], ycoef=[0, 0, 1, 0, 0, 0])
+SQUARE = [(0.0, 0.0), (2.0, 0.0), (2.0, 2.0), (0.0, 2.0)]
+
+
+def _section(index, contours, thickness=0.05):
+    return Section(index=index, thickness=thickness, contours=[
+        Contour(name=name, closed=closed, points=points, transform=IDENTITY)
+        for name, closed, points in contours
+    ])
+
+
+class StatisticsTests(TestCase):
+
+    def setUp(self):
+        self.series = Series()
+        self.series.sections = {
+            1: _section(1, [("d01", True, SQUARE)]),
+            2: _section(2, [("d01", True, SQUARE), ("s01", False, [(0.0, 0.0), (3.0, 4.0)])]),
+            3: _section(3, [("d01", True, SQUARE), ("d01", True, SQUARE)]),
+        }
+
+    def test_objects(self):
+        objects = SeriesStatistics(self.series).objects()
+        self.assertEqual(sorted(objects), ["d01", "s01"])
+        d01 = objects["d01"]
+        self.assertEqual((d01.count, d01.sections, d01.start, d01.end), (4, 3, 1, 3))
+        self.assertAlmostEqual(d01.z_range[0], 0.0)
+        self.assertAlmostEqual(d01.z_range[1], 0.15)
+        self.assertAlmostEqual(d01.volume, 4 * 4 * 0.05)
+        self.assertAlmostEqual(d01.surface_area, 4 * 8 * 0.05 + 4 + 8)
+        self.assertAlmostEqual(d01.flat_area, 0.0)
+        s01 = objects["s01"]
+        self.assertEqual((s01.count, s01.sections, s01.start, s01.end), (1, 1, 2, 2))
+        self.assertAlmostEqual(s01.z_range[0], 0.05)
+        self.assertAlmostEqual(s01.flat_area, 5 * 0.05)
+        self.assertAlmostEqual(s01.volume, 0.0)
+
+    def test_update(self):
+        statistics = SeriesStatistics(self.series)
+        self.assertEqual(statistics.update(), [])
+        self.series.sections[2].contours[1].points = [(0.0, 0.0), (6.0, 8.0)]
+        self.series.sections[3].thickness = 0.1
+        self.assertEqual(statistics.update(), [2, 3])
+        self.assertAlmostEqual(statistics.objects()["s01"].flat_area, 10 * 0.05)
+        self.assertAlmostEqual(statistics.objects()["d01"].z_range[1], 0.2)
+
+        del self.series.sections[1]
+        self.series.sections[4] = _section(4, [("d02", True, SQUARE)])
+        self.assertEqual(statistics.update([4]), [4])
+        objects = statistics.objects()
+        self.assertEqual(objects["d01"].start, 2)
+        self.assertAlmostEqual(objects["d02"].z_range[0], 0.15)
+        self.assertAlmostEqual(objects["d02"].z_range[1], 0.2)
+
+    def test_update_transform_edited_in_place(self):
+        transform = Transform(dim=0, xcoef=[0, 1, 0, 0, 0, 0], ycoef=[0, 0, 1, 0, 0, 0])
+        for contour in self.series.sections[3].contours:
+            contour.transform = transform
+        statistics = SeriesStatistics(self.series)
+        self.assertAlmostEqual(statistics.objects()["d01"].volume, 4 * 4 * 0.05)
+        # Halving the transform's scale doubles the normalized points
+        transform.xcoef = [0, 0.5, 0, 0, 0, 0]
+        transform.ycoef = [0, 0, 0.5, 0, 0, 0]
+        transform.dim = 3
+        self.assertEqual(statistics.update(), [3])
+        area = self.series.sections[3].trace_metrics().area
+        self.assertEqual(abs(area).tolist(), [16.0, 16.0])
+        self.assertAlmostEqual(statistics.objects()["d01"].volume, (4 + 4 + 32) * 0.05)
+
+    def test_section_measurements(self):
+        section = reconstruct_reader.process_section_file("tests/tools/_data/_VRJXH.98")
+        measurements = section_measurements(section)
+        self.assertEqual(
+            sum(row[0] for row in measurements.values()),
+            sum(1 for c in section.contours if len(c.points)))